@@ -0,0 +1,188 @@
+"""
+Change tracking for generated WEEKLY/MONTHLY logs
+
+Each generated log stores a fingerprint of the source pages it was built
+from (page IDs + last_edited_time of the workouts, assessments or weekly
+summaries in its window) in the "Source Fingerprint" property. On the next
+run a report whose source fingerprint is unchanged is skipped before any
+Groq call; a changed one is regenerated and written over the existing log.
+
+A summary that fell back to canned text after a failed Groq call is saved
+without a fingerprint, so the next run tries it again.
+
+The "Source Fingerprint" property has to exist on the log databases. It is
+only added automatically when NOTION_ADD_FINGERPRINT_PROPERTY=1; without
+it, logs are written without fingerprints and nothing is skipped.
+
+Configuration (environment):
+    NOTION_ADD_FINGERPRINT_PROPERTY  1 adds the property to the log databases if missing (default: 0)
+"""
+
+import hashlib
+import os
+from typing import Dict, Iterable, Optional, Tuple
+
+from notion_query import aiter_database_pages, forget_property_ids, iter_database_pages
+from report_index import ReportIndex
+
+FINGERPRINT_PROPERTY = "Source Fingerprint"
+
+
+def fingerprint(*record_sets: Iterable) -> str:
+    """
+    Fingerprint the source records of a report
+
+    Args:
+        record_sets: Decoded records (or page dicts) with id and last_edited_time
+
+    Returns:
+        Hex digest that changes when a page is added, removed or edited
+    """
+    entries = sorted(
+        f"{record.get('id')}@{record.get('last_edited_time')}"
+        for records in record_sets for record in records
+    )
+    return hashlib.sha256("\n".join(entries).encode("utf-8")).hexdigest()[:32]
+
+
+def fingerprint_property(value: str) -> Dict:
+    """Notion property payload for a fingerprint"""
+    return {"rich_text": [{"text": {"content": value}}]}
+
+
+class FallbackSummary(dict):
+    """Summary built from canned text after a failed Groq call (saved without a fingerprint)"""
+
+
+def saved_fingerprint(summary: Dict, value: str) -> str:
+    """Fingerprint to store with a summary: none for a fallback, so it isn't taken as up to date"""
+    return "" if isinstance(summary, FallbackSummary) else value
+
+
+def add_property_enabled() -> bool:
+    return os.getenv("NOTION_ADD_FINGERPRINT_PROPERTY", "0") == "1"
+
+
+def _plain_text(prop: Dict, prop_type: str) -> str:
+    return "".join(item.get("plain_text", "") for item in (prop or {}).get(prop_type, []))
+
+
+class ChangeTracker(ReportIndex):
+    """
+    Report index that also remembers each log's page ID and source fingerprint
+
+    Loads lazily like ReportIndex for sync clients; async callers await
+    aload()/aensure_loaded() before the first lookup.
+    """
+
+    def __init__(self, notion, database_id: str, title_property: str):
+        super().__init__(notion, database_id, title_property)
+        self._reports: Dict[str, Tuple[str, str]] = {}
+        self._property_checked = False
+        self.has_property = False
+
+    def _query_kwargs(self):
+        return {
+            "properties": [self.title_property, FINGERPRINT_PROPERTY],
+            "sorts": [{"timestamp": "created_time", "direction": "ascending"}]
+        }
+
+    def _ingest(self, pages):
+        reports = {}
+        for page in pages:
+            props = page.get("properties", {})
+            title = _plain_text(props.get(self.title_property), "title")
+            if title:
+                # Oldest first, so the newest log with a title wins
+                reports[title] = (page["id"], _plain_text(props.get(FINGERPRINT_PROPERTY), "rich_text"))
+        self._reports = reports
+        self._titles = set(reports)
+
+    def _load(self):
+        self._ingest(iter_database_pages(self.notion, self.database_id, **self._query_kwargs()))
+
+    async def aload(self):
+        """Scan the log database with an async client"""
+        pages = [page async for page in aiter_database_pages(self.notion, self.database_id, **self._query_kwargs())]
+        with self._lock:
+            self._ingest(pages)
+
+    async def aensure_loaded(self):
+        if self._titles is None:
+            await self.aload()
+
+    def ensure_property(self):
+        """
+        Check the log database for the fingerprint property (once per process)
+
+        A missing property is added only if NOTION_ADD_FINGERPRINT_PROPERTY=1;
+        otherwise fingerprint_properties() writes nothing.
+        """
+        if self._property_checked:
+            return
+        database = self.notion.databases.retrieve(database_id=self.database_id)
+        self.has_property = FINGERPRINT_PROPERTY in database.get("properties", {})
+        if not self.has_property and add_property_enabled():
+            self.notion.databases.update(
+                database_id=self.database_id,
+                properties={FINGERPRINT_PROPERTY: {"rich_text": {}}}
+            )
+            forget_property_ids(self.database_id)
+            self.has_property = True
+        self._property_checked = True
+        self._warn_missing()
+
+    async def aensure_property(self):
+        """Async counterpart of ensure_property"""
+        if self._property_checked:
+            return
+        database = await self.notion.databases.retrieve(database_id=self.database_id)
+        self.has_property = FINGERPRINT_PROPERTY in database.get("properties", {})
+        if not self.has_property and add_property_enabled():
+            await self.notion.databases.update(
+                database_id=self.database_id,
+                properties={FINGERPRINT_PROPERTY: {"rich_text": {}}}
+            )
+            forget_property_ids(self.database_id)
+            self.has_property = True
+        self._property_checked = True
+        self._warn_missing()
+
+    def _warn_missing(self):
+        if not self.has_property:
+            print(f"⚠️  No \"{FINGERPRINT_PROPERTY}\" property on database {self.database_id}: "
+                  f"unchanged reports won't be skipped (NOTION_ADD_FINGERPRINT_PROPERTY=1 adds it)")
+
+    def fingerprint_properties(self, value: str) -> Dict:
+        """Properties to write a log's fingerprint with (none if the database lacks the property)"""
+        return {FINGERPRINT_PROPERTY: fingerprint_property(value)} if self.has_property else {}
+
+    # ------------------------------------------------------------------ lookups
+
+    def existing(self, title: str) -> Optional[str]:
+        """Page ID of the log with this title, if one exists"""
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._reports.get(title)
+        return entry[0] if entry else None
+
+    def unchanged(self, title: str, value: str) -> bool:
+        """True if a log with this title was built from exactly these sources"""
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._reports.get(title)
+        return bool(entry and entry[1] == value)
+
+    def source_fingerprint(self, title: str) -> Optional[str]:
+        """Fingerprint stored on the log with this title, if one exists"""
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._reports.get(title)
+        return entry[1] if entry else None
+
+    def record(self, title: str, page_id: str, value: str):
+        """Remember a log written during this run"""
+        with self._lock:
+            self._ensure_loaded()
+            self._titles.add(title)
+            self._reports[title] = (page_id, value)
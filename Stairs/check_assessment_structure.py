@@ -12,11 +12,14 @@ if sys.platform == "win32":
 from dotenv import load_dotenv
 from notion_client import Client
 
+from notion_query import query_all
+from notion_scheduler import rate_limited
+
 # Load environment
 load_dotenv()
 
 # Initialize Notion client
-notion = Client(auth=os.getenv("NOTION_API_KEY"))
+notion = rate_limited(Client(auth=os.getenv("NOTION_API_KEY")))
 
 # Database IDs
 DB_ASSESSMENTS = os.getenv("NOTION_DATABASE_ID_ASSESSMENTS")
@@ -38,12 +41,7 @@ for prop_name, prop_data in props.items():
 
 # Get sample assessments
 print("\n[2/2] Fetching sample assessment records...")
-assessments_response = notion.databases.query(
-    database_id=DB_ASSESSMENTS,
-    page_size=3
-)
-
-assessments = assessments_response.get("results", [])
+assessments = query_all(notion, DB_ASSESSMENTS, limit=3)
 print(f"✅ Found {len(assessments)} assessment records\n")
 
 if assessments:
@@ -12,11 +12,14 @@ if sys.platform == "win32":
 from dotenv import load_dotenv
 from notion_client import Client
 
+from notion_query import iter_database_pages
+from notion_scheduler import rate_limited
+
 # Load environment
 load_dotenv()
 
 # Initialize Notion client
-notion = Client(auth=os.getenv("NOTION_API_KEY"))
+notion = rate_limited(Client(auth=os.getenv("NOTION_API_KEY")))
 
 # Database IDs
 DB_PATIENTS = os.getenv("NOTION_DATABASE_ID_PATIENTS")
@@ -45,15 +48,16 @@ if not has_id_field:
 
 # Get all patients
 print("\n[2/2] Fetching patient records...")
-patients_response = notion.databases.query(
-    database_id=DB_PATIENTS,
+patients = iter_database_pages(
+    notion,
+    DB_PATIENTS,
     filter={"property": "Status", "select": {"equals": "Active"}}
 )
 
 print(f"\n{'Name':<20} | {'Status':<10} | {'Page ID (last 6)'}")
 print("-" * 60)
 
-for patient in patients_response.get("results", []):
+for patient in patients:
     patient_id = patient["id"]
     props = patient.get("properties", {})
 
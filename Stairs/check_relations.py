@@ -12,11 +12,13 @@ if sys.platform == "win32":
 from dotenv import load_dotenv
 from notion_client import Client
 
+from notion_scheduler import rate_limited
+
 # Load environment
 load_dotenv()
 
 # Initialize Notion client
-notion = Client(auth=os.getenv("NOTION_API_KEY"))
+notion = rate_limited(Client(auth=os.getenv("NOTION_API_KEY")))
 
 # Database IDs
 DB_PATIENTS = os.getenv("NOTION_DATABASE_ID_PATIENTS")
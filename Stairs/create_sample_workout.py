@@ -13,11 +13,14 @@ from dotenv import load_dotenv
 from notion_client import Client
 from datetime import datetime, timedelta
 
+from notion_query import first_page, iter_database_pages
+from notion_scheduler import rate_limited
+
 # Load environment
 load_dotenv()
 
 # Initialize Notion client
-notion = Client(auth=os.getenv("NOTION_API_KEY"))
+notion = rate_limited(Client(auth=os.getenv("NOTION_API_KEY")))
 
 # Database IDs
 DB_PATIENTS = os.getenv("NOTION_DATABASE_ID_PATIENTS")
@@ -30,14 +33,15 @@ print("="*60)
 
 # Get first 3 active patients
 print("\n[1/4] Fetching patients...")
-patients_response = notion.databases.query(
-    database_id=DB_PATIENTS,
+patient_pages = iter_database_pages(
+    notion,
+    DB_PATIENTS,
     filter={"property": "Status", "select": {"equals": "Active"}},
-    page_size=3
+    limit=3
 )
 
 patients = []
-for page in patients_response.get("results", []):
+for page in patient_pages:
     props = page.get("properties", {})
     name_prop = props.get("Name", {}).get("title", [])
     name = name_prop[0].get("plain_text", "") if name_prop else "Unknown"
@@ -47,11 +51,8 @@ print(f"✅ Found {len(patients)} patients")
 
 # Get first trainer
 print("\n[2/4] Fetching trainer...")
-trainers_response = notion.databases.query(
-    database_id=DB_TRAINERS,
-    page_size=1
-)
-trainer_id = trainers_response["results"][0]["id"] if trainers_response["results"] else None
+trainer = first_page(notion, DB_TRAINERS)
+trainer_id = trainer["id"] if trainer else None
 print(f"✅ Trainer ID: {trainer_id[:8]}...")
 
 # Create sample workouts for each patient
@@ -0,0 +1,665 @@
+"""
+Local stand-ins for the Notion API and the Groq chat endpoint
+
+Serves a generated gym dataset over the same HTTP API the notion_client and
+groq clients use, so main.py and the generate_* scripts can run (and be
+timed) without credentials:
+
+- Notion: databases query (filters, sorts, cursors, filter_properties),
+  retrieve and update; pages retrieve, create and update
+- Groq: chat completions returning canned JSON for the keys the prompt
+  asks for (streamed when stream=True), with x-ratelimit-* headers drawn
+  from a per-minute token/request budget
+
+Both servers add configurable latency and can inject 429 responses. The
+dataset is generated from a seed, so runs are reproducible.
+
+Usage:
+    python fake_servers.py
+
+    then point the clients at it (the script prints these):
+    NOTION_BASE_URL=http://127.0.0.1:8010
+    GROQ_BASE_URL=http://127.0.0.1:8011
+    NOTION_DATABASE_ID_*=<printed IDs>
+
+Configuration (environment):
+    FAKE_HOST                   bind address (default: 127.0.0.1)
+    FAKE_NOTION_PORT            Notion port (default: 8010)
+    FAKE_GROQ_PORT              Groq port (default: 8011)
+    FAKE_SEED                   dataset seed (default: 42)
+    FAKE_PATIENTS               patients generated (default: 50)
+    FAKE_WORKOUTS_PER_PATIENT   workouts per patient (default: 12)
+    FAKE_DAYS                   days the workouts are spread over (default: 30)
+    FAKE_NOTION_LATENCY_MS      added to every Notion response (default: 150)
+    FAKE_GROQ_LATENCY_MS        added to every completion (default: 1500)
+    FAKE_NOTION_429_RATE        fraction of Notion requests answered 429 (default: 0)
+    FAKE_GROQ_429_RATE          fraction of Groq requests answered 429 (default: 0)
+    FAKE_GROQ_TPM               Groq tokens per minute before 429s (default: 60000)
+    FAKE_GROQ_RPM               Groq requests per minute before 429s (default: 1000)
+"""
+
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from notion_mirror import matches_filter, normalize_id, project_page, sort_pages
+
+# Database schemas: property name -> type (mirrors notion_records field maps)
+SCHEMAS = {
+    "PATIENTS": {
+        "Name": "title", "Patient ID": "unique_id", "Status": "select", "Email": "email",
+        "Phone": "phone_number", "Weight (kg)": "number", "Height (cm)": "number",
+        "Chest (cm)": "number", "Waist (cm)": "number", "Hips (cm)": "number",
+        "Thigh (cm)": "number", "Arm (cm)": "number", "Workout logs": "relation",
+        "monthly Logs": "relation", "Assigned Trainer": "relation",
+    },
+    "TRAINERS": {"Name": "title", "Trainer ID": "unique_id"},
+    "ASSESSMENT LOGS": {
+        "Assessment ID": "title", "Assessment Date": "date", "Strength Score": "number",
+        "Mobility Score": "number", "Balance Score": "number", "Flexibility Score": "number",
+        "Goals Set": "rich_text", "Program Suggested": "rich_text", "Trainer Notes": "rich_text",
+        "Patient": "relation",
+    },
+    "WORKOUT LOGS": {
+        "Log ID": "title", "Date": "date", "Duration (min)": "number",
+        "Exercises & Sets": "rich_text", "Focus Areas": "multi_select",
+        "What I Noticed": "rich_text", "What's Improving": "rich_text",
+        "Concerns/Issues": "rich_text", "Overall Session Rating": "select",
+        "Patient Self-Rating": "select", "Patient Comments": "rich_text",
+        "Patient": "relation", "Trainer": "relation",
+    },
+    "WEEKLY LOGS": {
+        "Week ID": "title", "Week Start": "date", "Week End": "date", "Generated Date": "date",
+        "Total Sessions": "number", "Total Minutes": "number", "Attendance Rate": "number",
+        "Weekly Summary": "rich_text", "Key Improvements": "rich_text",
+        "Concerns Noted": "rich_text", "Recommendations": "rich_text", "patient": "relation",
+        "Source Fingerprint": "rich_text",
+    },
+    "MONTHLY LOGS": {
+        "Month ID": "title", "Month Start": "date", "Month End": "date", "Generated Date": "date",
+        "Total Sessions": "number", "Total Minutes": "number", "Attendance Rate": "number",
+        "Monthly Summary": "rich_text", "Major Achievements": "rich_text",
+        "Challenges": "rich_text", "Next Month Focus": "rich_text",
+        "Trainer Comments": "rich_text", "End Weight": "number", "Patient": "relation",
+        "Source Fingerprint": "rich_text",
+    },
+}
+
+# Same names as notion_mirror.DATABASE_ENV_VARS
+DATABASE_ENV_VARS = {
+    "PATIENTS": "NOTION_DATABASE_ID_PATIENTS",
+    "TRAINERS": "NOTION_DATABASE_ID_TRAINERS",
+    "ASSESSMENT LOGS": "NOTION_DATABASE_ID_ASSESSMENTS",
+    "WORKOUT LOGS": "NOTION_DATABASE_ID_WORKOUTS",
+    "WEEKLY LOGS": "NOTION_DATABASE_ID_WEEKLY",
+    "MONTHLY LOGS": "NOTION_DATABASE_ID_MONTHLY",
+}
+
+EXERCISES = ["Squats 3x10 @ 40kg", "Deadlifts 3x8 @ 60kg", "Bench press 4x8 @ 35kg", "Lunges 3x12",
+             "Plank 3x45s", "Rows 3x10 @ 25kg", "Step-ups 3x12", "Treadmill 15 min"]
+FOCUS_AREAS = ["Strength", "Mobility", "Balance", "Cardio", "Flexibility"]
+NOTES = ["Good form on compound lifts", "Knee tracking improved", "Needed extra rest between sets",
+         "Increased weight on squats", "Balance still unsteady on left side", "Very motivated today"]
+RATINGS = ["⭐⭐⭐ Average", "⭐⭐⭐⭐ Good", "⭐⭐⭐⭐⭐ Excellent"]
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+# ============================================================================
+# NOTION PROPERTY VALUES
+# ============================================================================
+
+def _rich_text(text: str) -> List[Dict[str, Any]]:
+    if not text:
+        return []
+    return [{"type": "text", "text": {"content": text, "link": None}, "plain_text": text, "href": None}]
+
+
+def _property_value(prop_type: str, value: Any) -> Any:
+    """Read-format property value from a plain Python value"""
+    if prop_type in ("title", "rich_text"):
+        return _rich_text(value)
+    if prop_type == "date":
+        return {"start": value, "end": None, "time_zone": None} if value else None
+    if prop_type == "select":
+        return {"name": value} if value else None
+    if prop_type == "multi_select":
+        return [{"name": name} for name in value or []]
+    if prop_type == "relation":
+        return [{"id": page_id} for page_id in value or []]
+    if prop_type == "unique_id":
+        return {"prefix": None, "number": value}
+    return value
+
+
+def _normalize_written(prop_type: str, value: Any) -> Any:
+    """Read-format property value from a create/update payload value"""
+    if prop_type in ("title", "rich_text"):
+        return _rich_text("".join(item.get("text", {}).get("content", "") for item in value or []))
+    if prop_type == "date" and value:
+        return {"start": value.get("start"), "end": value.get("end"), "time_zone": None}
+    return value
+
+
+def _infer_type(payload: Dict[str, Any]) -> str:
+    """Property type of a write payload like {"rich_text": [...]}"""
+    for key in payload:
+        if key not in ("id", "type"):
+            return key
+    return "rich_text"
+
+
+# ============================================================================
+# NOTION STORE
+# ============================================================================
+
+class NotionStore:
+    """In-memory databases and pages behind the fake Notion API"""
+
+    def __init__(self, seed: int):
+        self._lock = threading.Lock()
+        self._namespace = uuid.UUID(int=seed)
+        self.databases: Dict[str, Dict[str, Any]] = {}
+        self.pages: Dict[str, Dict[str, Any]] = {}
+        self.database_ids: Dict[str, str] = {}
+        for index, (name, schema) in enumerate(SCHEMAS.items()):
+            database_id = str(uuid.uuid5(self._namespace, f"database:{name}"))
+            self.database_ids[name] = database_id
+            self.databases[normalize_id(database_id)] = {
+                "object": "database",
+                "id": database_id,
+                "title": _rich_text(name),
+                "properties": {},
+            }
+            for prop_name, prop_type in schema.items():
+                self._add_property(database_id, prop_name, prop_type)
+
+    def _add_property(self, database_id: str, name: str, prop_type: str):
+        properties = self.databases[normalize_id(database_id)]["properties"]
+        prop_id = "title" if prop_type == "title" else f"p{len(properties):03d}"
+        properties[name] = {"id": prop_id, "name": name, "type": prop_type, prop_type: {}}
+
+    def _page_properties(self, database_id: str, values: Dict[str, Any], written: bool) -> Dict[str, Any]:
+        schema = self.databases[normalize_id(database_id)]["properties"]
+        properties = {}
+        for name, value in values.items():
+            if name not in schema:
+                # Lenient: unknown properties in a write extend the schema
+                self._add_property(database_id, name, _infer_type(value) if written else "rich_text")
+            prop = schema[name]
+            prop_type = prop["type"]
+            content = _normalize_written(prop_type, value.get(prop_type)) if written else _property_value(prop_type, value)
+            properties[name] = {"id": prop["id"], "type": prop_type, prop_type: content}
+        return properties
+
+    def add_page(self, database_id: str, values: Dict[str, Any], page_id: Optional[str] = None,
+                 written: bool = False, timestamp: Optional[str] = None) -> Dict[str, Any]:
+        page_id = page_id or str(uuid.uuid4())
+        timestamp = timestamp or _now()
+        page = {
+            "object": "page",
+            "id": page_id,
+            "created_time": timestamp,
+            "last_edited_time": timestamp,
+            "parent": {"type": "database_id", "database_id": database_id},
+            "archived": False,
+            "properties": self._page_properties(database_id, values, written),
+            "url": f"https://www.notion.so/{normalize_id(page_id)}",
+        }
+        # Fill unset schema properties with empty values, as Notion does
+        for name, prop in self.databases[normalize_id(database_id)]["properties"].items():
+            if name not in page["properties"]:
+                prop_type = prop["type"]
+                page["properties"][name] = {"id": prop["id"], "type": prop_type, prop_type: _property_value(prop_type, None)}
+        self.pages[normalize_id(page_id)] = page
+        return page
+
+    # ------------------------------------------------------------------ API
+
+    def query(self, database_id: str, body: Dict[str, Any], filter_properties: List[str]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if normalize_id(database_id) not in self.databases:
+                return None
+            pages = [
+                page for page in self.pages.values()
+                if normalize_id(page["parent"].get("database_id")) == normalize_id(database_id)
+                and matches_filter(page, body.get("filter"))
+            ]
+        pages = sort_pages(pages, body.get("sorts"))
+        offset = int(body.get("start_cursor") or 0)
+        end = offset + min(int(body.get("page_size") or 100), 100)
+        has_more = end < len(pages)
+        return {
+            "object": "list",
+            "results": [project_page(page, filter_properties) for page in pages[offset:end]],
+            "has_more": has_more,
+            "next_cursor": str(end) if has_more else None,
+            "type": "page_or_database",
+            "page_or_database": {},
+        }
+
+    def retrieve_database(self, database_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self.databases.get(normalize_id(database_id))
+
+    def update_database(self, database_id: str, body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            database = self.databases.get(normalize_id(database_id))
+            if database is None:
+                return None
+            for name, spec in (body.get("properties") or {}).items():
+                if name not in database["properties"]:
+                    self._add_property(database_id, name, _infer_type(spec))
+            return database
+
+    def retrieve_page(self, page_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self.pages.get(normalize_id(page_id))
+
+    def create_page(self, body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        database_id = (body.get("parent") or {}).get("database_id")
+        with self._lock:
+            if normalize_id(database_id) not in self.databases:
+                return None
+            return self.add_page(database_id, body.get("properties") or {}, written=True)
+
+    def update_page(self, page_id: str, body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            page = self.pages.get(normalize_id(page_id))
+            if page is None:
+                return None
+            database_id = page["parent"]["database_id"]
+            page["properties"].update(self._page_properties(database_id, body.get("properties") or {}, written=True))
+            if "archived" in body:
+                page["archived"] = bool(body["archived"])
+            page["last_edited_time"] = _now()
+            return page
+
+
+def generate_dataset(store: NotionStore, seed: int, patients: int, workouts_per_patient: int, days: int):
+    """Fill the store with trainers, patients, workouts and assessments"""
+    rng = random.Random(seed)
+    ids = store.database_ids
+    now = datetime.now()
+    created = (now - timedelta(days=days + 1)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+    def page_id(kind: str, number: int) -> str:
+        return str(uuid.uuid5(store._namespace, f"{kind}:{number}"))
+
+    trainer_ids = []
+    for t in range(1, max(1, patients // 10) + 1):
+        trainer_ids.append(page_id("trainer", t))
+        store.add_page(ids["TRAINERS"], {"Name": f"Trainer {t:02d}", "Trainer ID": t},
+                       page_id=trainer_ids[-1], timestamp=created)
+
+    log_number = 0
+    for p in range(1, patients + 1):
+        patient_page_id = page_id("patient", p)
+        workout_ids = []
+        for w in range(workouts_per_patient):
+            log_number += 1
+            date = (now - timedelta(days=rng.randrange(days))).strftime("%Y-%m-%d")
+            # About a third of sessions have no written notes (sparse weeks)
+            noted = rng.random() > 0.33
+            workout_ids.append(page_id("workout", log_number))
+            store.add_page(ids["WORKOUT LOGS"], {
+                "Log ID": f"WL-{p:03d}-{w + 1:03d}",
+                "Date": date,
+                "Duration (min)": rng.choice([30, 45, 60, 75, 90]),
+                "Exercises & Sets": ", ".join(rng.sample(EXERCISES, 3)),
+                "Focus Areas": rng.sample(FOCUS_AREAS, 2),
+                "What I Noticed": rng.choice(NOTES) if noted else "",
+                "What's Improving": rng.choice(NOTES) if noted else "",
+                "Concerns/Issues": rng.choice(NOTES) if noted and rng.random() < 0.3 else "",
+                "Overall Session Rating": rng.choice(RATINGS),
+                "Patient Self-Rating": rng.choice(RATINGS),
+                "Patient Comments": "Felt good" if noted and rng.random() < 0.5 else "",
+                "Patient": [patient_page_id],
+                "Trainer": [rng.choice(trainer_ids)],
+            }, page_id=workout_ids[-1], timestamp=created)
+
+        if rng.random() < 0.4:
+            store.add_page(ids["ASSESSMENT LOGS"], {
+                "Assessment ID": f"ASSESS-{p:03d}-001",
+                "Assessment Date": (now - timedelta(days=rng.randrange(days))).strftime("%Y-%m-%d"),
+                "Strength Score": rng.randint(40, 95),
+                "Mobility Score": rng.randint(40, 95),
+                "Balance Score": rng.randint(40, 95),
+                "Flexibility Score": rng.randint(40, 95),
+                "Goals Set": "Improve squat depth and single-leg balance",
+                "Program Suggested": "3x/week strength, 2x/week mobility",
+                "Trainer Notes": rng.choice(NOTES),
+                "Patient": [patient_page_id],
+            }, timestamp=created)
+
+        store.add_page(ids["PATIENTS"], {
+            "Name": f"Patient {p:03d}",
+            "Patient ID": p,
+            "Status": "Active" if rng.random() < 0.9 else "Inactive",
+            "Email": f"patient{p:03d}@example.com",
+            "Phone": f"+9198765{p:05d}",
+            "Weight (kg)": round(rng.uniform(50, 100), 1),
+            "Height (cm)": round(rng.uniform(150, 190), 1),
+            "Waist (cm)": round(rng.uniform(65, 110), 1),
+            "Workout logs": workout_ids,
+            "Assigned Trainer": [trainer_ids[(p - 1) % len(trainer_ids)]],
+        }, page_id=patient_page_id, timestamp=created)
+
+
+# ============================================================================
+# GROQ RESPONSES
+# ============================================================================
+
+WEEKLY_KEYS = ["summary", "improvements", "concerns", "recommendations"]
+
+
+def canned_reply(messages: List[Dict[str, Any]]) -> str:
+    """JSON reply with the keys the prompt asks for"""
+    text = "\n".join(str(message.get("content", "")) for message in messages)
+
+    patient_ids = re.findall(r"=== PATIENT (\S+)", text)
+    if patient_ids:
+        return json.dumps({
+            patient_id: {key: f"Canned {key} for {patient_id}." for key in WEEKLY_KEYS}
+            for patient_id in patient_ids
+        })
+
+    match = re.search(r"keys:\s*([a-z_]+(?:,\s*[a-z_]+)*)", text)
+    if match:
+        keys = [key.strip() for key in match.group(1).split(",")]
+    else:
+        keys = re.findall(r'"([a-z_]+)":\s*"', text) or WEEKLY_KEYS
+    return json.dumps({key: f"Canned {key.replace('_', ' ')}." for key in dict.fromkeys(keys)})
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class GroqBudget:
+    """Per-minute token and request budget reported in x-ratelimit-* headers"""
+
+    def __init__(self, tokens_per_minute: int, requests_per_minute: int):
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._tokens = 0
+        self._requests = 0
+
+    def take(self, tokens: int) -> Tuple[bool, Dict[str, str]]:
+        """Charge a request; returns (allowed, rate-limit headers)"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= 60:
+                self._window_start, self._tokens, self._requests = now, 0, 0
+            reset = 60 - (now - self._window_start)
+            allowed = (self._tokens + tokens <= self.tokens_per_minute
+                       and self._requests + 1 <= self.requests_per_minute)
+            if allowed:
+                self._tokens += tokens
+                self._requests += 1
+            headers = {
+                "x-ratelimit-limit-requests": str(self.requests_per_minute),
+                "x-ratelimit-limit-tokens": str(self.tokens_per_minute),
+                "x-ratelimit-remaining-requests": str(self.requests_per_minute - self._requests),
+                "x-ratelimit-remaining-tokens": str(self.tokens_per_minute - self._tokens),
+                "x-ratelimit-reset-requests": f"{reset:.2f}s",
+                "x-ratelimit-reset-tokens": f"{reset:.2f}s",
+            }
+            if not allowed:
+                headers["retry-after"] = str(max(1, int(reset)))
+            return allowed, headers
+
+
+# ============================================================================
+# HTTP HANDLERS
+# ============================================================================
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency_ms = 0.0
+    error_rate = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+    def _send(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _delay(self):
+        if self.latency_ms:
+            # +/-20% jitter so concurrent requests don't finish in lockstep
+            time.sleep(self.latency_ms * random.uniform(0.8, 1.2) / 1000)
+
+    def _injected_429(self) -> bool:
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+
+class NotionHandler(_Handler):
+    store: NotionStore = None
+
+    def _not_found(self, what: str):
+        self._send(404, {"object": "error", "status": 404, "code": "object_not_found",
+                         "message": f"Could not find {what}."})
+
+    def _handle(self, method: str):
+        self._delay()
+        body = self._body() if method in ("POST", "PATCH") else {}
+        if self._injected_429():
+            self._send(429, {"object": "error", "status": 429, "code": "rate_limited",
+                             "message": "You have been rate limited. Please try again in a few minutes."},
+                       {"Retry-After": "1"})
+            return
+
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        if parts[:1] != ["v1"] or len(parts) < 2:
+            self._not_found("endpoint")
+            return
+        resource, rest = parts[1], parts[2:]
+
+        if resource == "databases" and len(rest) == 2 and rest[1] == "query" and method == "POST":
+            filter_properties = parse_qs(url.query).get("filter_properties", [])
+            result = self.store.query(rest[0], body, filter_properties)
+        elif resource == "databases" and len(rest) == 1 and method == "GET":
+            result = self.store.retrieve_database(rest[0])
+        elif resource == "databases" and len(rest) == 1 and method == "PATCH":
+            result = self.store.update_database(rest[0], body)
+        elif resource == "pages" and not rest and method == "POST":
+            result = self.store.create_page(body)
+        elif resource == "pages" and len(rest) == 1 and method == "GET":
+            result = self.store.retrieve_page(rest[0])
+        elif resource == "pages" and len(rest) == 1 and method == "PATCH":
+            result = self.store.update_page(rest[0], body)
+        else:
+            self._not_found("endpoint")
+            return
+
+        if result is None:
+            self._not_found(f"{resource[:-1]} with ID: {rest[0] if rest else ''}")
+        else:
+            self._send(200, result)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+
+class GroqHandler(_Handler):
+    budget: GroqBudget = None
+
+    def do_POST(self):
+        body = self._body()
+        if urlparse(self.path).path.rstrip("/") != "/openai/v1/chat/completions":
+            self._send(404, {"error": {"message": "Unknown endpoint", "type": "invalid_request_error"}})
+            return
+
+        messages = body.get("messages") or []
+        content = canned_reply(messages)
+        prompt_tokens = sum(_estimate_tokens(str(m.get("content", ""))) for m in messages)
+        completion_tokens = _estimate_tokens(content)
+
+        allowed, headers = self.budget.take(prompt_tokens + completion_tokens)
+        if not allowed or self._injected_429():
+            headers.setdefault("retry-after", "1")
+            self._send(429, {"error": {"message": "Rate limit reached", "type": "tokens",
+                                       "code": "rate_limit_exceeded"}}, headers)
+            return
+
+        completion_id = f"chatcmpl-{uuid.uuid4()}"
+        created = int(time.time())
+        model = body.get("model", "llama-3.3-70b-versatile")
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+
+        if body.get("stream"):
+            self._stream(completion_id, created, model, content, usage, headers)
+            return
+
+        self._delay()
+        self._send(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                         "finish_reason": "stop", "logprobs": None}],
+            "usage": usage,
+            "system_fingerprint": "fp_fake",
+            "x_groq": {"id": f"req_{uuid.uuid4().hex}"},
+        }, headers)
+
+    def _stream(self, completion_id: str, created: int, model: str, content: str,
+                usage: Dict[str, int], headers: Dict[str, str]):
+        """Send the reply as chat.completion.chunk server-sent events spread over the latency"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.close_connection = True
+
+        pieces = [content[i:i + 16] for i in range(0, len(content), 16)]
+        delay = self.latency_ms / 1000 / max(1, len(pieces))
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, extra: Optional[Dict] = None):
+            event = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                     "model": model, "system_fingerprint": "fp_fake",
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason, "logprobs": None}]}
+            event.update(extra or {})
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        chunk({"role": "assistant", "content": ""})
+        for piece in pieces:
+            time.sleep(delay)
+            chunk({"content": piece})
+        chunk({}, "stop", {"x_groq": {"id": f"req_{uuid.uuid4().hex}", "usage": usage}})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def _handler(base, **attributes):
+    """Handler subclass bound to this server's settings"""
+    return type(base.__name__, (base,), attributes)
+
+
+def start_servers(host: str = None, notion_port: int = None, groq_port: int = None):
+    """
+    Build the dataset and serve both fakes on background threads
+
+    Returns:
+        (notion server, groq server, store) - call shutdown() on the servers to stop
+    """
+    host = host or os.getenv("FAKE_HOST", "127.0.0.1")
+    notion_port = _env_int("FAKE_NOTION_PORT", 8010) if notion_port is None else notion_port
+    groq_port = _env_int("FAKE_GROQ_PORT", 8011) if groq_port is None else groq_port
+    seed = _env_int("FAKE_SEED", 42)
+
+    store = NotionStore(seed)
+    generate_dataset(store, seed, _env_int("FAKE_PATIENTS", 50),
+                     _env_int("FAKE_WORKOUTS_PER_PATIENT", 12), _env_int("FAKE_DAYS", 30))
+
+    notion_server = ThreadingHTTPServer((host, notion_port), _handler(
+        NotionHandler, store=store,
+        latency_ms=_env_float("FAKE_NOTION_LATENCY_MS", 150),
+        error_rate=_env_float("FAKE_NOTION_429_RATE", 0),
+    ))
+    groq_server = ThreadingHTTPServer((host, groq_port), _handler(
+        GroqHandler, budget=GroqBudget(_env_int("FAKE_GROQ_TPM", 60000), _env_int("FAKE_GROQ_RPM", 1000)),
+        latency_ms=_env_float("FAKE_GROQ_LATENCY_MS", 1500),
+        error_rate=_env_float("FAKE_GROQ_429_RATE", 0),
+    ))
+    for server in (notion_server, groq_server):
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return notion_server, groq_server, store
+
+
+# Main execution
+if __name__ == "__main__":
+    # Fix encoding for Windows
+    if sys.platform == "win32":
+        sys.stdout.reconfigure(encoding='utf-8')
+
+    notion_server, groq_server, store = start_servers()
+    notion_host, notion_port = notion_server.server_address[:2]
+    groq_host, groq_port = groq_server.server_address[:2]
+
+    print("="*70)
+    print(" " * 15 + "FAKE NOTION + GROQ SERVERS")
+    print("="*70)
+    print(f"\n📦 Dataset: {len(store.pages)} pages (seed {_env_int('FAKE_SEED', 42)})")
+    print(f"\n🔧 Point the clients here (e.g. in .env):")
+    print(f"   NOTION_BASE_URL=http://{notion_host}:{notion_port}")
+    print(f"   GROQ_BASE_URL=http://{groq_host}:{groq_port}")
+    print(f"   NOTION_API_KEY=fake")
+    print(f"   GROQ_API_KEY=fake")
+    for name, env_var in DATABASE_ENV_VARS.items():
+        print(f"   {env_var}={store.database_ids[name]}")
+    print("\nPress Ctrl+C to stop")
+    print("="*70)
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        notion_server.shutdown()
+        groq_server.shutdown()
@@ -15,17 +15,24 @@ from dotenv import load_dotenv
 from notion_client import Client
 from datetime import datetime
 
+from notion_query import iter_database_pages
+from id_resolver import get_id_resolver
+from notion_scheduler import rate_limited
+
 # Load environment
 load_dotenv()
 
 # Initialize Notion client
-notion = Client(auth=os.getenv("NOTION_API_KEY"))
+notion = rate_limited(Client(auth=os.getenv("NOTION_API_KEY")))
 
 # Database IDs
 DB_PATIENTS = os.getenv("NOTION_DATABASE_ID_PATIENTS")
 DB_WEEKLY = os.getenv("NOTION_DATABASE_ID_WEEKLY")
 DB_MONTHLY = os.getenv("NOTION_DATABASE_ID_MONTHLY")
 
+# Patient display IDs, loaded once instead of retrieved per log
+id_resolver = get_id_resolver(notion)
+
 
 def get_text_from_rich_text(rich_text_array):
     """Extract plain text from Notion rich text array"""
@@ -34,51 +41,17 @@ def get_text_from_rich_text(rich_text_array):
     return "".join([item.get("plain_text", "") for item in rich_text_array])
 
 
-def get_patient_id(patient_page_id):
-    """Get the patient ID (numeric) from patient record"""
-    try:
-        patient = notion.pages.retrieve(page_id=patient_page_id)
-        props = patient.get("properties", {})
-
-        # Try different possible field names for patient ID
-        for field_name in ["ID", "Id", "Patient ID", "id"]:
-            if field_name in props:
-                id_prop = props[field_name]
-
-                # Handle unique_id type
-                if id_prop.get("type") == "unique_id":
-                    unique_id_data = id_prop.get("unique_id")
-                    if unique_id_data and unique_id_data.get("number"):
-                        patient_id = unique_id_data.get("number")
-                        return f"{patient_id:03d}"  # Format as 001, 002, etc.
-
-                # Handle number type
-                elif id_prop.get("type") == "number":
-                    patient_id = id_prop.get("number")
-                    if patient_id:
-                        return f"{int(patient_id):03d}"
-
-        # If no ID field found, use page_id last 3 chars
-        return patient_page_id[-3:]
-
-    except Exception as e:
-        print(f"   Error getting patient ID: {e}")
-        return "000"
-
-
 print("="*75)
 print(" " * 15 + "FIX WEEKLY & MONTHLY LOG NAMING CONVENTION")
 print("="*75)
 
 # ========== FIX WEEKLY LOGS ==========
 print("\n[1/4] Fixing WEEKLY LOGS...")
-weekly_response = notion.databases.query(database_id=DB_WEEKLY)
-weekly_logs = weekly_response.get("results", [])
-print(f"✅ Found {len(weekly_logs)} weekly logs")
-
 weekly_updates = []
+total_weekly = 0
 
-for log in weekly_logs:
+for log in iter_database_pages(notion, DB_WEEKLY):
+    total_weekly += 1
     log_id_page = log["id"]
     props = log.get("properties", {})
 
@@ -92,7 +65,7 @@ for log in weekly_logs:
         continue
 
     patient_page_id = patient_relations[0]["id"]
-    patient_id = get_patient_id(patient_page_id)
+    patient_id = id_resolver.patient_id(patient_page_id)
 
     # Get week start date to determine week number and year
     week_start_obj = props.get("Week Start", {}).get("date", {})
@@ -115,6 +88,7 @@ for log in weekly_logs:
             "new_id": new_week_id
         })
 
+print(f"✅ Found {total_weekly} weekly logs")
 print(f"✅ Need to update {len(weekly_updates)} weekly log names")
 
 # Update weekly logs
@@ -140,13 +114,11 @@ for i, update in enumerate(weekly_updates, 1):
 
 # ========== FIX MONTHLY LOGS ==========
 print("\n[3/4] Fixing MONTHLY LOGS...")
-monthly_response = notion.databases.query(database_id=DB_MONTHLY)
-monthly_logs = monthly_response.get("results", [])
-print(f"✅ Found {len(monthly_logs)} monthly logs")
-
 monthly_updates = []
+total_monthly = 0
 
-for log in monthly_logs:
+for log in iter_database_pages(notion, DB_MONTHLY):
+    total_monthly += 1
     log_id_page = log["id"]
     props = log.get("properties", {})
 
@@ -160,7 +132,7 @@ for log in monthly_logs:
         continue
 
     patient_page_id = patient_relations[0]["id"]
-    patient_id = get_patient_id(patient_page_id)
+    patient_id = id_resolver.patient_id(patient_page_id)
 
     # Get month start date to determine month name and year
     month_start_obj = props.get("Month Start", {}).get("date", {})
@@ -183,6 +155,7 @@ for log in monthly_logs:
             "new_id": new_month_id
         })
 
+print(f"✅ Found {total_monthly} monthly logs")
 print(f"✅ Need to update {len(monthly_updates)} monthly log names")
 
 # Update monthly logs
@@ -212,16 +185,16 @@ print(" " * 30 + "SUMMARY")
 print("="*75)
 
 print(f"\n📊 Weekly Logs:")
-print(f"   Total Logs: {len(weekly_logs)}")
+print(f"   Total Logs: {total_weekly}")
 print(f"   Logs Updated: {weekly_updated}")
 print(f"   Logs Failed: {weekly_failed}")
-print(f"   Logs Unchanged: {len(weekly_logs) - len(weekly_updates)}")
+print(f"   Logs Unchanged: {total_weekly - len(weekly_updates)}")
 
 print(f"\n📊 Monthly Logs:")
-print(f"   Total Logs: {len(monthly_logs)}")
+print(f"   Total Logs: {total_monthly}")
 print(f"   Logs Updated: {monthly_updated}")
 print(f"   Logs Failed: {monthly_failed}")
-print(f"   Logs Unchanged: {len(monthly_logs) - len(monthly_updates)}")
+print(f"   Logs Unchanged: {total_monthly - len(monthly_updates)}")
 
 if weekly_updated > 0 or monthly_updated > 0:
     print(f"\n✅ Successfully updated log names!")
@@ -12,11 +12,14 @@ if sys.platform == "win32":
 from dotenv import load_dotenv
 from notion_client import Client
 
+from notion_query import first_page, query_all
+from notion_scheduler import rate_limited
+
 # Load environment
 load_dotenv()
 
 # Initialize Notion client
-notion = Client(auth=os.getenv("NOTION_API_KEY"))
+notion = rate_limited(Client(auth=os.getenv("NOTION_API_KEY")))
 
 # Database IDs
 DB_PATIENTS = os.getenv("NOTION_DATABASE_ID_PATIENTS")
@@ -60,8 +63,7 @@ for prop_name, prop_data in patients_props.items():
 
 # Update existing weekly reports to use correct relation
 print("\n[3/3] Updating existing weekly reports...")
-weekly_response = notion.databases.query(database_id=DB_WEEKLY)
-weekly_reports = weekly_response.get("results", [])
+weekly_reports = query_all(notion, DB_WEEKLY)
 
 print(f"\nFound {len(weekly_reports)} weekly reports")
 
@@ -88,14 +90,13 @@ print("\n" + "="*60)
 print("VERIFICATION")
 print("="*60)
 
-patients_response = notion.databases.query(
-    database_id=DB_PATIENTS,
-    filter={"property": "Status", "select": {"equals": "Active"}},
-    page_size=1
+patient = first_page(
+    notion,
+    DB_PATIENTS,
+    filter={"property": "Status", "select": {"equals": "Active"}}
 )
 
-if patients_response.get("results"):
-    patient = patients_response["results"][0]
+if patient:
     patient_props = patient.get("properties", {})
     patient_name = patient_props.get("Name", {}).get("title", [])[0].get("plain_text", "")
 
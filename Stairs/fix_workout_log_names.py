@@ -15,79 +15,23 @@ from notion_client import Client
 from datetime import datetime
 from collections import defaultdict
 
+from notion_query import iter_database_pages
+from id_resolver import get_id_resolver
+from notion_scheduler import rate_limited
+
 # Load environment
 load_dotenv()
 
 # Initialize Notion client
-notion = Client(auth=os.getenv("NOTION_API_KEY"))
+notion = rate_limited(Client(auth=os.getenv("NOTION_API_KEY")))
 
 # Database IDs
 DB_PATIENTS = os.getenv("NOTION_DATABASE_ID_PATIENTS")
 DB_TRAINERS = os.getenv("NOTION_DATABASE_ID_TRAINERS")
 DB_WORKOUTS = os.getenv("NOTION_DATABASE_ID_WORKOUTS")
 
-
-def get_patient_id_from_name(patient_page_id):
-    """Get the patient ID (numeric) from patient record"""
-    try:
-        patient = notion.pages.retrieve(page_id=patient_page_id)
-        props = patient.get("properties", {})
-
-        # Try different possible field names for patient ID
-        for field_name in ["ID", "Id", "Patient ID", "id"]:
-            if field_name in props:
-                id_prop = props[field_name]
-
-                # Handle unique_id type
-                if id_prop.get("type") == "unique_id":
-                    unique_id_data = id_prop.get("unique_id")
-                    if unique_id_data and unique_id_data.get("number"):
-                        patient_id = unique_id_data.get("number")
-                        return f"{patient_id:03d}"  # Format as 001, 002, etc.
-
-                # Handle number type
-                elif id_prop.get("type") == "number":
-                    patient_id = id_prop.get("number")
-                    if patient_id:
-                        return f"{int(patient_id):03d}"
-
-        # If no ID field found, use page_id last 3 chars
-        return patient_page_id[-3:]
-
-    except Exception as e:
-        print(f"   Error getting patient ID: {e}")
-        return "000"
-
-
-def get_trainer_id_from_trainer(trainer_page_id):
-    """Get the trainer ID from trainer record"""
-    try:
-        trainer = notion.pages.retrieve(page_id=trainer_page_id)
-        props = trainer.get("properties", {})
-
-        # Try different possible field names for trainer ID
-        for field_name in ["ID", "Id", "Trainer ID", "id"]:
-            if field_name in props:
-                id_prop = props[field_name]
-
-                # Handle unique_id type
-                if id_prop.get("type") == "unique_id":
-                    unique_id_data = id_prop.get("unique_id")
-                    if unique_id_data and unique_id_data.get("number"):
-                        trainer_id = unique_id_data.get("number")
-                        return f"T{trainer_id:03d}"  # Format as T001, T002, etc.
-
-                # Handle number type
-                elif id_prop.get("type") == "number":
-                    trainer_id = id_prop.get("number")
-                    if trainer_id:
-                        return f"T{int(trainer_id):03d}"
-
-        # Fallback to last 3 chars of page_id
-        return f"T{trainer_page_id[-3:]}"
-    except Exception as e:
-        print(f"   Error getting trainer ID: {e}")
-        return "T000"
+# Patient/trainer display IDs, loaded once instead of retrieved per workout
+id_resolver = get_id_resolver(notion)
 
 
 def get_text_from_rich_text(rich_text_array):
@@ -103,20 +47,20 @@ print("="*70)
 
 # Fetch all workout logs
 print("\n[1/4] Fetching all workout logs...")
-workouts_response = notion.databases.query(
-    database_id=DB_WORKOUTS,
+workout_pages = iter_database_pages(
+    notion,
+    DB_WORKOUTS,
     sorts=[{"property": "Date", "direction": "ascending"}]
 )
 
-workouts = workouts_response.get("results", [])
-print(f"✅ Found {len(workouts)} workout logs")
-
 # Group workouts by patient and date for session numbering
 print("\n[2/4] Analyzing workout logs...")
 patient_date_sessions = defaultdict(lambda: defaultdict(int))
 workout_updates = []
+total_workouts = 0
 
-for workout in workouts:
+for workout in workout_pages:
+    total_workouts += 1
     workout_id = workout["id"]
     props = workout.get("properties", {})
 
@@ -139,13 +83,13 @@ for workout in workouts:
         continue
 
     patient_page_id = patient_relations[0]["id"]
-    patient_id = get_patient_id_from_name(patient_page_id)
+    patient_id = id_resolver.patient_id(patient_page_id)
 
     # Get trainer relation
     trainer_relations = props.get("Trainer", {}).get("relation", [])
     if trainer_relations:
         trainer_page_id = trainer_relations[0]["id"]
-        trainer_id = get_trainer_id_from_trainer(trainer_page_id)
+        trainer_id = id_resolver.trainer_id(trainer_page_id)
     else:
         trainer_id = "T000"  # Default if no trainer
 
@@ -163,6 +107,7 @@ for workout in workouts:
             "new_id": new_log_id
         })
 
+print(f"✅ Found {total_workouts} workout logs")
 print(f"✅ Need to update {len(workout_updates)} workout log names")
 
 # Update workout logs
@@ -188,13 +133,8 @@ for i, update in enumerate(workout_updates, 1):
 
 # Verification
 print("\n[4/4] Verification...")
-verify_response = notion.databases.query(
-    database_id=DB_WORKOUTS,
-    page_size=5
-)
-
 print("\nSample workout log names:")
-for i, workout in enumerate(verify_response.get("results", [])[:5], 1):
+for i, workout in enumerate(iter_database_pages(notion, DB_WORKOUTS, limit=5), 1):
     props = workout.get("properties", {})
     log_id = get_text_from_rich_text(props.get("Log ID", {}).get("title", []))
     workout_date = props.get("Date", {}).get("date", {}).get("start", "N/A")
@@ -206,10 +146,10 @@ print(" " * 25 + "SUMMARY")
 print("="*70)
 
 print(f"\n📊 Results:")
-print(f"   Total Workout Logs: {len(workouts)}")
+print(f"   Total Workout Logs: {total_workouts}")
 print(f"   Logs Updated: {updated_count}")
 print(f"   Logs Failed: {failed_count}")
-print(f"   Logs Unchanged: {len(workouts) - len(workout_updates)}")
+print(f"   Logs Unchanged: {total_workouts - len(workout_updates)}")
 
 if updated_count > 0:
     print(f"\n✅ Successfully updated {updated_count} workout log names!")
@@ -12,11 +12,14 @@ if sys.platform == "win32":
 from dotenv import load_dotenv
 from notion_client import Client
 
+from notion_query import first_page, query_all
+from notion_scheduler import rate_limited
+
 # Load environment
 load_dotenv()
 
 # Initialize Notion client
-notion = Client(auth=os.getenv("NOTION_API_KEY"))
+notion = rate_limited(Client(auth=os.getenv("NOTION_API_KEY")))
 
 # Database IDs
 DB_PATIENTS = os.getenv("NOTION_DATABASE_ID_PATIENTS")
@@ -28,8 +31,7 @@ print("="*60)
 
 # Get all workout logs
 print("\n[1/3] Fetching all workout logs...")
-workouts_response = notion.databases.query(database_id=DB_WORKOUTS)
-workout_logs = workouts_response.get("results", [])
+workout_logs = query_all(notion, DB_WORKOUTS)
 print(f"✅ Found {len(workout_logs)} workout logs")
 
 # Check and update each workout log
@@ -89,14 +91,13 @@ print("="*60)
 
 # Check one patient to see if workouts appear
 print("\nChecking if relations now appear in PATIENTS database...")
-patients_response = notion.databases.query(
-    database_id=DB_PATIENTS,
-    filter={"property": "Status", "select": {"equals": "Active"}},
-    page_size=1
+patient = first_page(
+    notion,
+    DB_PATIENTS,
+    filter={"property": "Status", "select": {"equals": "Active"}}
 )
 
-if patients_response.get("results"):
-    patient = patients_response["results"][0]
+if patient:
     patient_props = patient.get("properties", {})
     patient_name = patient_props.get("Name", {}).get("title", [])[0].get("plain_text", "")
 
@@ -10,17 +10,29 @@ if sys.platform == "win32":
     sys.stdout.reconfigure(encoding='utf-8')
 
 from dotenv import load_dotenv
-from notion_client import Client
-from groq import Groq
 from datetime import datetime, timedelta
 import json
 
+from notion_query import count_pages, prefetch_by_relation, query_all
+from change_tracker import ChangeTracker, FallbackSummary, fingerprint, saved_fingerprint
+from notion_records import (
+    PATIENT_PROPERTIES, WEEKLY_LOG_PROPERTIES, WORKOUT_PROPERTIES, decode_patient,
+    decode_weekly_log, decode_workout, patient_measurements
+)
+from prompt_budget import fit_blocks, section_budget
+from notion_scheduler import get_stats as get_notion_stats
+from groq_cache import get_stats as get_groq_cache_stats
+from groq_scheduler import get_stats as get_groq_stats, max_concurrency as groq_max_concurrency, summarize_in_order
+from groq_telemetry import get_stats as get_llm_stats, record_fallback
+import generate_all_weekly_reports as weekly_reports
+
 # Load environment
 load_dotenv()
 
-# Initialize clients
-notion = Client(auth=os.getenv("NOTION_API_KEY"))
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+# Share the weekly script's clients: one Notion scheduler, and one ID resolver scanning PATIENTS/TRAINERS
+notion = weekly_reports.notion
+groq_client = weekly_reports.groq_client
+id_resolver = weekly_reports.id_resolver
 
 # Database IDs
 DB_PATIENTS = os.getenv("NOTION_DATABASE_ID_PATIENTS")
@@ -28,89 +40,124 @@ DB_WORKOUTS = os.getenv("NOTION_DATABASE_ID_WORKOUTS")
 DB_WEEKLY = os.getenv("NOTION_DATABASE_ID_WEEKLY")
 DB_MONTHLY = os.getenv("NOTION_DATABASE_ID_MONTHLY")
 
+# Existing Month IDs and their source fingerprints, loaded once per run
+monthly_index = ChangeTracker(notion, DB_MONTHLY, "Month ID")
+
 
-def get_text_from_rich_text(rich_text_array):
-    """Extract plain text from Notion rich text array"""
-    if not rich_text_array:
-        return ""
-    return "".join([item.get("plain_text", "") for item in rich_text_array])
+def prefetch_workouts_by_patient(start_date: datetime):
+    """Fetch the workout window for every patient in one scan, keyed by patient page ID"""
+    pages_by_patient = prefetch_by_relation(
+        notion,
+        DB_WORKOUTS,
+        "Patient",
+        filter={"property": "Date", "date": {"on_or_after": start_date.isoformat()}},
+        sorts=[{"property": "Date", "direction": "ascending"}],
+        properties=WORKOUT_PROPERTIES
+    )
 
+    return {
+        patient_id: [decode_workout(page) for page in pages]
+        for patient_id, pages in pages_by_patient.items()
+    }
 
-def fetch_patient_workouts_monthly(patient_id: str, days: int = 30):
-    """Fetch all workout logs for a patient for the past month"""
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days)
 
-    response = notion.databases.query(
-        database_id=DB_WORKOUTS,
-        filter={
-            "and": [
-                {"property": "Patient", "relation": {"contains": patient_id}},
-                {"property": "Date", "date": {"on_or_after": start_date.isoformat()}}
-            ]
-        },
-        sorts=[{"property": "Date", "direction": "ascending"}]
+def prefetch_weekly_summaries_by_patient(start_date: datetime):
+    """Fetch the weekly summaries in the window for every patient in one scan"""
+    pages_by_patient = prefetch_by_relation(
+        notion,
+        DB_WEEKLY,
+        "patient",
+        filter={"property": "Week Start", "date": {"on_or_after": start_date.isoformat()}},
+        sorts=[{"property": "Week Start", "direction": "ascending"}],
+        properties=WEEKLY_LOG_PROPERTIES
     )
 
-    workouts = []
-    for page in response.get("results", []):
-        props = page.get("properties", {})
-        workouts.append({
-            "date": props.get("Date", {}).get("date", {}).get("start", ""),
-            "duration": props.get("Duration (min)", {}).get("number", 0),
-            "exercises": get_text_from_rich_text(props.get("Exercises & Sets", {}).get("rich_text", [])),
-            "noticed": get_text_from_rich_text(props.get("What I Noticed", {}).get("rich_text", [])),
-            "improving": get_text_from_rich_text(props.get("What's Improving", {}).get("rich_text", [])),
-            "concerns": get_text_from_rich_text(props.get("Concerns/Issues", {}).get("rich_text", [])),
-            "rating": props.get("Overall Session Rating", {}).get("select", {}).get("name") if props.get("Overall Session Rating", {}).get("select") else "N/A"
-        })
+    return {
+        patient_id: [decode_weekly_log(page) for page in pages]
+        for patient_id, pages in pages_by_patient.items()
+    }
 
-    return workouts
 
+def week_start_of(date_value: str):
+    """Monday of the week a date ("YYYY-MM-DD...") falls in"""
+    day = datetime.fromisoformat(date_value[:10])
+    return day - timedelta(days=day.weekday())
 
-def fetch_weekly_summaries(patient_id: str, days: int = 30):
-    """Fetch weekly summaries for the patient"""
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days)
 
-    response = notion.databases.query(
-        database_id=DB_WEEKLY,
-        filter={
-            "and": [
-                {"property": "patient", "relation": {"contains": patient_id}},
-                {"property": "Week Start", "date": {"on_or_after": start_date.isoformat()}}
-            ]
-        },
-        sorts=[{"property": "Week Start", "direction": "ascending"}]
-    )
+def plan_weeks(workouts: list, weekly_logs: list, month_start: datetime):
+    """
+    Split a month's workouts between stored weekly logs and weeks still to summarize
 
-    summaries = []
-    for page in response.get("results", []):
-        props = page.get("properties", {})
-        summaries.append({
-            "week_id": get_text_from_rich_text(props.get("Week ID", {}).get("title", [])),
-            "summary": get_text_from_rich_text(props.get("Weekly Summary", {}).get("rich_text", [])),
-            "improvements": get_text_from_rich_text(props.get("Key Improvements", {}).get("rich_text", [])),
-            "sessions": props.get("Total Sessions", {}).get("number", 0)
-        })
+    Stored logs are matched by their Week Start/Week End range, whichever
+    script or endpoint wrote them (their Week IDs and week boundaries differ).
+    A log is reused only while the workouts in its range still match the
+    fingerprint it was built from; a stale log is regenerated in place.
+    Workouts in the month that no log covers are grouped into Monday weeks.
 
-    return summaries
+    Args:
+        workouts: The patient's workouts, from a week before month_start
+        weekly_logs: The patient's weekly logs starting from a week before month_start
+        month_start: Start of the 30-day window
 
+    Returns:
+        (weekly logs to reuse, [(week start, week end, workouts, Week ID or None for a new log)])
+    """
+    first_day = month_start.strftime("%Y-%m-%d")
+    dated = [workout for workout in workouts if workout['date']]
+    claimed = set()
+    reused, missing = [], []
 
-def get_patient_measurements(patient_id: str):
-    """Get current patient measurements"""
-    patient = notion.pages.retrieve(page_id=patient_id)
-    props = patient.get("properties", {})
+    for log in sorted(weekly_logs, key=lambda log: log['week_start']):
+        start = log['week_start'][:10]
+        end = (log['week_end'] or log['week_start'])[:10]
+        if not start or end < first_day:
+            continue
 
-    return {
-        "weight": props.get("Weight (kg)", {}).get("number"),
-        "height": props.get("Height (cm)", {}).get("number"),
-        "chest": props.get("Chest (cm)", {}).get("number"),
-        "waist": props.get("Waist (cm)", {}).get("number"),
-        "hips": props.get("Hips (cm)", {}).get("number"),
-        "thigh": props.get("Thigh (cm)", {}).get("number"),
-        "arm": props.get("Arm (cm)", {}).get("number")
-    }
+        in_range = [w for w in dated if start <= w['date'][:10] <= end and w['id'] not in claimed]
+        # Rolling-window reports (the API, the weekly script) query from a time on their
+        # first day, so they may have been built without that day's workouts
+        after_start = [w for w in in_range if w['date'][:10] > start]
+        stored = weekly_reports.weekly_index.source_fingerprint(log['week_id'])
+        week_workouts = next((ws for ws in (in_range, after_start) if ws and fingerprint(ws) == stored), None)
+
+        if week_workouts is not None:
+            reused.append(log)
+        elif in_range:
+            week_workouts = in_range
+            missing.append((datetime.fromisoformat(start), datetime.fromisoformat(end), week_workouts, log['week_id']))
+        else:
+            continue
+        claimed.update(w['id'] for w in week_workouts)
+
+    weeks = {}
+    for workout in dated:
+        if workout['id'] not in claimed and workout['date'][:10] >= first_day:
+            weeks.setdefault(week_start_of(workout['date']), []).append(workout)
+    missing.extend(
+        (week_start, week_start + timedelta(days=6), week_workouts, None)
+        for week_start, week_workouts in weeks.items()
+    )
+    missing.sort(key=lambda week: week[0])
+    return reused, missing
+
+
+def month_fingerprint(workouts: list, weekly_logs: list):
+    """Fingerprint of a month built from weekly logs: its workouts plus each week's source fingerprint"""
+    weeks = [
+        {"id": log['week_id'], "last_edited_time": weekly_reports.weekly_index.source_fingerprint(log['week_id'])}
+        for log in weekly_logs
+    ]
+    return fingerprint(workouts, weeks)
+
+
+def weekly_block(number: int, weekly_log):
+    """One week's line(s) in the monthly prompt"""
+    block = f"Week {number}: {weekly_log['sessions']} sessions - {weekly_log['summary']}\n"
+    if weekly_log.get("improvements"):
+        block += f"  Improvements: {weekly_log['improvements']}\n"
+    if weekly_log.get("concerns"):
+        block += f"  Concerns: {weekly_log['concerns']}\n"
+    return block
 
 
 def generate_monthly_summary_with_groq(patient_name: str, workouts: list, weekly_summaries: list, measurements: dict):
@@ -133,10 +180,11 @@ def generate_monthly_summary_with_groq(patient_name: str, workouts: list, weekly
     # Prepare weekly summaries
     weekly_summary_text = ""
     if weekly_summaries:
-        weekly_summary_text = "\n".join([
-            f"Week {i+1}: {s['sessions']} sessions - {s['summary'][:100]}..."
-            for i, s in enumerate(weekly_summaries)
-        ])
+        weekly_summary_text = fit_blocks(
+            [weekly_block(i + 1, s) for i, s in enumerate(weekly_summaries)],
+            section_budget("weekly_summaries"),
+            "weeks"
+        )
     else:
         weekly_summary_text = "No weekly summaries available"
 
@@ -206,41 +254,27 @@ Each value should be a STRING (not array). Be factual and concise - NO filler te
 
     except Exception as e:
         print(f"       ⚠️  Error generating summary: {e}")
-        return {
+        record_fallback()
+        return FallbackSummary({
             "summary": f"{patient_name} completed {total_sessions} sessions this month ({total_minutes} minutes total).",
             "achievements": "See individual workout logs for details.",
             "challenges": "Unable to generate AI summary",
             "next_month_focus": "Continue with current program",
             "trainer_comments": "Monthly assessment pending"
-        }
+        })
 
 
-def get_patient_numeric_id(patient_page_id):
-    """Get the patient ID (numeric) from patient record"""
-    try:
-        patient = notion.pages.retrieve(page_id=patient_page_id)
-        props = patient.get("properties", {})
-
-        for field_name in ["ID", "Id", "Patient ID", "id"]:
-            if field_name in props:
-                id_prop = props[field_name]
-                if id_prop.get("type") == "unique_id":
-                    unique_id_data = id_prop.get("unique_id")
-                    if unique_id_data and unique_id_data.get("number"):
-                        return f"{unique_id_data.get('number'):03d}"
-                elif id_prop.get("type") == "number":
-                    patient_id = id_prop.get("number")
-                    if patient_id:
-                        return f"{int(patient_id):03d}"
-        return patient_page_id[-3:]
-    except:
-        return "000"
+def monthly_report_id(patient_id: str, month_start: datetime):
+    """Month ID for a patient's report, e.g. MONTHLY-001-JAN2026"""
+    month_name = month_start.strftime("%B").upper()[:3]  # JAN, FEB, MAR, etc.
+    patient_numeric_id = id_resolver.patient_id(patient_id)
+    return f"MONTHLY-{patient_numeric_id}-{month_name}{month_start.year}"
 
 
 def save_monthly_report_to_notion(patient_id: str, patient_name: str, month_start: datetime,
                                   month_end: datetime, workouts: list, summary_data: dict,
-                                  measurements: dict):
-    """Save monthly report to Notion MONTHLY LOGS database"""
+                                  measurements: dict, source_fingerprint: str = ""):
+    """Save monthly report to Notion MONTHLY LOGS database (overwrites it if its sources changed)"""
 
     # Calculate metrics
     total_sessions = len(workouts)
@@ -251,22 +285,16 @@ def save_monthly_report_to_notion(patient_id: str, patient_name: str, month_star
     attendance_rate = min((total_sessions / target_sessions) * 100, 100)
 
     # Generate month ID
-    month_name = month_start.strftime("%B").upper()[:3]  # JAN, FEB, MAR, etc.
-    year = month_start.year
-
-    # Get patient numeric ID for proper naming
-    patient_numeric_id = get_patient_numeric_id(patient_id)
-    month_id = f"MONTHLY-{patient_numeric_id}-{month_name}{year}"
+    month_id = monthly_report_id(patient_id, month_start)
+    existing_id = monthly_index.existing(month_id)
 
-    # Check if report already exists
-    existing = notion.databases.query(
-        database_id=DB_MONTHLY,
-        filter={"property": "Month ID", "title": {"equals": month_id}}
-    )
-
-    if existing.get("results"):
+    # Claim the ID for this run unless we are regenerating an existing report
+    if not existing_id and not monthly_index.reserve(month_id):
         return None, "Report already exists"
 
+    # A fallback summary is saved without a fingerprint so the next run retries it
+    source_fingerprint = saved_fingerprint(summary_data, source_fingerprint)
+
     # Create properties
     properties = {
         "Month ID": {
@@ -307,7 +335,8 @@ def save_monthly_report_to_notion(patient_id: str, patient_name: str, month_star
         },
         "Trainer Comments": {
             "rich_text": [{"text": {"content": summary_data.get("trainer_comments", "")[:2000]}}]
-        }
+        },
+        **monthly_index.fingerprint_properties(source_fingerprint)
     }
 
     # Add measurements if available
@@ -315,12 +344,18 @@ def save_monthly_report_to_notion(patient_id: str, patient_name: str, month_star
         properties["End Weight"] = {"number": measurements["weight"]}
 
     try:
-        page = notion.pages.create(
-            parent={"database_id": DB_MONTHLY},
-            properties=properties
-        )
+        if existing_id:
+            page = notion.pages.update(page_id=existing_id, properties=properties)
+        else:
+            page = notion.pages.create(
+                parent={"database_id": DB_MONTHLY},
+                properties=properties
+            )
+        monthly_index.record(month_id, page["id"], source_fingerprint)
         return page["id"], month_id
     except Exception as e:
+        if not existing_id:
+            monthly_index.release(month_id)
         return None, f"Error: {str(e)}"
 
 
@@ -330,32 +365,58 @@ if __name__ == "__main__":
     print(" " * 15 + "GENERATE MONTHLY REPORTS FOR ALL PATIENTS")
     print("="*70)
 
+    # --force regenerates every report even if its sources are unchanged
+    force = "--force" in sys.argv
+    # --from-weekly reduces stored weekly logs into the month, generating missing weeks first
+    hierarchical = "--from-weekly" in sys.argv
+
     # Get all active patients
     print("\n[1/3] Fetching active patients...")
-    patients_response = notion.databases.query(
-        database_id=DB_PATIENTS,
-        filter={"property": "Status", "select": {"equals": "Active"}}
+    patients = query_all(
+        notion,
+        DB_PATIENTS,
+        filter={"property": "Status", "select": {"equals": "Active"}},
+        properties=PATIENT_PROPERTIES
     )
-
-    patients = patients_response.get("results", [])
     print(f"✅ Found {len(patients)} active patients")
 
+    # Fetch the whole 30-day window once instead of querying per patient
+    month_end = datetime.now()
+    month_start = month_end - timedelta(days=30)
+    # Stored weeks can start up to a week before the window; fetch their workouts too
+    window_start = month_start - timedelta(days=7) if hierarchical else month_start
+    workouts_by_patient = prefetch_workouts_by_patient(window_start)
+    summaries_by_patient = prefetch_weekly_summaries_by_patient(window_start)
+    print(f"✅ Prefetched workouts for {len(workouts_by_patient)} patients")
+
+    monthly_index.ensure_property()
+    if hierarchical:
+        weekly_reports.weekly_index.ensure_property()
+
     # Process each patient
     print("\n[2/3] Generating reports for each patient...\n")
 
     reports_created = 0
+    reports_updated = 0
+    reports_unchanged = 0
     reports_skipped = 0
     reports_failed = 0
+    weeks_generated = 0
 
+    # Decide which patients need a report before spending any Groq calls
+    jobs = []
     for i, patient in enumerate(patients, 1):
         patient_id = patient["id"]
-        patient_props = patient["properties"]
-        patient_name = patient_props.get("Name", {}).get("title", [])[0].get("plain_text", "") if patient_props.get("Name", {}).get("title") else "Unknown"
+        patient_record = decode_patient(patient)
+        patient_name = patient_record.name or "Unknown"
 
         print(f"   [{i}/{len(patients)}] Processing: {patient_name}")
 
-        # Fetch workouts (past 30 days)
-        workouts = fetch_patient_workouts_monthly(patient_id, days=30)
+        # Workouts from the prefetched 30-day window
+        window_workouts = workouts_by_patient.get(patient_id, [])
+        workouts = window_workouts
+        if hierarchical:
+            workouts = [w for w in window_workouts if w['date'][:10] >= month_start.strftime("%Y-%m-%d")]
 
         if not workouts or len(workouts) < 3:
             print(f"       ⚠️  Insufficient workout data (need at least 3 sessions) - skipping")
@@ -364,30 +425,96 @@ if __name__ == "__main__":
 
         print(f"       📊 Found {len(workouts)} workouts ({sum([w['duration'] for w in workouts])} minutes)")
 
-        # Fetch weekly summaries
-        print(f"       📅 Fetching weekly summaries...")
-        weekly_summaries = fetch_weekly_summaries(patient_id, days=30)
-        print(f"       📄 Found {len(weekly_summaries)} weekly summaries")
-
-        # Get measurements
-        print(f"       📏 Fetching measurements...")
-        measurements = get_patient_measurements(patient_id)
+        # Weekly summaries from the prefetched window
+        weekly_summaries = summaries_by_patient.get(patient_id, [])
+        missing_weeks = []
+        if hierarchical:
+            weekly_summaries, missing_weeks = plan_weeks(window_workouts, weekly_summaries, month_start)
+            print(f"       📄 Reusing {len(weekly_summaries)} weekly logs, {len(missing_weeks)} week(s) to generate")
+            source_fingerprint = month_fingerprint(workouts, weekly_summaries)
+        else:
+            print(f"       📄 Found {len(weekly_summaries)} weekly summaries")
+            source_fingerprint = fingerprint(workouts, weekly_summaries)
+
+        # Skip patients whose workouts and weekly summaries haven't changed
+        month_id = monthly_report_id(patient_id, month_start)
+        if not force and not missing_weeks and monthly_index.unchanged(month_id, source_fingerprint):
+            print(f"       ℹ️  {month_id} is up to date - skipping")
+            reports_unchanged += 1
+            continue
 
-        # Generate AI summary
-        print(f"       🤖 Generating monthly summary...")
-        summary_data = generate_monthly_summary_with_groq(patient_name, workouts, weekly_summaries, measurements)
+        jobs.append({
+            "patient_id": patient_id,
+            "patient_name": patient_name,
+            "workouts": workouts,
+            "weekly_summaries": weekly_summaries,
+            "missing_weeks": missing_weeks,
+            # Measurements come from the patient page already fetched above
+            "measurements": patient_measurements(patient_record),
+            "fingerprint": source_fingerprint,
+            "fallback_weeks": False,
+            "regenerating": monthly_index.existing(month_id) is not None
+        })
 
-        # Save to Notion
-        print(f"       💾 Saving to Notion...")
-        month_end = datetime.now()
-        month_start = month_end - timedelta(days=30)
+    # Map step: summarize weeks with no (or a stale) weekly log and save them as WEEKLY LOGS
+    week_jobs = [(job, *week) for job in jobs for week in job["missing_weeks"]]
+    if week_jobs:
+        print(f"\n   🗓️  Generating {len(week_jobs)} missing weekly summaries (up to {groq_max_concurrency()} at a time)...\n")
+        week_summaries = summarize_in_order(
+            lambda week_job: weekly_reports.generate_weekly_summary(week_job[0]["patient_name"], week_job[3]),
+            week_jobs
+        )
+        for (job, week_start, week_end, week_workouts, week_id), summary_data in zip(week_jobs, week_summaries):
+            week_end = min(week_end, month_end)
+            # A stale log keeps its own Week ID and is updated in place
+            week_id = week_id or weekly_reports.weekly_report_id(job["patient_id"], week_start)
+            # save_weekly_report stores no fingerprint for a fallback, so the week is retried
+            report_id, result = weekly_reports.save_weekly_report(
+                job["patient_id"], job["patient_name"], week_workouts,
+                week_start, week_end, summary_data, fingerprint(week_workouts), week_id
+            )
+            if isinstance(summary_data, FallbackSummary):
+                job["fallback_weeks"] = True
+            if report_id:
+                print(f"       ✅ {job['patient_name']}: {result}")
+                weeks_generated += 1
+            else:
+                print(f"       ⚠️  {job['patient_name']}: weekly log not saved ({result})")
+
+            # The month is reduced from this summary whether or not the save succeeded
+            job["weekly_summaries"].append({
+                "week_id": week_id,
+                "week_start": week_start.strftime("%Y-%m-%d"),
+                "sessions": len(week_workouts),
+                **summary_data
+            })
+
+        for job in jobs:
+            if job["missing_weeks"]:
+                job["weekly_summaries"].sort(key=lambda log: log['week_start'])
+                # A month reduced from fallback weeks gets no fingerprint, so the next run rebuilds it
+                job["fingerprint"] = "" if job["fallback_weeks"] else month_fingerprint(job["workouts"], job["weekly_summaries"])
+
+    # Generate monthly summaries concurrently; save them in roster order as they finish
+    print(f"\n   🤖 Generating {len(jobs)} monthly summaries (up to {groq_max_concurrency()} at a time)...\n")
+    summaries = summarize_in_order(
+        lambda job: generate_monthly_summary_with_groq(
+            job["patient_name"], job["workouts"], job["weekly_summaries"], job["measurements"]
+        ),
+        jobs
+    )
 
+    for job, summary_data in zip(jobs, summaries):
+        print(f"   💾 Saving {job['patient_name']} to Notion...")
         report_id, result = save_monthly_report_to_notion(
-            patient_id, patient_name, month_start, month_end,
-            workouts, summary_data, measurements
+            job["patient_id"], job["patient_name"], month_start, month_end,
+            job["workouts"], summary_data, job["measurements"], job["fingerprint"]
         )
 
-        if report_id:
+        if report_id and job["regenerating"]:
+            print(f"       🔄 Report updated: {result}")
+            reports_updated += 1
+        elif report_id:
             print(f"       ✅ Report created: {result}")
             reports_created += 1
         elif "already exists" in result:
@@ -401,8 +528,7 @@ if __name__ == "__main__":
 
     # Summary
     print("\n[3/3] Verification...")
-    verify_response = notion.databases.query(database_id=DB_MONTHLY)
-    total_reports = len(verify_response.get("results", []))
+    total_reports = count_pages(notion, DB_MONTHLY)
 
     print("\n" + "="*70)
     print(" " * 25 + "SUMMARY")
@@ -411,10 +537,40 @@ if __name__ == "__main__":
     print(f"\n📊 Results:")
     print(f"   Total Patients: {len(patients)}")
     print(f"   Reports Created: {reports_created}")
+    print(f"   Reports Updated: {reports_updated}")
+    print(f"   Reports Unchanged: {reports_unchanged}")
     print(f"   Reports Skipped: {reports_skipped}")
     print(f"   Reports Failed: {reports_failed}")
+    if hierarchical:
+        print(f"   Weekly Logs Generated: {weeks_generated}")
     print(f"   Total Reports in Database: {total_reports}")
 
+    notion_stats = get_notion_stats()
+    print(f"\n📡 Notion API:")
+    print(f"   Requests: {notion_stats['requests']}")
+    print(f"   Retries: {notion_stats['retries']} ({notion_stats['rate_limited']} rate limited)")
+    print(f"   Throttle Wait: {notion_stats['wait_seconds']:.1f}s")
+
+    cache_stats = get_groq_cache_stats()
+    print(f"\n🧠 Groq Response Cache:")
+    print(f"   Hits: {cache_stats['hits']} / Misses: {cache_stats['misses']}")
+
+    groq_stats = get_groq_stats()
+    print(f"\n⚡ Groq Concurrency:")
+    print(f"   Peak In Flight: {groq_stats['peak_in_flight']} (limit now {groq_stats['limit']}/{groq_stats['max_limit']})")
+    print(f"   Rate Limited: {groq_stats['rate_limited']}")
+
+    llm_stats = get_llm_stats()
+    print(f"\n📈 LLM Calls:")
+    print(f"   Calls: {llm_stats['calls']} (" + ", ".join(f"{outcome} {count}" for outcome, count in llm_stats['outcomes'].items()) + ")")
+    if llm_stats['calls']:
+        wall, queue = llm_stats['wall_seconds'], llm_stats['queue_seconds']
+        print(f"   Wall Time: {wall['sum']:.1f}s total, p50 <= {wall['p50']}s, p95 <= {wall['p95']}s (queued {queue['sum']:.1f}s)")
+        print(f"   Wall Time Buckets: " + ", ".join(f"{label}s: {count}" for label, count in wall['buckets'].items() if count))
+        for model, series in llm_stats['models'].items():
+            print(f"   {model}: {series['calls']} calls, {series['prompt_tokens']['sum']:.0f} prompt + "
+                  f"{series['completion_tokens']['sum']:.0f} completion tokens, p50 <= {series['wall_seconds']['p50']}s")
+
     if reports_created > 0:
         print(f"\n✅ Successfully generated {reports_created} new monthly report(s)!")
     else:
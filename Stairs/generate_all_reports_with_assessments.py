@@ -15,12 +15,28 @@ from groq import Groq
 from datetime import datetime, timedelta
 import json
 
+from notion_query import prefetch_by_relation, query_all
+from notion_mirror import use_mirror_if_enabled
+from id_resolver import get_id_resolver
+from change_tracker import ChangeTracker, FallbackSummary, fingerprint, saved_fingerprint
+from notion_records import (
+    ASSESSMENT_PROPERTIES, PATIENT_PROPERTIES, WORKOUT_PROPERTIES, decode_assessment,
+    decode_patient, decode_workout
+)
+from prompt_budget import dedupe_notes, fit_blocks, section_budget, truncate_to_tokens
+from rule_summary import get_stats as get_rule_summary_stats, is_sparse, rule_based_weekly_summary
+from model_router import get_stats as get_routing_stats, routed_completion
+from notion_scheduler import get_stats as get_notion_stats, rate_limited
+from groq_cache import get_stats as get_groq_cache_stats, with_response_cache
+from groq_telemetry import get_stats as get_llm_stats, instrumented, record_fallback
+
 # Load environment
 load_dotenv()
 
 # Initialize clients
-notion = Client(auth=os.getenv("NOTION_API_KEY"))
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+notion = use_mirror_if_enabled(rate_limited(Client(auth=os.getenv("NOTION_API_KEY"))))
+groq_client = with_response_cache(instrumented(Groq(api_key=os.getenv("GROQ_API_KEY"))))
+id_resolver = get_id_resolver(notion)
 
 # Database IDs
 DB_PATIENTS = os.getenv("NOTION_DATABASE_ID_PATIENTS")
@@ -29,72 +45,42 @@ DB_WEEKLY = os.getenv("NOTION_DATABASE_ID_WEEKLY")
 DB_MONTHLY = os.getenv("NOTION_DATABASE_ID_MONTHLY")
 DB_ASSESSMENTS = os.getenv("NOTION_DATABASE_ID_ASSESSMENTS")
 
+# Existing Week IDs and their source fingerprints, loaded once per run
+weekly_index = ChangeTracker(notion, DB_WEEKLY, "Week ID")
 
-def get_text_from_rich_text(rich_text_array):
-    """Extract plain text from Notion rich text array"""
-    if not rich_text_array:
-        return ""
-    return "".join([item.get("plain_text", "") for item in rich_text_array])
-
-
-def fetch_patient_workouts(patient_id: str, start_date: datetime, end_date: datetime):
-    """Fetch workout logs for a patient in date range"""
-    response = notion.databases.query(
-        database_id=DB_WORKOUTS,
-        filter={
-            "and": [
-                {"property": "Patient", "relation": {"contains": patient_id}},
-                {"property": "Date", "date": {"on_or_after": start_date.isoformat()}}
-            ]
-        },
-        sorts=[{"property": "Date", "direction": "ascending"}]
-    )
 
-    workouts = []
-    for page in response.get("results", []):
-        props = page.get("properties", {})
-        workouts.append({
-            "date": props.get("Date", {}).get("date", {}).get("start", ""),
-            "duration": props.get("Duration (min)", {}).get("number", 0),
-            "exercises": get_text_from_rich_text(props.get("Exercises & Sets", {}).get("rich_text", [])),
-            "noticed": get_text_from_rich_text(props.get("What I Noticed", {}).get("rich_text", [])),
-            "improving": get_text_from_rich_text(props.get("What's Improving", {}).get("rich_text", [])),
-            "concerns": get_text_from_rich_text(props.get("Concerns/Issues", {}).get("rich_text", [])),
-            "rating": props.get("Overall Session Rating", {}).get("select", {}).get("name") if props.get("Overall Session Rating", {}).get("select") else "N/A"
-        })
+def prefetch_workouts_by_patient(start_date: datetime):
+    """Fetch the workout window for every patient in one scan, keyed by patient page ID"""
+    pages_by_patient = prefetch_by_relation(
+        notion,
+        DB_WORKOUTS,
+        "Patient",
+        filter={"property": "Date", "date": {"on_or_after": start_date.isoformat()}},
+        sorts=[{"property": "Date", "direction": "ascending"}],
+        properties=WORKOUT_PROPERTIES
+    )
 
-    return workouts
+    return {
+        patient_id: [decode_workout(page) for page in pages]
+        for patient_id, pages in pages_by_patient.items()
+    }
 
 
-def fetch_patient_assessments(patient_id: str, start_date: datetime, end_date: datetime):
-    """Fetch assessment logs for a patient in date range"""
-    response = notion.databases.query(
-        database_id=DB_ASSESSMENTS,
-        filter={
-            "and": [
-                {"property": "Patient", "relation": {"contains": patient_id}},
-                {"property": "Assessment Date", "date": {"on_or_after": start_date.isoformat()}}
-            ]
-        },
-        sorts=[{"property": "Assessment Date", "direction": "descending"}]
+def prefetch_assessments_by_patient(start_date: datetime):
+    """Fetch the assessment window for every patient in one scan, latest first"""
+    pages_by_patient = prefetch_by_relation(
+        notion,
+        DB_ASSESSMENTS,
+        "Patient",
+        filter={"property": "Assessment Date", "date": {"on_or_after": start_date.isoformat()}},
+        sorts=[{"property": "Assessment Date", "direction": "descending"}],
+        properties=ASSESSMENT_PROPERTIES
     )
 
-    assessments = []
-    for page in response.get("results", []):
-        props = page.get("properties", {})
-        assessments.append({
-            "assessment_id": get_text_from_rich_text(props.get("Assessment ID", {}).get("title", [])),
-            "date": props.get("Assessment Date", {}).get("date", {}).get("start", ""),
-            "strength_score": props.get("Strength Score", {}).get("number"),
-            "mobility_score": props.get("Mobility Score", {}).get("number"),
-            "balance_score": props.get("Balance Score", {}).get("number"),
-            "flexibility_score": props.get("Flexibility Score", {}).get("number"),
-            "goals": get_text_from_rich_text(props.get("Goals Set", {}).get("rich_text", [])),
-            "program": get_text_from_rich_text(props.get("Program Suggested", {}).get("rich_text", [])),
-            "trainer_notes": get_text_from_rich_text(props.get("Trainer Notes", {}).get("rich_text", []))
-        })
-
-    return assessments
+    return {
+        patient_id: [decode_assessment(page) for page in pages]
+        for patient_id, pages in pages_by_patient.items()
+    }
 
 
 def update_patient_assessment_scores(patient_id: str, assessment: dict):
@@ -150,12 +136,16 @@ def generate_weekly_summary_with_groq(patient_name: str, workouts: list, assessm
             "recommendations": "Schedule training sessions and assessment for next week"
         }
 
+    # Too little written to be worth a Groq call: build it from the structured fields
+    if is_sparse(workouts, assessments):
+        return rule_based_weekly_summary(patient_name, workouts, assessments)
+
     # Prepare workout details
     workout_summary = f"{len(workouts)} sessions, {sum([w['duration'] for w in workouts])} minutes total"
 
     # Prepare workout details
     workout_details = []
-    for i, workout in enumerate(workouts, 1):
+    for i, workout in enumerate(dedupe_notes(workouts), 1):
         detail = f"""
 Session {i} - {workout['date']}:
 - Duration: {workout['duration']} minutes
@@ -163,7 +153,7 @@ Session {i} - {workout['date']}:
 - Trainer Observations: {workout['noticed'] or 'None'}
 - Progress Noted: {workout['improving'] or 'None'}
 - Concerns: {workout['concerns'] or 'None'}
-- Rating: {workout['rating']}
+- Rating: {workout['rating'] or 'N/A'}
 """
         workout_details.append(detail)
 
@@ -198,16 +188,18 @@ WEEKLY METRICS:
 - Total Training Time: {sum([w['duration'] for w in workouts])} minutes
 
 WORKOUT SESSIONS:
-{''.join(workout_details)}
+{fit_blocks(workout_details, section_budget("sessions"), "sessions")}
 
-{assessment_details}
+{truncate_to_tokens(assessment_details, section_budget("assessment"))}
 
 Return JSON with keys: summary, improvements, concerns, recommendations.
 Each value should be a STRING (not array). Be factual and concise - NO filler text."""
 
     try:
-        response = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
+        response = routed_completion(
+            groq_client,
+            workouts,
+            assessments,
             messages=[
                 {"role": "system", "content": "You are a fitness data analyst. Summarize ONLY the factual data provided from workouts and assessments. DO NOT add motivational language, speculation, or filler text. Return only valid JSON with string values."},
                 {"role": "user", "content": prompt}
@@ -229,60 +221,41 @@ Each value should be a STRING (not array). Be factual and concise - NO filler te
         return summary_data
 
     except Exception as e:
-        return {
+        record_fallback()
+        return FallbackSummary({
             "summary": f"{patient_name}: {workout_summary}" + (f". Assessment on {assessments[0]['date']}" if assessments else ""),
             "improvements": "See workout logs",
             "concerns": "None",
             "recommendations": "Continue program"
-        }
+        })
 
 
-def get_patient_numeric_id(patient_page_id):
-    """Get the patient ID (numeric) from patient record"""
-    try:
-        patient = notion.pages.retrieve(page_id=patient_page_id)
-        props = patient.get("properties", {})
-
-        for field_name in ["ID", "Id", "Patient ID", "id"]:
-            if field_name in props:
-                id_prop = props[field_name]
-                if id_prop.get("type") == "unique_id":
-                    unique_id_data = id_prop.get("unique_id")
-                    if unique_id_data and unique_id_data.get("number"):
-                        return f"{unique_id_data.get('number'):03d}"
-                elif id_prop.get("type") == "number":
-                    patient_id = id_prop.get("number")
-                    if patient_id:
-                        return f"{int(patient_id):03d}"
-        return patient_page_id[-3:]
-    except:
-        return "000"
+def weekly_report_id(patient_id: str, start_date: datetime):
+    """Week ID for a patient's report, e.g. WEEKLY-001-W07-2026"""
+    week_number = start_date.isocalendar()[1]
+    patient_numeric_id = id_resolver.patient_id(patient_id)
+    return f"WEEKLY-{patient_numeric_id}-W{week_number:02d}-{start_date.year}"
 
 
 def save_weekly_report(patient_id: str, patient_name: str, workouts: list, assessments: list,
-                      start_date: datetime, end_date: datetime, summary_data: dict):
-    """Save weekly report to Notion"""
+                      start_date: datetime, end_date: datetime, summary_data: dict,
+                      source_fingerprint: str = ""):
+    """Save weekly report to Notion (overwrites this week's report if its sources changed)"""
 
     total_sessions = len(workouts)
     total_minutes = sum([w['duration'] for w in workouts if w['duration']])
     attendance_rate = min((total_sessions / 3) * 100, 100)
 
-    week_number = start_date.isocalendar()[1]
-    year = start_date.year
-
-    # Get patient numeric ID for proper naming
-    patient_numeric_id = get_patient_numeric_id(patient_id)
-    week_id = f"WEEKLY-{patient_numeric_id}-W{week_number:02d}-{year}"
-
-    # Check if exists
-    existing = notion.databases.query(
-        database_id=DB_WEEKLY,
-        filter={"property": "Week ID", "title": {"equals": week_id}}
-    )
+    week_id = weekly_report_id(patient_id, start_date)
+    existing_id = weekly_index.existing(week_id)
 
-    if existing.get("results"):
+    # Check if exists (and claim the ID for this run) unless regenerating it
+    if not existing_id and not weekly_index.reserve(week_id):
         return None, "exists"
 
+    # A fallback summary is saved without a fingerprint so the next run retries it
+    source_fingerprint = saved_fingerprint(summary_data, source_fingerprint)
+
     # Add assessment info
     assessment_text = ""
     if assessments:
@@ -301,13 +274,20 @@ def save_weekly_report(patient_id: str, patient_name: str, workouts: list, asses
         "Weekly Summary": {"rich_text": [{"text": {"content": (summary_data.get("summary", "") + assessment_text)[:2000]}}]},
         "Key Improvements": {"rich_text": [{"text": {"content": summary_data.get("improvements", "")[:2000]}}]},
         "Concerns Noted": {"rich_text": [{"text": {"content": summary_data.get("concerns", "None")[:2000]}}]},
-        "Recommendations": {"rich_text": [{"text": {"content": summary_data.get("recommendations", "")[:2000]}}]}
+        "Recommendations": {"rich_text": [{"text": {"content": summary_data.get("recommendations", "")[:2000]}}]},
+        **weekly_index.fingerprint_properties(source_fingerprint)
     }
 
     try:
-        page = notion.pages.create(parent={"database_id": DB_WEEKLY}, properties=properties)
+        if existing_id:
+            page = notion.pages.update(page_id=existing_id, properties=properties)
+        else:
+            page = notion.pages.create(parent={"database_id": DB_WEEKLY}, properties=properties)
+        weekly_index.record(week_id, page["id"], source_fingerprint)
         return page["id"], week_id
     except Exception as e:
+        if not existing_id:
+            weekly_index.release(week_id)
         return None, f"error: {str(e)[:50]}"
 
 
@@ -317,20 +297,25 @@ if __name__ == "__main__":
     print(" " * 10 + "GENERATE REPORTS WITH ASSESSMENTS FOR ALL PATIENTS")
     print("="*75)
 
+    # --force regenerates every report even if its sources are unchanged
+    force = "--force" in sys.argv
+
     # Get all active patients
     print("\n[1/2] Fetching active patients...")
-    patients_response = notion.databases.query(
-        database_id=DB_PATIENTS,
-        filter={"property": "Status", "select": {"equals": "Active"}}
+    patients = query_all(
+        notion,
+        DB_PATIENTS,
+        filter={"property": "Status", "select": {"equals": "Active"}},
+        properties=PATIENT_PROPERTIES
     )
-
-    patients = patients_response.get("results", [])
     print(f"✅ Found {len(patients)} active patients")
 
     # Process each patient
     print("\n[2/2] Generating weekly reports...\n")
 
     reports_created = 0
+    reports_updated = 0
+    reports_unchanged = 0
     reports_skipped = 0
     patients_with_assessments = 0
     patients_updated = 0
@@ -338,16 +323,21 @@ if __name__ == "__main__":
     end_date = datetime.now()
     start_date = end_date - timedelta(days=7)
 
+    # Fetch the whole window once instead of two queries per patient
+    workouts_by_patient = prefetch_workouts_by_patient(start_date)
+    assessments_by_patient = prefetch_assessments_by_patient(start_date)
+
+    weekly_index.ensure_property()
+
     for i, patient in enumerate(patients, 1):
         patient_id = patient["id"]
-        patient_props = patient["properties"]
-        patient_name = patient_props.get("Name", {}).get("title", [])[0].get("plain_text", "") if patient_props.get("Name", {}).get("title") else "Unknown"
+        patient_name = decode_patient(patient).name or "Unknown"
 
         print(f"   [{i}/{len(patients)}] {patient_name}")
 
-        # Fetch data
-        workouts = fetch_patient_workouts(patient_id, start_date, end_date)
-        assessments = fetch_patient_assessments(patient_id, start_date, end_date)
+        # Data from the prefetched window
+        workouts = workouts_by_patient.get(patient_id, [])
+        assessments = assessments_by_patient.get(patient_id, [])
 
         if not workouts and not assessments:
             print(f"       ⚠️  No data - skipping")
@@ -356,6 +346,15 @@ if __name__ == "__main__":
 
         print(f"       📊 {len(workouts)} workouts, {len(assessments)} assessment(s)")
 
+        # Skip patients whose workouts and assessments haven't changed
+        source_fingerprint = fingerprint(workouts, assessments)
+        week_id = weekly_report_id(patient_id, start_date)
+        if not force and weekly_index.unchanged(week_id, source_fingerprint):
+            print(f"       ℹ️  {week_id} is up to date")
+            reports_unchanged += 1
+            continue
+        regenerating = weekly_index.existing(week_id) is not None
+
         # Update patient scores if assessment exists
         if assessments:
             patients_with_assessments += 1
@@ -369,10 +368,13 @@ if __name__ == "__main__":
         # Save report
         report_id, result = save_weekly_report(
             patient_id, patient_name, workouts, assessments,
-            start_date, end_date, summary_data
+            start_date, end_date, summary_data, source_fingerprint
         )
 
-        if report_id:
+        if report_id and regenerating:
+            print(f"       🔄 Report updated: {result}")
+            reports_updated += 1
+        elif report_id:
             print(f"       ✅ Report: {result}")
             reports_created += 1
         elif result == "exists":
@@ -391,10 +393,43 @@ if __name__ == "__main__":
     print(f"\n📊 Results:")
     print(f"   Total Patients: {len(patients)}")
     print(f"   Reports Created: {reports_created}")
+    print(f"   Reports Updated: {reports_updated}")
+    print(f"   Reports Unchanged: {reports_unchanged}")
     print(f"   Reports Skipped: {reports_skipped}")
     print(f"   Patients with Assessments: {patients_with_assessments}")
     print(f"   Patient Records Updated: {patients_updated}")
 
+    notion_stats = get_notion_stats()
+    print(f"\n📡 Notion API:")
+    print(f"   Requests: {notion_stats['requests']}")
+    print(f"   Retries: {notion_stats['retries']} ({notion_stats['rate_limited']} rate limited)")
+    print(f"   Throttle Wait: {notion_stats['wait_seconds']:.1f}s")
+
+    cache_stats = get_groq_cache_stats()
+    print(f"\n🧠 Groq Response Cache:")
+    print(f"   Hits: {cache_stats['hits']} / Misses: {cache_stats['misses']}")
+    print(f"   Rule-based (no Groq call): {get_rule_summary_stats()['rule_based']}")
+
+    routing_stats = get_routing_stats()
+    print(f"\n🧭 Model Routing:")
+    for tier in ("small", "large"):
+        model = routing_stats["thresholds"][f"{tier}_model"]
+        median = routing_stats[tier]["median_seconds"]
+        print(f"   {tier.capitalize()} ({model}): {routing_stats[tier]['calls']} calls"
+              + (f", median {median:.2f}s" if median is not None else ""))
+    print(f"   Escalated to large: {routing_stats['escalated']}")
+
+    llm_stats = get_llm_stats()
+    print(f"\n📈 LLM Calls:")
+    print(f"   Calls: {llm_stats['calls']} (" + ", ".join(f"{outcome} {count}" for outcome, count in llm_stats['outcomes'].items()) + ")")
+    if llm_stats['calls']:
+        wall, queue = llm_stats['wall_seconds'], llm_stats['queue_seconds']
+        print(f"   Wall Time: {wall['sum']:.1f}s total, p50 <= {wall['p50']}s, p95 <= {wall['p95']}s (queued {queue['sum']:.1f}s)")
+        print(f"   Wall Time Buckets: " + ", ".join(f"{label}s: {count}" for label, count in wall['buckets'].items() if count))
+        for model, series in llm_stats['models'].items():
+            print(f"   {model}: {series['calls']} calls, {series['prompt_tokens']['sum']:.0f} prompt + "
+                  f"{series['completion_tokens']['sum']:.0f} completion tokens, p50 <= {series['wall_seconds']['p50']}s")
+
     if reports_created > 0 or patients_updated > 0:
         print(f"\n✅ Successfully generated {reports_created} report(s)")
         print(f"✅ Updated {patients_updated} patient record(s) with assessment data")
@@ -4,6 +4,7 @@ Generate weekly reports for all active patients
 
 import os
 import sys
+import threading
 
 # Fix encoding for Windows
 if sys.platform == "win32":
@@ -13,71 +14,81 @@ from dotenv import load_dotenv
 from notion_client import Client
 from groq import Groq
 from datetime import datetime, timedelta
+from itertools import chain
 import json
 
+from notion_query import count_pages, prefetch_by_relation, query_all
+from notion_mirror import use_mirror_if_enabled
+from id_resolver import get_id_resolver
+from change_tracker import ChangeTracker, FallbackSummary, fingerprint, saved_fingerprint
+from notion_records import PATIENT_PROPERTIES, WORKOUT_PROPERTIES, decode_patient, decode_workout
+from prompt_budget import dedupe_notes, estimate_tokens, fit_blocks, section_budget
+from rule_summary import get_stats as get_rule_summary_stats, is_sparse, rule_based_weekly_summary
+from model_router import get_stats as get_routing_stats, routed_completion, thresholds
+from notion_scheduler import get_stats as get_notion_stats, rate_limited
+from groq_cache import get_stats as get_groq_cache_stats, with_response_cache
+from groq_scheduler import (
+    get_stats as get_groq_stats, max_concurrency as groq_max_concurrency, rate_adaptive, summarize_in_order
+)
+from groq_telemetry import get_stats as get_llm_stats, instrumented, record_fallback
+
 # Load environment
 load_dotenv()
 
 # Initialize clients
-notion = Client(auth=os.getenv("NOTION_API_KEY"))
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+notion = use_mirror_if_enabled(rate_limited(Client(auth=os.getenv("NOTION_API_KEY"))))
+groq_client = with_response_cache(instrumented(rate_adaptive(Groq(api_key=os.getenv("GROQ_API_KEY")))))
+id_resolver = get_id_resolver(notion)
 
 # Database IDs
 DB_PATIENTS = os.getenv("NOTION_DATABASE_ID_PATIENTS")
 DB_WORKOUTS = os.getenv("NOTION_DATABASE_ID_WORKOUTS")
 DB_WEEKLY = os.getenv("NOTION_DATABASE_ID_WEEKLY")
 
+# Existing Week IDs and their source fingerprints, loaded once per run
+weekly_index = ChangeTracker(notion, DB_WEEKLY, "Week ID")
 
-def fetch_patient_workouts(patient_id: str, days: int = 7):
-    """Fetch workout logs for a patient"""
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days)
-
-    response = notion.databases.query(
-        database_id=DB_WORKOUTS,
-        filter={
-            "and": [
-                {"property": "Patient", "relation": {"contains": patient_id}},
-                {"property": "Date", "date": {"on_or_after": start_date.isoformat()}}
-            ]
-        },
-        sorts=[{"property": "Date", "direction": "ascending"}]
+
+def prefetch_workouts_by_patient(start_date: datetime):
+    """Fetch the workout window for every patient in one scan, keyed by patient page ID"""
+    pages_by_patient = prefetch_by_relation(
+        notion,
+        DB_WORKOUTS,
+        "Patient",
+        filter={"property": "Date", "date": {"on_or_after": start_date.isoformat()}},
+        sorts=[{"property": "Date", "direction": "ascending"}],
+        properties=WORKOUT_PROPERTIES
     )
 
-    workouts = []
-    for page in response.get("results", []):
-        props = page.get("properties", {})
-
-        # Safe extraction of rich text
-        def get_text(prop_name):
-            rich_text = props.get(prop_name, {}).get("rich_text", [])
-            return rich_text[0].get("plain_text", "") if rich_text else ""
-
-        workouts.append({
-            "date": props.get("Date", {}).get("date", {}).get("start", ""),
-            "duration": props.get("Duration (min)", {}).get("number", 0),
-            "exercises": get_text("Exercises & Sets"),
-            "noticed": get_text("What I Noticed"),
-            "improving": get_text("What's Improving"),
-            "concerns": get_text("Concerns/Issues"),
-            "rating": props.get("Overall Session Rating", {}).get("select", {}).get("name") if props.get("Overall Session Rating", {}).get("select") else "N/A"
-        })
+    return {
+        patient_id: [decode_workout(page) for page in pages]
+        for patient_id, pages in pages_by_patient.items()
+    }
 
-    return workouts, start_date, end_date
 
+SYSTEM_PROMPT = "You are a fitness data analyst. Summarize ONLY the factual data provided. DO NOT add motivational language, speculation, or filler text. Return only valid JSON with string values."
 
-def generate_weekly_summary(patient_name: str, workouts: list):
-    """Generate AI summary using Groq"""
-    if not workouts:
-        return {
-            "summary": f"No workout sessions recorded for {patient_name} this week.",
-            "improvements": "N/A",
-            "concerns": "No activity this week",
-            "recommendations": "Schedule training sessions for next week"
-        }
+FACTUAL_RULES = """CRITICAL INSTRUCTIONS:
+- Use ONLY the data provided below - DO NOT add any information not present in the data
+- DO NOT speculate, assume, or add motivational filler text
+- DO NOT make up progress if not explicitly stated in trainer notes
+- If trainer noted improvements, state them exactly as written
+- If trainer noted concerns, state them exactly as written
+- Reference specific exercises, weights, reps, and times from the data
+- If information is missing, write "Not recorded" instead of inventing details"""
+
+SUMMARY_KEYS = ["summary", "improvements", "concerns", "recommendations"]
 
+# Batched mode (--batch): several patients per completion, keyed by patient page ID
+SUMMARY_MAX_TOKENS = 500          # completion budget for one patient's summary
+BATCH_MAX_TOKENS = 4000           # completion budget for one batched request
+BATCH_MAX_PROMPT_TOKENS = 12000   # rough cap on the patient blocks in one request
+
+
+def format_workout_sessions(workouts: list):
+    """Per-session prompt lines for a patient's week"""
     workout_details = []
-    for i, workout in enumerate(workouts, 1):
+    for i, workout in enumerate(dedupe_notes(workouts), 1):
         detail = f"""
 Session {i} - {workout['date']}:
 - Duration: {workout['duration']} minutes
@@ -85,93 +96,202 @@ Session {i} - {workout['date']}:
 - Trainer's Observations: {workout['noticed'] or 'None'}
 - Progress Noted: {workout['improving'] or 'None'}
 - Concerns: {workout['concerns'] or 'None'}
-- Session Rating: {workout['rating']}
+- Session Rating: {workout['rating'] or 'N/A'}
 """
         workout_details.append(detail)
+    return fit_blocks(workout_details, section_budget("sessions"), "sessions")
+
+
+def normalize_summary(summary_data: dict):
+    """Coerce summary values to strings (models sometimes return arrays)"""
+    for key in SUMMARY_KEYS:
+        value = summary_data.get(key, "")
+        if isinstance(value, list):
+            summary_data[key] = "\n".join([str(item) for item in value])
+        elif not isinstance(value, str):
+            summary_data[key] = str(value)
+    return summary_data
+
+
+def generate_weekly_summary(patient_name: str, workouts: list):
+    """Generate AI summary using Groq"""
+    if not workouts:
+        return {
+            "summary": f"No workout sessions recorded for {patient_name} this week.",
+            "improvements": "N/A",
+            "concerns": "No activity this week",
+            "recommendations": "Schedule training sessions for next week"
+        }
+
+    # Too little written to be worth a Groq call: build it from the structured fields
+    if is_sparse(workouts):
+        return rule_based_weekly_summary(patient_name, workouts)
 
     total_sessions = len(workouts)
     total_minutes = sum([w['duration'] for w in workouts])
 
     prompt = f"""Generate a weekly summary for {patient_name}.
 
-CRITICAL INSTRUCTIONS:
-- Use ONLY the data provided below - DO NOT add any information not present in the data
-- DO NOT speculate, assume, or add motivational filler text
-- DO NOT make up progress if not explicitly stated in trainer notes
-- If trainer noted improvements, state them exactly as written
-- If trainer noted concerns, state them exactly as written
-- Reference specific exercises, weights, reps, and times from the data
-- If information is missing, write "Not recorded" instead of inventing details
+{FACTUAL_RULES}
 
 WEEKLY METRICS:
 - Total Sessions: {total_sessions}
 - Total Training Time: {total_minutes} minutes
 
 WORKOUT SESSIONS:
-{''.join(workout_details)}
+{format_workout_sessions(workouts)}
 
 Return JSON with keys: summary, improvements, concerns, recommendations.
 Each value should be a STRING (not array). Be factual and concise - NO filler text."""
 
     try:
-        response = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
+        response = routed_completion(
+            groq_client,
+            workouts,
             messages=[
-                {"role": "system", "content": "You are a fitness data analyst. Summarize ONLY the factual data provided. DO NOT add motivational language, speculation, or filler text. Return only valid JSON with string values."},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.3,
-            max_tokens=500,
+            max_tokens=SUMMARY_MAX_TOKENS,
             response_format={"type": "json_object"}
         )
 
         summary_data = json.loads(response.choices[0].message.content)
-
-        # Convert arrays to strings if needed
-        for key in ["summary", "improvements", "concerns", "recommendations"]:
-            value = summary_data.get(key, "")
-            if isinstance(value, list):
-                summary_data[key] = "\n".join([str(item) for item in value])
-            elif not isinstance(value, str):
-                summary_data[key] = str(value)
-
-        return summary_data
+        return normalize_summary(summary_data)
 
     except Exception as e:
         print(f"   ⚠️  Error generating AI summary: {e}")
-        return {
+        record_fallback()
+        return FallbackSummary({
             "summary": f"{patient_name} completed {total_sessions} sessions this week ({total_minutes} minutes total).",
             "improvements": "See individual workout logs",
             "concerns": "None noted",
             "recommendations": "Continue with current program"
-        }
+        })
 
 
-def get_patient_numeric_id(patient_page_id):
-    """Get the patient ID (numeric) from patient record"""
+def patient_block(job: dict):
+    """One patient's section of a batched prompt"""
+    workouts = job["workouts"]
+    return f"""
+=== PATIENT {job['patient_id']} ({job['patient_name']}) ===
+WEEKLY METRICS:
+- Total Sessions: {len(workouts)}
+- Total Training Time: {sum([w['duration'] for w in workouts])} minutes
+
+WORKOUT SESSIONS:
+{format_workout_sessions(workouts)}"""
+
+
+def split_into_batches(jobs: list):
+    """
+    Group consecutive jobs so each batch fits the completion and prompt budgets
+
+    Output is budgeted at SUMMARY_MAX_TOKENS per patient against BATCH_MAX_TOKENS;
+    prompt size uses estimate_tokens(). Roster order is kept.
+    """
+    patients_per_batch = max(1, BATCH_MAX_TOKENS // SUMMARY_MAX_TOKENS)
+    batches, batch, prompt_tokens = [], [], 0
+    for job in jobs:
+        if is_sparse(job["workouts"]):
+            # Summarized without Groq, so it costs the batch nothing
+            batch.append(job)
+            continue
+        block_tokens = estimate_tokens(patient_block(job))
+        if batch and (len(batch) >= patients_per_batch or prompt_tokens + block_tokens > BATCH_MAX_PROMPT_TOKENS):
+            batches.append(batch)
+            batch, prompt_tokens = [], 0
+        batch.append(job)
+        prompt_tokens += block_tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _id_key(page_id: str):
+    return page_id.replace("-", "").lower()
+
+
+# Updated from summarize_in_order's worker threads
+batch_stats = {"requests": 0, "patients": 0, "fallbacks": 0}
+_batch_stats_lock = threading.Lock()
+
+
+def _count_batch(stat: str):
+    with _batch_stats_lock:
+        batch_stats[stat] += 1
+
+
+def generate_weekly_summaries_batched(batch: list):
+    """
+    Summarize several patients in one Groq call, returned in batch order
+
+    The model answers with a JSON object keyed by patient page ID. Any patient
+    missing from (or malformed in) the reply falls back to a single call.
+    """
+    # Sparse weeks get rule-based summaries from generate_weekly_summary below
+    llm_jobs = [job for job in batch if not is_sparse(job["workouts"])]
+    if len(llm_jobs) <= 1:
+        return [generate_weekly_summary(job["patient_name"], job["workouts"]) for job in batch]
+
+    prompt = f"""Generate weekly summaries for the {len(llm_jobs)} patients below.
+
+{FACTUAL_RULES}
+- Summarize each patient ONLY from their own section - never mix data between patients
+{''.join(patient_block(job) for job in llm_jobs)}
+Return a JSON object whose keys are the patient IDs shown after "PATIENT" above.
+Each value must be an object with keys: summary, improvements, concerns, recommendations.
+Each of those values should be a STRING (not array). Be factual and concise - NO filler text."""
+
+    by_id = {}
     try:
-        patient = notion.pages.retrieve(page_id=patient_page_id)
-        props = patient.get("properties", {})
-
-        for field_name in ["ID", "Id", "Patient ID", "id"]:
-            if field_name in props:
-                id_prop = props[field_name]
-                if id_prop.get("type") == "unique_id":
-                    unique_id_data = id_prop.get("unique_id")
-                    if unique_id_data and unique_id_data.get("number"):
-                        return f"{unique_id_data.get('number'):03d}"
-                elif id_prop.get("type") == "number":
-                    patient_id = id_prop.get("number")
-                    if patient_id:
-                        return f"{int(patient_id):03d}"
-        return patient_page_id[-3:]
-    except:
-        return "000"
+        # Several patients' notes in one prompt: always the large tier (GROQ_LARGE_MODEL)
+        response = groq_client.chat.completions.create(
+            model=thresholds()["large_model"],
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3,
+            max_tokens=SUMMARY_MAX_TOKENS * len(llm_jobs),
+            response_format={"type": "json_object"}
+        )
+        _count_batch("requests")
+        reply = json.loads(response.choices[0].message.content)
+        by_id = {_id_key(str(key)): value for key, value in reply.items()}
+    except Exception as e:
+        print(f"   ⚠️  Batched summary failed ({len(llm_jobs)} patients), falling back to single calls: {e}")
+
+    summaries = []
+    for job in batch:
+        summary_data = by_id.get(_id_key(job["patient_id"]))
+        if isinstance(summary_data, dict) and all(key in summary_data for key in SUMMARY_KEYS):
+            _count_batch("patients")
+            summaries.append(normalize_summary(summary_data))
+        else:
+            if not is_sparse(job["workouts"]):
+                _count_batch("fallbacks")
+            summaries.append(generate_weekly_summary(job["patient_name"], job["workouts"]))
+    return summaries
+
+
+def weekly_report_id(patient_id: str, start_date: datetime):
+    """Week ID for a patient's report, e.g. WEEKLY-001-W07-2026"""
+    week_number = start_date.isocalendar()[1]
+    patient_numeric_id = id_resolver.patient_id(patient_id)
+    return f"WEEKLY-{patient_numeric_id}-W{week_number:02d}-{start_date.year}"
 
 
 def save_weekly_report(patient_id: str, patient_name: str, workouts: list,
-                      start_date: datetime, end_date: datetime, summary_data: dict):
-    """Save weekly report to Notion"""
+                      start_date: datetime, end_date: datetime, summary_data: dict,
+                      source_fingerprint: str = "", week_id: str = None):
+    """
+    Save weekly report to Notion (overwrites this week's report if its sources changed)
+
+    week_id defaults to the Monday-numbered ID for start_date; pass a stored
+    log's Week ID to update that log in place.
+    """
 
     total_sessions = len(workouts)
     total_minutes = sum([w['duration'] for w in workouts if w['duration']])
@@ -180,22 +300,15 @@ def save_weekly_report(patient_id: str, patient_name: str, workouts: list,
     target_sessions = 3
     attendance_rate = min((total_sessions / target_sessions) * 100, 100)
 
-    week_number = start_date.isocalendar()[1]
-    year = start_date.year
-
-    # Get patient numeric ID for proper naming
-    patient_numeric_id = get_patient_numeric_id(patient_id)
-    week_id = f"WEEKLY-{patient_numeric_id}-W{week_number:02d}-{year}"
+    week_id = week_id or weekly_report_id(patient_id, start_date)
+    existing_id = weekly_index.existing(week_id)
 
-    # Check if report already exists
-    existing = notion.databases.query(
-        database_id=DB_WEEKLY,
-        filter={"property": "Week ID", "title": {"equals": week_id}}
-    )
-
-    if existing.get("results"):
+    # Claim the ID for this run unless we are regenerating an existing report
+    if not existing_id and not weekly_index.reserve(week_id):
         return None, "Report already exists"
 
+    # A fallback summary is saved without a fingerprint so the next run retries it
+    source_fingerprint = saved_fingerprint(summary_data, source_fingerprint)
     properties = {
         "Week ID": {"title": [{"text": {"content": week_id}}]},
         "patient": {"relation": [{"id": patient_id}]},
@@ -216,16 +329,23 @@ def save_weekly_report(patient_id: str, patient_name: str, workouts: list,
         },
         "Recommendations": {
             "rich_text": [{"text": {"content": summary_data.get("recommendations", "")[:2000]}}]
-        }
+        },
+        **weekly_index.fingerprint_properties(source_fingerprint)
     }
 
     try:
-        page = notion.pages.create(
-            parent={"database_id": DB_WEEKLY},
-            properties=properties
-        )
+        if existing_id:
+            page = notion.pages.update(page_id=existing_id, properties=properties)
+        else:
+            page = notion.pages.create(
+                parent={"database_id": DB_WEEKLY},
+                properties=properties
+            )
+        weekly_index.record(week_id, page["id"], source_fingerprint)
         return page["id"], week_id
     except Exception as e:
+        if not existing_id:
+            weekly_index.release(week_id)
         return None, f"Error: {str(e)}"
 
 
@@ -235,32 +355,48 @@ if __name__ == "__main__":
     print(" " * 15 + "GENERATE WEEKLY REPORTS FOR ALL PATIENTS")
     print("="*70)
 
+    # --force regenerates every report even if its workouts are unchanged
+    force = "--force" in sys.argv
+    # --batch packs several patients into each Groq request
+    batched = "--batch" in sys.argv
+
     # Get all active patients
     print("\n[1/3] Fetching active patients...")
-    patients_response = notion.databases.query(
-        database_id=DB_PATIENTS,
-        filter={"property": "Status", "select": {"equals": "Active"}}
+    patients = query_all(
+        notion,
+        DB_PATIENTS,
+        filter={"property": "Status", "select": {"equals": "Active"}},
+        properties=PATIENT_PROPERTIES
     )
-
-    patients = patients_response.get("results", [])
     print(f"✅ Found {len(patients)} active patients")
 
+    # Fetch the whole workout window once instead of one query per patient
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=7)
+    workouts_by_patient = prefetch_workouts_by_patient(start_date)
+    print(f"✅ Prefetched workouts for {len(workouts_by_patient)} patients")
+
+    weekly_index.ensure_property()
+
     # Process each patient
     print("\n[2/3] Generating reports for each patient...\n")
 
     reports_created = 0
+    reports_updated = 0
+    reports_unchanged = 0
     reports_skipped = 0
     reports_failed = 0
 
+    # Decide which patients need a report before spending any Groq calls
+    jobs = []
     for i, patient in enumerate(patients, 1):
         patient_id = patient["id"]
-        patient_props = patient["properties"]
-        patient_name = patient_props.get("Name", {}).get("title", [])[0].get("plain_text", "") if patient_props.get("Name", {}).get("title") else "Unknown"
+        patient_name = decode_patient(patient).name or "Unknown"
 
         print(f"   [{i}/{len(patients)}] Processing: {patient_name}")
 
-        # Fetch workouts
-        workouts, start_date, end_date = fetch_patient_workouts(patient_id, days=7)
+        # Workouts from the prefetched window
+        workouts = workouts_by_patient.get(patient_id, [])
 
         if not workouts:
             print(f"       ⚠️  No workout data in past 7 days - skipping")
@@ -269,18 +405,45 @@ if __name__ == "__main__":
 
         print(f"       📊 Found {len(workouts)} workouts ({sum([w['duration'] for w in workouts])} minutes)")
 
-        # Generate AI summary
-        print(f"       🤖 Generating AI summary...")
-        summary_data = generate_weekly_summary(patient_name, workouts)
+        # Skip patients whose workouts haven't changed since this week's report
+        source_fingerprint = fingerprint(workouts)
+        week_id = weekly_report_id(patient_id, start_date)
+        if not force and weekly_index.unchanged(week_id, source_fingerprint):
+            print(f"       ℹ️  {week_id} is up to date - skipping")
+            reports_unchanged += 1
+            continue
+
+        jobs.append({
+            "patient_id": patient_id,
+            "patient_name": patient_name,
+            "workouts": workouts,
+            "fingerprint": source_fingerprint,
+            "regenerating": weekly_index.existing(week_id) is not None
+        })
+
+    # Generate AI summaries concurrently; save them in roster order as they finish
+    if batched:
+        batches = split_into_batches(jobs)
+        print(f"\n   🤖 Generating {len(jobs)} AI summaries in {len(batches)} batched requests (up to {groq_max_concurrency()} at a time)...\n")
+        summaries = chain.from_iterable(summarize_in_order(generate_weekly_summaries_batched, batches))
+    else:
+        print(f"\n   🤖 Generating {len(jobs)} AI summaries (up to {groq_max_concurrency()} at a time)...\n")
+        summaries = summarize_in_order(
+            lambda job: generate_weekly_summary(job["patient_name"], job["workouts"]),
+            jobs
+        )
 
-        # Save to Notion
-        print(f"       💾 Saving to Notion...")
+    for job, summary_data in zip(jobs, summaries):
+        print(f"   💾 Saving {job['patient_name']} to Notion...")
         report_id, result = save_weekly_report(
-            patient_id, patient_name, workouts,
-            start_date, end_date, summary_data
+            job["patient_id"], job["patient_name"], job["workouts"],
+            start_date, end_date, summary_data, job["fingerprint"]
         )
 
-        if report_id:
+        if report_id and job["regenerating"]:
+            print(f"       🔄 Report updated: {result}")
+            reports_updated += 1
+        elif report_id:
             print(f"       ✅ Report created: {result}")
             reports_created += 1
         elif "already exists" in result:
@@ -294,8 +457,7 @@ if __name__ == "__main__":
 
     # Summary
     print("\n[3/3] Verification...")
-    verify_response = notion.databases.query(database_id=DB_WEEKLY)
-    total_reports = len(verify_response.get("results", []))
+    total_reports = count_pages(notion, DB_WEEKLY)
 
     print("\n" + "="*70)
     print(" " * 25 + "SUMMARY")
@@ -304,10 +466,53 @@ if __name__ == "__main__":
     print(f"\n📊 Results:")
     print(f"   Total Patients: {len(patients)}")
     print(f"   Reports Created: {reports_created}")
+    print(f"   Reports Updated: {reports_updated}")
+    print(f"   Reports Unchanged: {reports_unchanged}")
     print(f"   Reports Skipped: {reports_skipped}")
     print(f"   Reports Failed: {reports_failed}")
     print(f"   Total Reports in Database: {total_reports}")
 
+    notion_stats = get_notion_stats()
+    print(f"\n📡 Notion API:")
+    print(f"   Requests: {notion_stats['requests']}")
+    print(f"   Retries: {notion_stats['retries']} ({notion_stats['rate_limited']} rate limited)")
+    print(f"   Throttle Wait: {notion_stats['wait_seconds']:.1f}s")
+
+    cache_stats = get_groq_cache_stats()
+    print(f"\n🧠 Groq Response Cache:")
+    print(f"   Hits: {cache_stats['hits']} / Misses: {cache_stats['misses']}")
+    print(f"   Rule-based (no Groq call): {get_rule_summary_stats()['rule_based']}")
+
+    routing_stats = get_routing_stats()
+    print(f"\n🧭 Model Routing:")
+    for tier in ("small", "large"):
+        model = routing_stats["thresholds"][f"{tier}_model"]
+        median = routing_stats[tier]["median_seconds"]
+        print(f"   {tier.capitalize()} ({model}): {routing_stats[tier]['calls']} calls"
+              + (f", median {median:.2f}s" if median is not None else ""))
+    print(f"   Escalated to large: {routing_stats['escalated']}")
+
+    groq_stats = get_groq_stats()
+    print(f"\n⚡ Groq Concurrency:")
+    print(f"   Peak In Flight: {groq_stats['peak_in_flight']} (limit now {groq_stats['limit']}/{groq_stats['max_limit']})")
+    print(f"   Rate Limited: {groq_stats['rate_limited']}")
+
+    llm_stats = get_llm_stats()
+    print(f"\n📈 LLM Calls:")
+    print(f"   Calls: {llm_stats['calls']} (" + ", ".join(f"{outcome} {count}" for outcome, count in llm_stats['outcomes'].items()) + ")")
+    if llm_stats['calls']:
+        wall, queue = llm_stats['wall_seconds'], llm_stats['queue_seconds']
+        print(f"   Wall Time: {wall['sum']:.1f}s total, p50 <= {wall['p50']}s, p95 <= {wall['p95']}s (queued {queue['sum']:.1f}s)")
+        print(f"   Wall Time Buckets: " + ", ".join(f"{label}s: {count}" for label, count in wall['buckets'].items() if count))
+        for model, series in llm_stats['models'].items():
+            print(f"   {model}: {series['calls']} calls, {series['prompt_tokens']['sum']:.0f} prompt + "
+                  f"{series['completion_tokens']['sum']:.0f} completion tokens, p50 <= {series['wall_seconds']['p50']}s")
+
+    if batched:
+        print(f"\n📦 Batched Summaries:")
+        print(f"   Requests: {batch_stats['requests']} for {batch_stats['patients']} patients")
+        print(f"   Single-call Fallbacks: {batch_stats['fallbacks']}")
+
     if reports_created > 0:
         print(f"\n✅ Successfully generated {reports_created} new weekly report(s)!")
     else:
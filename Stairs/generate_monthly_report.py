@@ -15,12 +15,23 @@ from groq import Groq
 from datetime import datetime, timedelta
 import json
 
+from notion_query import first_page, iter_database_pages
+from notion_mirror import use_mirror_if_enabled
+from notion_scheduler import rate_limited
+from groq_cache import with_response_cache
+from groq_telemetry import instrumented, record_fallback
+from notion_records import (
+    WEEKLY_LOG_PROPERTIES, WORKOUT_PROPERTIES, decode_patient, decode_weekly_log,
+    decode_workout, patient_measurements
+)
+from prompt_budget import fit_blocks, section_budget
+
 # Load environment
 load_dotenv()
 
 # Initialize clients
-notion = Client(auth=os.getenv("NOTION_API_KEY"))
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+notion = use_mirror_if_enabled(rate_limited(Client(auth=os.getenv("NOTION_API_KEY"))))
+groq_client = with_response_cache(instrumented(Groq(api_key=os.getenv("GROQ_API_KEY"))))
 
 # Database IDs
 DB_PATIENTS = os.getenv("NOTION_DATABASE_ID_PATIENTS")
@@ -29,43 +40,25 @@ DB_WEEKLY = os.getenv("NOTION_DATABASE_ID_WEEKLY")
 DB_MONTHLY = os.getenv("NOTION_DATABASE_ID_MONTHLY")
 
 
-def get_text_from_rich_text(rich_text_array):
-    """Extract plain text from Notion rich text array"""
-    if not rich_text_array:
-        return ""
-    return "".join([item.get("plain_text", "") for item in rich_text_array])
-
-
 def fetch_patient_workouts_monthly(patient_id: str, days: int = 30):
     """Fetch all workout logs for a patient for the past month"""
     end_date = datetime.now()
     start_date = end_date - timedelta(days=days)
 
-    response = notion.databases.query(
-        database_id=DB_WORKOUTS,
+    pages = iter_database_pages(
+        notion,
+        DB_WORKOUTS,
         filter={
             "and": [
                 {"property": "Patient", "relation": {"contains": patient_id}},
                 {"property": "Date", "date": {"on_or_after": start_date.isoformat()}}
             ]
         },
-        sorts=[{"property": "Date", "direction": "ascending"}]
+        sorts=[{"property": "Date", "direction": "ascending"}],
+        properties=WORKOUT_PROPERTIES
     )
 
-    workouts = []
-    for page in response.get("results", []):
-        props = page.get("properties", {})
-        workouts.append({
-            "date": props.get("Date", {}).get("date", {}).get("start", ""),
-            "duration": props.get("Duration (min)", {}).get("number", 0),
-            "exercises": get_text_from_rich_text(props.get("Exercises & Sets", {}).get("rich_text", [])),
-            "noticed": get_text_from_rich_text(props.get("What I Noticed", {}).get("rich_text", [])),
-            "improving": get_text_from_rich_text(props.get("What's Improving", {}).get("rich_text", [])),
-            "concerns": get_text_from_rich_text(props.get("Concerns/Issues", {}).get("rich_text", [])),
-            "rating": props.get("Overall Session Rating", {}).get("select", {}).get("name") if props.get("Overall Session Rating", {}).get("select") else "N/A"
-        })
-
-    return workouts
+    return [decode_workout(page) for page in pages]
 
 
 def fetch_weekly_summaries(patient_id: str, days: int = 30):
@@ -73,44 +66,26 @@ def fetch_weekly_summaries(patient_id: str, days: int = 30):
     end_date = datetime.now()
     start_date = end_date - timedelta(days=days)
 
-    response = notion.databases.query(
-        database_id=DB_WEEKLY,
+    pages = iter_database_pages(
+        notion,
+        DB_WEEKLY,
         filter={
             "and": [
                 {"property": "patient", "relation": {"contains": patient_id}},
                 {"property": "Week Start", "date": {"on_or_after": start_date.isoformat()}}
             ]
         },
-        sorts=[{"property": "Week Start", "direction": "ascending"}]
+        sorts=[{"property": "Week Start", "direction": "ascending"}],
+        properties=WEEKLY_LOG_PROPERTIES
     )
 
-    summaries = []
-    for page in response.get("results", []):
-        props = page.get("properties", {})
-        summaries.append({
-            "week_id": get_text_from_rich_text(props.get("Week ID", {}).get("title", [])),
-            "summary": get_text_from_rich_text(props.get("Weekly Summary", {}).get("rich_text", [])),
-            "improvements": get_text_from_rich_text(props.get("Key Improvements", {}).get("rich_text", [])),
-            "sessions": props.get("Total Sessions", {}).get("number", 0)
-        })
-
-    return summaries
+    return [decode_weekly_log(page) for page in pages]
 
 
 def get_patient_measurements(patient_id: str):
     """Get current patient measurements"""
     patient = notion.pages.retrieve(page_id=patient_id)
-    props = patient.get("properties", {})
-
-    return {
-        "weight": props.get("Weight (kg)", {}).get("number"),
-        "height": props.get("Height (cm)", {}).get("number"),
-        "chest": props.get("Chest (cm)", {}).get("number"),
-        "waist": props.get("Waist (cm)", {}).get("number"),
-        "hips": props.get("Hips (cm)", {}).get("number"),
-        "thigh": props.get("Thigh (cm)", {}).get("number"),
-        "arm": props.get("Arm (cm)", {}).get("number")
-    }
+    return patient_measurements(decode_patient(patient))
 
 
 def generate_monthly_summary_with_groq(patient_name: str, workouts: list, weekly_summaries: list, measurements: dict):
@@ -136,10 +111,11 @@ def generate_monthly_summary_with_groq(patient_name: str, workouts: list, weekly
     # Prepare weekly summaries
     weekly_summary_text = ""
     if weekly_summaries:
-        weekly_summary_text = "\n".join([
-            f"Week {i+1}: {s['sessions']} sessions - {s['summary'][:100]}..."
-            for i, s in enumerate(weekly_summaries)
-        ])
+        weekly_summary_text = fit_blocks(
+            [f"Week {i+1}: {s['sessions']} sessions - {s['summary']}\n" for i, s in enumerate(weekly_summaries)],
+            section_budget("weekly_summaries"),
+            "weeks"
+        )
     else:
         weekly_summary_text = "No weekly summaries available"
 
@@ -200,6 +176,7 @@ Each value should be a STRING (not array). Use newlines for bullet points in str
 
     except Exception as e:
         print(f"Error generating summary: {e}")
+        record_fallback()
         return {
             "summary": f"{patient_name} completed {total_sessions} sessions this month ({total_minutes} minutes total).",
             "achievements": "See individual workout logs for details.",
@@ -291,15 +268,14 @@ if __name__ == "__main__":
 
     # Get first patient with workout logs
     print("\n[1/6] Fetching patient...")
-    patients_response = notion.databases.query(
-        database_id=DB_PATIENTS,
-        filter={"property": "Status", "select": {"equals": "Active"}},
-        page_size=1
+    patient = first_page(
+        notion,
+        DB_PATIENTS,
+        filter={"property": "Status", "select": {"equals": "Active"}}
     )
 
-    patient_id = patients_response["results"][0]["id"]
-    patient_props = patients_response["results"][0]["properties"]
-    patient_name = patient_props.get("Name", {}).get("title", [])[0].get("plain_text", "")
+    patient_id = patient["id"]
+    patient_name = decode_patient(patient).name
     print(f"✅ Testing with: {patient_name}")
 
     # Fetch workout logs (past 30 days)
@@ -351,13 +327,14 @@ if __name__ == "__main__":
     print("VERIFICATION")
     print("="*60)
 
-    verify_response = notion.databases.query(
-        database_id=DB_MONTHLY,
+    verify_page = first_page(
+        notion,
+        DB_MONTHLY,
         filter={"property": "Month ID", "title": {"equals": month_id}}
     )
 
-    if verify_response.get("results"):
-        page_url = verify_response["results"][0].get("url")
+    if verify_page:
+        page_url = verify_page.get("url")
         print(f"✅ Verification successful - Report found in Notion!")
         print(f"\n   🔗 View in Notion: {page_url}")
     else:
@@ -15,12 +15,25 @@ from groq import Groq
 from datetime import datetime, timedelta
 import json
 
+from notion_query import first_page, iter_database_pages
+from notion_mirror import use_mirror_if_enabled
+from notion_scheduler import rate_limited
+from groq_cache import with_response_cache
+from groq_telemetry import instrumented, record_fallback
+from notion_records import (
+    ASSESSMENT_PROPERTIES, WORKOUT_PROPERTIES, decode_assessment, decode_patient,
+    decode_workout
+)
+from prompt_budget import dedupe_notes, fit_blocks, section_budget, truncate_to_tokens
+from rule_summary import is_sparse, rule_based_weekly_summary
+from model_router import routed_completion
+
 # Load environment
 load_dotenv()
 
 # Initialize clients
-notion = Client(auth=os.getenv("NOTION_API_KEY"))
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+notion = use_mirror_if_enabled(rate_limited(Client(auth=os.getenv("NOTION_API_KEY"))))
+groq_client = with_response_cache(instrumented(Groq(api_key=os.getenv("GROQ_API_KEY"))))
 
 # Database IDs
 DB_PATIENTS = os.getenv("NOTION_DATABASE_ID_PATIENTS")
@@ -29,71 +42,40 @@ DB_WEEKLY = os.getenv("NOTION_DATABASE_ID_WEEKLY")
 DB_ASSESSMENTS = os.getenv("NOTION_DATABASE_ID_ASSESSMENTS")
 
 
-def get_text_from_rich_text(rich_text_array):
-    """Extract plain text from Notion rich text array"""
-    if not rich_text_array:
-        return ""
-    return "".join([item.get("plain_text", "") for item in rich_text_array])
-
-
 def fetch_patient_workouts(patient_id: str, start_date: datetime, end_date: datetime):
     """Fetch workout logs for a patient in date range"""
-    response = notion.databases.query(
-        database_id=DB_WORKOUTS,
+    pages = iter_database_pages(
+        notion,
+        DB_WORKOUTS,
         filter={
             "and": [
                 {"property": "Patient", "relation": {"contains": patient_id}},
                 {"property": "Date", "date": {"on_or_after": start_date.isoformat()}}
             ]
         },
-        sorts=[{"property": "Date", "direction": "ascending"}]
+        sorts=[{"property": "Date", "direction": "ascending"}],
+        properties=WORKOUT_PROPERTIES
     )
 
-    workouts = []
-    for page in response.get("results", []):
-        props = page.get("properties", {})
-        workouts.append({
-            "date": props.get("Date", {}).get("date", {}).get("start", ""),
-            "duration": props.get("Duration (min)", {}).get("number", 0),
-            "exercises": get_text_from_rich_text(props.get("Exercises & Sets", {}).get("rich_text", [])),
-            "noticed": get_text_from_rich_text(props.get("What I Noticed", {}).get("rich_text", [])),
-            "improving": get_text_from_rich_text(props.get("What's Improving", {}).get("rich_text", [])),
-            "concerns": get_text_from_rich_text(props.get("Concerns/Issues", {}).get("rich_text", [])),
-            "rating": props.get("Overall Session Rating", {}).get("select", {}).get("name") if props.get("Overall Session Rating", {}).get("select") else "N/A"
-        })
-
-    return workouts
+    return [decode_workout(page) for page in pages]
 
 
 def fetch_patient_assessments(patient_id: str, start_date: datetime, end_date: datetime):
     """Fetch assessment logs for a patient in date range"""
-    response = notion.databases.query(
-        database_id=DB_ASSESSMENTS,
+    pages = iter_database_pages(
+        notion,
+        DB_ASSESSMENTS,
         filter={
             "and": [
                 {"property": "Patient", "relation": {"contains": patient_id}},
                 {"property": "Assessment Date", "date": {"on_or_after": start_date.isoformat()}}
             ]
         },
-        sorts=[{"property": "Assessment Date", "direction": "descending"}]
+        sorts=[{"property": "Assessment Date", "direction": "descending"}],
+        properties=ASSESSMENT_PROPERTIES
     )
 
-    assessments = []
-    for page in response.get("results", []):
-        props = page.get("properties", {})
-        assessments.append({
-            "assessment_id": get_text_from_rich_text(props.get("Assessment ID", {}).get("title", [])),
-            "date": props.get("Assessment Date", {}).get("date", {}).get("start", ""),
-            "strength_score": props.get("Strength Score", {}).get("number"),
-            "mobility_score": props.get("Mobility Score", {}).get("number"),
-            "balance_score": props.get("Balance Score", {}).get("number"),
-            "flexibility_score": props.get("Flexibility Score", {}).get("number"),
-            "goals": get_text_from_rich_text(props.get("Goals Set", {}).get("rich_text", [])),
-            "program": get_text_from_rich_text(props.get("Program Suggested", {}).get("rich_text", [])),
-            "trainer_notes": get_text_from_rich_text(props.get("Trainer Notes", {}).get("rich_text", []))
-        })
-
-    return assessments
+    return [decode_assessment(page) for page in pages]
 
 
 def update_patient_assessment_scores(patient_id: str, assessment: dict):
@@ -150,9 +132,13 @@ def generate_weekly_summary_with_groq(patient_name: str, workouts: list, assessm
             "recommendations": "Schedule training sessions and assessment for next week"
         }
 
+    # Too little written to be worth a Groq call: build it from the structured fields
+    if is_sparse(workouts, assessments):
+        return rule_based_weekly_summary(patient_name, workouts, assessments)
+
     # Prepare workout details
     workout_details = []
-    for i, workout in enumerate(workouts, 1):
+    for i, workout in enumerate(dedupe_notes(workouts), 1):
         detail = f"""
 Session {i} - {workout['date']}:
 - Duration: {workout['duration']} minutes
@@ -160,7 +146,7 @@ Session {i} - {workout['date']}:
 - Trainer's Observations: {workout['noticed'] or 'None'}
 - Progress Noted: {workout['improving'] or 'None'}
 - Concerns: {workout['concerns'] or 'None'}
-- Session Rating: {workout['rating']}
+- Session Rating: {workout['rating'] or 'N/A'}
 """
         workout_details.append(detail)
 
@@ -189,18 +175,20 @@ WEEKLY METRICS:
 - Total Sessions: {total_sessions}
 - Total Training Time: {total_minutes} minutes
 
-{assessment_details}
+{truncate_to_tokens(assessment_details, section_budget("assessment"))}
 
 WORKOUT SESSIONS:
-{''.join(workout_details) if workout_details else 'No workouts this week'}
+{fit_blocks(workout_details, section_budget("sessions"), "sessions") if workout_details else 'No workouts this week'}
 
 Return JSON with keys: summary, improvements, concerns, recommendations.
 {f"Important: Include assessment results in the summary and recommendations." if assessments else ""}
 Each value should be a STRING (not array). Be motivating and specific."""
 
     try:
-        response = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
+        response = routed_completion(
+            groq_client,
+            workouts,
+            assessments,
             messages=[
                 {"role": "system", "content": "You are a fitness coach. Return only valid JSON with string values. Include assessment data when available."},
                 {"role": "user", "content": prompt}
@@ -224,6 +212,7 @@ Each value should be a STRING (not array). Be motivating and specific."""
 
     except Exception as e:
         print(f"   ⚠️  Error generating AI summary: {e}")
+        record_fallback()
         return {
             "summary": f"{patient_name} completed {total_sessions} sessions this week ({total_minutes} minutes total)." +
                       (f" Assessment conducted on {assessments[0]['date']}." if assessments else ""),
@@ -249,12 +238,13 @@ def save_weekly_report(patient_id: str, patient_name: str, workouts: list, asses
     week_id = f"WEEKLY-{patient_name.replace(' ', '')}-W{week_number:02d}-{year}"
 
     # Check if report already exists
-    existing = notion.databases.query(
-        database_id=DB_WEEKLY,
+    existing = first_page(
+        notion,
+        DB_WEEKLY,
         filter={"property": "Week ID", "title": {"equals": week_id}}
     )
 
-    if existing.get("results"):
+    if existing:
         return None, "Report already exists"
 
     # Add assessment info to summary if available
@@ -310,15 +300,14 @@ if __name__ == "__main__":
 
     # Get first patient
     print("\n[1/7] Fetching patient...")
-    patients_response = notion.databases.query(
-        database_id=DB_PATIENTS,
-        filter={"property": "Status", "select": {"equals": "Active"}},
-        page_size=1
+    patient = first_page(
+        notion,
+        DB_PATIENTS,
+        filter={"property": "Status", "select": {"equals": "Active"}}
     )
 
-    patient_id = patients_response["results"][0]["id"]
-    patient_props = patients_response["results"][0]["properties"]
-    patient_name = patient_props.get("Name", {}).get("title", [])[0].get("plain_text", "")
+    patient_id = patient["id"]
+    patient_name = decode_patient(patient).name
     print(f"✅ Testing with: {patient_name}")
 
     # Set date range
@@ -377,13 +366,14 @@ if __name__ == "__main__":
     year = start_date.year
     week_id = f"WEEKLY-{patient_name.replace(' ', '')}-W{week_number:02d}-{year}"
 
-    verify_response = notion.databases.query(
-        database_id=DB_WEEKLY,
+    verify_page = first_page(
+        notion,
+        DB_WEEKLY,
         filter={"property": "Week ID", "title": {"equals": week_id}}
     )
 
-    if verify_response.get("results"):
-        page_url = verify_response["results"][0].get("url")
+    if verify_page:
+        page_url = verify_page.get("url")
         print(f"✅ Report found in Notion!")
         print(f"\n   🔗 View: {page_url}")
     else:
@@ -0,0 +1,253 @@
+"""
+Persistent, content-addressed cache for Groq chat completions
+
+Responses are stored in a SQLite file keyed on a hash of the model, the
+messages and the sampling parameters, so rerunning a report over the same
+workouts returns the stored completion instead of paying for a new one.
+The least recently used entries are evicted once the cache grows past its
+size limit.
+
+Every Groq client in this project is wrapped with with_response_cache().
+By default only low-temperature (factual) calls are cached; a call can
+opt in or out explicitly with use_cache=True/False.
+
+Configuration (environment):
+    GROQ_CACHE                  0 disables the cache (default: 1)
+    GROQ_CACHE_PATH             SQLite file (default: .notion_cache/groq_cache.sqlite3)
+    GROQ_CACHE_MAX_MB           size limit before eviction (default: 50)
+    GROQ_CACHE_MAX_TEMPERATURE  highest temperature cached by default (default: 0.3)
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from groq import AsyncGroq
+from groq.types.chat import ChatCompletion
+
+DEFAULT_CACHE_PATH = os.path.join(".notion_cache", "groq_cache.sqlite3")
+
+# Arguments that never change the completion itself
+UNCACHED_ARGS = {"stream", "timeout", "extra_headers", "extra_query", "extra_body", "user"}
+
+# Whether the last create() in this context was served from the cache (read by model_router)
+last_cache_hit: ContextVar[bool] = ContextVar("groq_cache_hit", default=False)
+
+
+def cache_key(kwargs: Dict[str, Any]) -> str:
+    """Hash of the model, prompt and sampling parameters of a create() call"""
+    params = {name: value for name, value in kwargs.items() if name not in UNCACHED_ARGS}
+    canonical = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """SQLite store of serialized completions with LRU eviction by total size"""
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        if not self._initialized:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    data TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )"""
+            )
+            self._initialized = True
+        return conn
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a stored completion (as a dict) and mark it recently used"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                row = conn.execute("SELECT data FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+                conn.commit()
+                self.hits += 1
+                return json.loads(row[0])
+            finally:
+                conn.close()
+
+    def put(self, key: str, model: str, completion: Dict[str, Any]):
+        """Store a completion, then evict least recently used entries over the limit"""
+        data = json.dumps(completion)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, model, data, size, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model, data, len(data), now, now)
+                )
+                self._evict(conn)
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_used ASC").fetchall():
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            conn = self._connect()
+            try:
+                entries, size = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+                ).fetchone()
+            finally:
+                conn.close()
+            return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[ResponseCache]:
+    """Process-wide cache, created on first use so .env settings are loaded"""
+    global _cache
+    if os.getenv("GROQ_CACHE", "1") == "0":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(
+                os.getenv("GROQ_CACHE_PATH", DEFAULT_CACHE_PATH),
+                int(float(os.getenv("GROQ_CACHE_MAX_MB", "50")) * 1024 * 1024)
+            )
+        return _cache
+
+
+def get_stats() -> Dict[str, Any]:
+    """Return cache hit/miss accounting for this process"""
+    cache = get_cache()
+    return cache.stats() if cache else {"hits": 0, "misses": 0, "entries": 0, "bytes": 0}
+
+
+def _should_cache(kwargs: Dict[str, Any], use_cache: Optional[bool]) -> bool:
+    if kwargs.get("stream"):
+        return False
+    if use_cache is not None:
+        return use_cache
+    max_temperature = float(os.getenv("GROQ_CACHE_MAX_TEMPERATURE", "0.3"))
+    return kwargs.get("temperature", 1.0) <= max_temperature
+
+
+def _cacheable(kwargs: Dict[str, Any], completion: ChatCompletion) -> bool:
+    """Only keep complete answers; a JSON-mode reply must actually parse"""
+    choice = completion.choices[0] if completion.choices else None
+    if choice is None or choice.finish_reason != "stop":
+        return False
+    if (kwargs.get("response_format") or {}).get("type") == "json_object":
+        try:
+            json.loads(choice.message.content or "")
+        except ValueError:
+            return False
+    return True
+
+
+class _Completions:
+    """chat.completions proxy that serves repeat calls from the cache"""
+
+    def __init__(self, completions, is_async: bool):
+        self._completions = completions
+        self._is_async = is_async
+
+    def __getattr__(self, name):
+        return getattr(self._completions, name)
+
+    def create(self, use_cache: Optional[bool] = None, **kwargs):
+        if self._is_async:
+            return self._acreate(use_cache, **kwargs)
+        last_cache_hit.set(False)
+        cache = get_cache()
+        if cache is None or not _should_cache(kwargs, use_cache):
+            return self._completions.create(**kwargs)
+
+        key = cache_key(kwargs)
+        stored = cache.get(key)
+        if stored is not None:
+            last_cache_hit.set(True)
+            return ChatCompletion.model_validate(stored)
+        completion = self._completions.create(**kwargs)
+        if _cacheable(kwargs, completion):
+            cache.put(key, kwargs.get("model"), completion.model_dump())
+        return completion
+
+    async def _acreate(self, use_cache: Optional[bool], **kwargs):
+        last_cache_hit.set(False)
+        cache = get_cache()
+        if cache is None or not _should_cache(kwargs, use_cache):
+            return await self._completions.create(**kwargs)
+
+        key = cache_key(kwargs)
+        stored = await asyncio.to_thread(cache.get, key)
+        if stored is not None:
+            last_cache_hit.set(True)
+            return ChatCompletion.model_validate(stored)
+        completion = await self._completions.create(**kwargs)
+        if _cacheable(kwargs, completion):
+            await asyncio.to_thread(cache.put, key, kwargs.get("model"), completion.model_dump())
+        return completion
+
+
+class _Chat:
+    def __init__(self, chat, is_async: bool):
+        self._chat = chat
+        self.completions = _Completions(chat.completions, is_async)
+
+    def __getattr__(self, name):
+        return getattr(self._chat, name)
+
+
+class CachedGroq:
+    """Groq/AsyncGroq wrapper whose chat.completions.create goes through the cache"""
+
+    def __init__(self, client):
+        self.client = client
+        # Wrapped clients (rate_adaptive, instrumented) report is_async themselves
+        self.is_async = isinstance(client, AsyncGroq) or getattr(client, "is_async", False)
+        self.chat = _Chat(client.chat, self.is_async)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+def with_response_cache(client):
+    """Wrap a groq Groq or AsyncGroq client with the shared response cache"""
+    if isinstance(client, CachedGroq):
+        return client
+    return CachedGroq(client)
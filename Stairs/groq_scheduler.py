@@ -0,0 +1,328 @@
+"""
+Adaptive concurrency limit for Groq calls
+
+Groq reports its remaining request and token budget in response headers
+(x-ratelimit-remaining-requests, x-ratelimit-remaining-tokens and the
+matching x-ratelimit-reset-* durations). Every Groq client in this project
+is wrapped with rate_adaptive(), which:
+
+- caps the number of completions in flight at a limit shared by the process
+- resizes that limit after each response from the remaining token budget
+  (divided by the average tokens per call) and remaining requests
+- halves the limit and pauses new calls on 429, honouring Retry-After
+- grows the limit back by one per response when no budget is reported
+- holds a streamed completion's slot until its last chunk has been read
+
+summarize_in_order() fans per-patient summary calls out over a thread pool
+and yields results in input order, so saves stay deterministic.
+
+Configuration (environment):
+    GROQ_MAX_CONCURRENCY   ceiling for calls in flight (default: 4)
+"""
+
+import asyncio
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+from groq import AsyncGroq, RateLimitError
+
+DURATION_PART = re.compile(r"([\d.]+)(ms|h|m|s)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+# Seconds the last create() in this context waited for a slot (read by groq_telemetry)
+last_queue_seconds: ContextVar[float] = ContextVar("groq_queue_seconds", default=0.0)
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse Groq reset durations like '2m59.56s' or '7.66s' into seconds"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+
+
+def _header_int(headers, name: str) -> Optional[int]:
+    try:
+        return int(float(headers.get(name)))
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimit:
+    """Concurrency limit resized from Groq rate-limit headers"""
+
+    def __init__(self, maximum: int, minimum: int = 1):
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.limit = self.maximum
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.paused_until = 0.0
+        self.avg_tokens: Optional[float] = None
+        self.calls = 0
+        self.rate_limited = 0
+        self.wait_seconds = 0.0
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+
+    # ------------------------------------------------------------------ slots
+
+    def _try_take(self) -> Optional[float]:
+        """Take a slot (returns None) or return how long to wait (lock held)"""
+        pause = self.paused_until - time.monotonic()
+        if pause > 0:
+            return pause
+        if self.in_flight >= self.limit:
+            return 0.05
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        return None
+
+    def acquire(self) -> float:
+        """Block until a slot is free; returns the seconds waited"""
+        started = time.monotonic()
+        with self._condition:
+            while True:
+                wait = self._try_take()
+                if wait is None:
+                    break
+                self._condition.wait(timeout=wait)
+            waited = time.monotonic() - started
+            self.wait_seconds += waited
+        last_queue_seconds.set(waited)
+        return waited
+
+    async def aacquire(self) -> float:
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                wait = self._try_take()
+                if wait is None:
+                    waited = time.monotonic() - started
+                    self.wait_seconds += waited
+                    break
+            await asyncio.sleep(wait)
+        last_queue_seconds.set(waited)
+        return waited
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    # ------------------------------------------------------------------ feedback
+
+    def observe(self, headers, total_tokens: Optional[int] = None):
+        """Resize the limit from a successful response's headers and usage"""
+        remaining_tokens = _header_int(headers, "x-ratelimit-remaining-tokens")
+        remaining_requests = _header_int(headers, "x-ratelimit-remaining-requests")
+
+        with self._condition:
+            self.calls += 1
+            if total_tokens:
+                self.avg_tokens = total_tokens if self.avg_tokens is None else (
+                    0.8 * self.avg_tokens + 0.2 * total_tokens
+                )
+
+            limit = self.limit + 1  # additive increase when nothing is reported
+            if remaining_tokens is not None and self.avg_tokens:
+                limit = int(remaining_tokens // self.avg_tokens)
+                if limit < 1:
+                    # Out of tokens for this window: wait for it to reset
+                    reset = parse_duration(headers.get("x-ratelimit-reset-tokens")) or 1.0
+                    self.paused_until = max(self.paused_until, time.monotonic() + reset)
+            if remaining_requests is not None:
+                limit = min(limit, remaining_requests)
+                if remaining_requests < 1:
+                    reset = parse_duration(headers.get("x-ratelimit-reset-requests")) or 1.0
+                    self.paused_until = max(self.paused_until, time.monotonic() + reset)
+
+            self.limit = max(self.minimum, min(self.maximum, limit))
+            self._condition.notify_all()
+
+    def throttled(self, headers):
+        """Halve the limit and pause new calls after a 429"""
+        retry_after = parse_duration((headers or {}).get("retry-after")) or 1.0
+        with self._condition:
+            self.rate_limited += 1
+            self.limit = max(self.minimum, self.limit // 2)
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "max_limit": self.maximum,
+                "peak_in_flight": self.peak_in_flight,
+                "calls": self.calls,
+                "rate_limited": self.rate_limited,
+                "wait_seconds": round(self.wait_seconds, 3),
+                "avg_tokens": round(self.avg_tokens) if self.avg_tokens else None,
+            }
+
+
+_limit: Optional[AdaptiveLimit] = None
+_limit_lock = threading.Lock()
+
+
+def get_limit() -> AdaptiveLimit:
+    """Process-wide limit, created on first use so .env settings are loaded"""
+    global _limit
+    with _limit_lock:
+        if _limit is None:
+            _limit = AdaptiveLimit(max_concurrency())
+        return _limit
+
+
+def max_concurrency() -> int:
+    return int(os.getenv("GROQ_MAX_CONCURRENCY", "4"))
+
+
+def get_stats() -> Dict[str, Any]:
+    """Return concurrency accounting for this process"""
+    return get_limit().as_dict()
+
+
+def _usage_tokens(completion) -> Optional[int]:
+    usage = getattr(completion, "usage", None)
+    return getattr(usage, "total_tokens", None) if usage else None
+
+
+class _Completions:
+    """chat.completions proxy that runs each create() under the adaptive limit"""
+
+    def __init__(self, completions, is_async: bool):
+        self._completions = completions
+        self._is_async = is_async
+
+    def __getattr__(self, name):
+        return getattr(self._completions, name)
+
+    def create(self, **kwargs):
+        if self._is_async:
+            return self._acreate(**kwargs)
+        if kwargs.get("stream"):
+            return self._stream(**kwargs)
+
+        limit = get_limit()
+        limit.acquire()
+        try:
+            raw = self._completions.with_raw_response.create(**kwargs)
+        except RateLimitError as e:
+            limit.throttled(getattr(e.response, "headers", None))
+            raise
+        finally:
+            limit.release()
+        completion = raw.parse()
+        limit.observe(raw.headers, _usage_tokens(completion))
+        return completion
+
+    async def _acreate(self, **kwargs):
+        if kwargs.get("stream"):
+            return await self._astream(**kwargs)
+
+        limit = get_limit()
+        await limit.aacquire()
+        try:
+            raw = await self._completions.with_raw_response.create(**kwargs)
+        except RateLimitError as e:
+            limit.throttled(getattr(e.response, "headers", None))
+            raise
+        finally:
+            limit.release()
+        completion = await raw.parse()
+        limit.observe(raw.headers, _usage_tokens(completion))
+        return completion
+
+    def _stream(self, **kwargs):
+        """Start a streamed completion; its slot is held until the stream is consumed"""
+        limit = get_limit()
+        limit.acquire()
+        try:
+            stream = self._completions.create(**kwargs)
+        except RateLimitError as e:
+            limit.throttled(getattr(e.response, "headers", None))
+            limit.release()
+            raise
+        except Exception:
+            limit.release()
+            raise
+
+        def chunks():
+            try:
+                yield from stream
+            finally:
+                limit.release()
+        return chunks()
+
+    async def _astream(self, **kwargs):
+        limit = get_limit()
+        await limit.aacquire()
+        try:
+            stream = await self._completions.create(**kwargs)
+        except RateLimitError as e:
+            limit.throttled(getattr(e.response, "headers", None))
+            limit.release()
+            raise
+        except Exception:
+            limit.release()
+            raise
+
+        async def chunks():
+            try:
+                async for chunk in stream:
+                    yield chunk
+            finally:
+                limit.release()
+        return chunks()
+
+
+class _Chat:
+    def __init__(self, chat, is_async: bool):
+        self._chat = chat
+        self.completions = _Completions(chat.completions, is_async)
+
+    def __getattr__(self, name):
+        return getattr(self._chat, name)
+
+
+class AdaptiveGroq:
+    """Groq/AsyncGroq wrapper that schedules completions under the adaptive limit"""
+
+    def __init__(self, client):
+        self.client = client
+        self.is_async = isinstance(client, AsyncGroq) or getattr(client, "is_async", False)
+        self.chat = _Chat(client.chat, self.is_async)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+def rate_adaptive(client):
+    """Wrap a groq Groq or AsyncGroq client with the shared adaptive limit"""
+    if isinstance(client, AdaptiveGroq):
+        return client
+    return AdaptiveGroq(client)
+
+
+def summarize_in_order(fn: Callable, items: Iterable, workers: Optional[int] = None) -> Iterator:
+    """
+    Run fn over items on a thread pool, yielding results in input order
+
+    The pool is sized to the concurrency ceiling; the adaptive limit decides
+    how many Groq calls actually run at once. Results can be consumed (and
+    saved) while later items are still being summarized.
+    """
+    with ThreadPoolExecutor(max_workers=workers or max_concurrency()) as executor:
+        yield from executor.map(fn, items)
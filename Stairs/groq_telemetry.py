@@ -0,0 +1,341 @@
+"""
+Telemetry for Groq chat completions
+
+Every Groq client in this project is wrapped with instrumented(), which
+records for each completion that actually reaches Groq (cache hits are not
+calls):
+
+- wall time, including time spent waiting for a groq_scheduler slot
+- queue time (the slot wait on its own)
+- prompt and completion tokens from the response usage
+- model
+- outcome: ok, json_error (JSON mode reply that doesn't parse) or
+  api_error (the call raised)
+
+Summaries that end up on fallback text after a failed call are counted with
+record_fallback(). Everything is aggregated into fixed-bucket histograms,
+overall and per model, with counts per outcome, for the process (get_stats()) and for a run
+(track_run(), which scopes a Telemetry to the current context and the
+asyncio tasks created inside it).
+"""
+
+import contextlib
+import json
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+from groq import AsyncGroq
+
+from groq_scheduler import last_queue_seconds
+
+OK = "ok"
+JSON_ERROR = "json_error"
+API_ERROR = "api_error"
+FALLBACK = "fallback"
+OUTCOMES = (OK, JSON_ERROR, API_ERROR, FALLBACK)
+
+SECONDS_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+
+class Histogram:
+    """Fixed-bucket histogram; percentiles are reported as bucket upper bounds"""
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def add(self, value: float):
+        index = next((i for i, bound in enumerate(self.bounds) if value <= bound), len(self.bounds))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self.count:
+            return None
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= fraction * self.count:
+                return self.bounds[index] if index < len(self.bounds) else self.max
+        return self.max
+
+    def as_dict(self) -> Dict[str, Any]:
+        labels = [f"<={bound}" for bound in self.bounds] + [f">{self.bounds[-1]}"]
+        return {
+            "count": self.count,
+            "sum": round(self.total, 3),
+            "min": round(self.min, 3) if self.min is not None else None,
+            "max": round(self.max, 3) if self.max is not None else None,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+    @classmethod
+    def from_dict(cls, bounds: Sequence[float], data: Dict[str, Any]) -> "Histogram":
+        """Rebuild a histogram saved with as_dict()"""
+        histogram = cls(bounds)
+        counts = list(data.get("buckets", {}).values())
+        if len(counts) == len(histogram.counts):
+            histogram.counts = counts
+            histogram.count = data.get("count", sum(counts))
+            histogram.total = data.get("sum", 0.0)
+            histogram.min = data.get("min")
+            histogram.max = data.get("max")
+        return histogram
+
+
+class _Series:
+    """Histograms for one slice of calls (everything, or one model)"""
+
+    def __init__(self):
+        self.wall_seconds = Histogram(SECONDS_BUCKETS)
+        self.queue_seconds = Histogram(SECONDS_BUCKETS)
+        self.prompt_tokens = Histogram(TOKEN_BUCKETS)
+        self.completion_tokens = Histogram(TOKEN_BUCKETS)
+
+    def add(self, wall: float, queue: float, prompt_tokens: Optional[int], completion_tokens: Optional[int]):
+        self.wall_seconds.add(wall)
+        self.queue_seconds.add(queue)
+        if prompt_tokens is not None:
+            self.prompt_tokens.add(prompt_tokens)
+        if completion_tokens is not None:
+            self.completion_tokens.add(completion_tokens)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.wall_seconds.count,
+            "wall_seconds": self.wall_seconds.as_dict(),
+            "queue_seconds": self.queue_seconds.as_dict(),
+            "prompt_tokens": self.prompt_tokens.as_dict(),
+            "completion_tokens": self.completion_tokens.as_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "_Series":
+        series = cls()
+        series.wall_seconds = Histogram.from_dict(SECONDS_BUCKETS, data.get("wall_seconds", {}))
+        series.queue_seconds = Histogram.from_dict(SECONDS_BUCKETS, data.get("queue_seconds", {}))
+        series.prompt_tokens = Histogram.from_dict(TOKEN_BUCKETS, data.get("prompt_tokens", {}))
+        series.completion_tokens = Histogram.from_dict(TOKEN_BUCKETS, data.get("completion_tokens", {}))
+        return series
+
+
+class Telemetry:
+    """Aggregated Groq call measurements"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.all = _Series()
+        self.models: Dict[str, _Series] = {}
+        self.outcomes = {outcome: 0 for outcome in OUTCOMES}
+
+    def record(self, model: str, outcome: str, wall: float, queue: float = 0.0,
+               prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None):
+        with self._lock:
+            self.outcomes[outcome] += 1
+            self.all.add(wall, queue, prompt_tokens, completion_tokens)
+            self.models.setdefault(model or "unknown", _Series()).add(wall, queue, prompt_tokens, completion_tokens)
+
+    def record_fallback(self):
+        with self._lock:
+            self.outcomes[FALLBACK] += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "since": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                "outcomes": dict(self.outcomes),
+                **self.all.as_dict(),
+                "models": {model: series.as_dict() for model, series in sorted(self.models.items())},
+            }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Telemetry":
+        """Rebuild telemetry saved with as_dict(), e.g. to keep adding to a resumed run"""
+        telemetry = cls()
+        if data.get("since"):
+            telemetry.started = time.mktime(time.strptime(data["since"], "%Y-%m-%dT%H:%M:%S"))
+        telemetry.outcomes.update(data.get("outcomes", {}))
+        telemetry.all = _Series.from_dict(data)
+        telemetry.models = {model: _Series.from_dict(series) for model, series in data.get("models", {}).items()}
+        return telemetry
+
+
+_process = Telemetry()
+_run: ContextVar[Optional[Telemetry]] = ContextVar("groq_telemetry_run", default=None)
+
+
+def _targets():
+    run = _run.get()
+    return (_process, run) if run is not None else (_process,)
+
+
+def record(model: str, outcome: str, wall: float, queue: float = 0.0,
+           prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None):
+    """Record one completion in the process totals and the current run"""
+    for telemetry in _targets():
+        telemetry.record(model, outcome, wall, queue, prompt_tokens, completion_tokens)
+
+
+def record_fallback():
+    """Count a summary that fell back to canned text after a failed call"""
+    for telemetry in _targets():
+        telemetry.record_fallback()
+
+
+@contextlib.contextmanager
+def track_run(run: Optional[Telemetry] = None) -> Iterator[Telemetry]:
+    """Collect the calls made inside the block (and tasks it creates) separately
+
+    Pass the same Telemetry again to add more calls to a run (e.g. one per job).
+    """
+    run = run or Telemetry()
+    token = _run.set(run)
+    try:
+        yield run
+    finally:
+        _run.reset(token)
+
+
+def get_stats() -> Dict[str, Any]:
+    """Return histograms for every call made by this process"""
+    return _process.as_dict()
+
+
+def _usage(usage) -> Dict[str, Optional[int]]:
+    if isinstance(usage, dict):
+        return {"prompt_tokens": usage.get("prompt_tokens"), "completion_tokens": usage.get("completion_tokens")}
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+    }
+
+
+def _outcome(kwargs: Dict[str, Any], completion) -> str:
+    """ok, or json_error if a JSON-mode reply doesn't parse into an object"""
+    if (kwargs.get("response_format") or {}).get("type") != "json_object":
+        return OK
+    try:
+        return OK if isinstance(json.loads(completion.choices[0].message.content or ""), dict) else JSON_ERROR
+    except (ValueError, IndexError, AttributeError):
+        return JSON_ERROR
+
+
+def _chunk_usage(chunk) -> Optional[Any]:
+    """Usage reported on a stream's final chunk (under x_groq)"""
+    x_groq = getattr(chunk, "x_groq", None)
+    if isinstance(x_groq, dict):
+        return x_groq.get("usage")
+    return getattr(x_groq, "usage", None)
+
+
+class _Completions:
+    """chat.completions proxy that times and classifies each create()"""
+
+    def __init__(self, completions, is_async: bool):
+        self._completions = completions
+        self._is_async = is_async
+
+    def __getattr__(self, name):
+        return getattr(self._completions, name)
+
+    def create(self, **kwargs):
+        if self._is_async:
+            return self._acreate(**kwargs)
+        model = kwargs.get("model")
+        last_queue_seconds.set(0.0)
+        started = time.monotonic()
+        try:
+            result = self._completions.create(**kwargs)
+        except Exception:
+            record(model, API_ERROR, time.monotonic() - started, last_queue_seconds.get())
+            raise
+        if kwargs.get("stream"):
+            return self._stream(result, model, started)
+        record(model, _outcome(kwargs, result), time.monotonic() - started, last_queue_seconds.get(),
+               **_usage(getattr(result, "usage", None)))
+        return result
+
+    async def _acreate(self, **kwargs):
+        model = kwargs.get("model")
+        last_queue_seconds.set(0.0)
+        started = time.monotonic()
+        try:
+            result = await self._completions.create(**kwargs)
+        except Exception:
+            record(model, API_ERROR, time.monotonic() - started, last_queue_seconds.get())
+            raise
+        if kwargs.get("stream"):
+            return self._astream(result, model, started)
+        record(model, _outcome(kwargs, result), time.monotonic() - started, last_queue_seconds.get(),
+               **_usage(getattr(result, "usage", None)))
+        return result
+
+    def _stream(self, stream, model: str, started: float):
+        """Yield a stream's chunks, recording the call once it has been consumed"""
+        queue = last_queue_seconds.get()
+        usage, outcome = None, API_ERROR
+        try:
+            for chunk in stream:
+                usage = _chunk_usage(chunk) or usage
+                yield chunk
+            outcome = OK
+        except GeneratorExit:
+            outcome = OK  # closed early by the reader, not a failed call
+            raise
+        finally:
+            record(model, outcome, time.monotonic() - started, queue, **_usage(usage))
+
+    async def _astream(self, stream, model: str, started: float):
+        queue = last_queue_seconds.get()
+        usage, outcome = None, API_ERROR
+        try:
+            async for chunk in stream:
+                usage = _chunk_usage(chunk) or usage
+                yield chunk
+            outcome = OK
+        except GeneratorExit:
+            outcome = OK  # closed early by the reader, not a failed call
+            raise
+        finally:
+            record(model, outcome, time.monotonic() - started, queue, **_usage(usage))
+
+
+class _Chat:
+    def __init__(self, chat, is_async: bool):
+        self._chat = chat
+        self.completions = _Completions(chat.completions, is_async)
+
+    def __getattr__(self, name):
+        return getattr(self._chat, name)
+
+
+class InstrumentedGroq:
+    """Groq/AsyncGroq wrapper that records telemetry for every completion"""
+
+    def __init__(self, client):
+        self.client = client
+        self.is_async = isinstance(client, AsyncGroq) or getattr(client, "is_async", False)
+        self.chat = _Chat(client.chat, self.is_async)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+def instrumented(client):
+    """Wrap a groq Groq or AsyncGroq client (or another wrapper) with telemetry"""
+    if isinstance(client, InstrumentedGroq):
+        return client
+    return InstrumentedGroq(client)
@@ -0,0 +1,173 @@
+"""
+Cached resolver for patient and trainer display IDs
+
+Loads PATIENTS and TRAINERS once and maps Notion page IDs to the display
+IDs used in log names (patients: 001, trainers: T003), so renaming or
+generating thousands of logs costs two scans instead of one pages.retrieve
+per log. The maps can optionally be kept on disk with a TTL.
+"""
+
+import json
+import os
+import time
+from typing import Dict, Optional
+
+from notion_query import iter_database_pages
+
+DEFAULT_CACHE_PATH = os.path.join(".notion_cache", "display_ids.json")
+
+PATIENT_ID_FIELDS = ["ID", "Id", "Patient ID", "id"]
+TRAINER_ID_FIELDS = ["ID", "Id", "Trainer ID", "id"]
+
+
+def _normalize_id(page_id: str) -> str:
+    return (page_id or "").replace("-", "").lower()
+
+
+def extract_numeric_id(props: Dict, field_names) -> Optional[int]:
+    """Return the number from the first unique_id/number ID field, or None"""
+    for field_name in field_names:
+        if field_name in props:
+            id_prop = props[field_name]
+
+            # Handle unique_id type
+            if id_prop.get("type") == "unique_id":
+                unique_id_data = id_prop.get("unique_id")
+                if unique_id_data and unique_id_data.get("number"):
+                    return int(unique_id_data.get("number"))
+
+            # Handle number type
+            elif id_prop.get("type") == "number":
+                number = id_prop.get("number")
+                if number:
+                    return int(number)
+    return None
+
+
+def _page_name(props: Dict) -> str:
+    title = props.get("Name", {}).get("title", [])
+    return "".join(item.get("plain_text", "") for item in title)
+
+
+def patient_entry(page: Dict) -> Dict[str, str]:
+    """Display ID (001, or last 3 chars of the page ID) and name for a patient page"""
+    props = page.get("properties", {})
+    number = extract_numeric_id(props, PATIENT_ID_FIELDS)
+    display_id = f"{number:03d}" if number else page["id"][-3:]
+    return {"id": display_id, "name": _page_name(props)}
+
+
+def trainer_entry(page: Dict) -> Dict[str, str]:
+    """Display ID (T003, or T + last 3 chars of the page ID) and name for a trainer page"""
+    props = page.get("properties", {})
+    number = extract_numeric_id(props, TRAINER_ID_FIELDS)
+    display_id = f"T{number:03d}" if number else f"T{page['id'][-3:]}"
+    return {"id": display_id, "name": _page_name(props)}
+
+
+class IdResolver:
+    """
+    In-memory page ID -> display ID maps for PATIENTS and TRAINERS
+
+    Both databases are scanned on the first lookup. Pages missing from the
+    scan (e.g. created since) are retrieved once and then cached.
+    """
+
+    def __init__(self, notion, patients_db: Optional[str] = None, trainers_db: Optional[str] = None,
+                 cache_path: Optional[str] = None, ttl_seconds: float = 0):
+        self.notion = notion
+        self.patients_db = patients_db or os.getenv("NOTION_DATABASE_ID_PATIENTS")
+        self.trainers_db = trainers_db or os.getenv("NOTION_DATABASE_ID_TRAINERS")
+        self.cache_path = cache_path
+        self.ttl_seconds = ttl_seconds
+        self.patients: Optional[Dict[str, Dict[str, str]]] = None
+        self.trainers: Optional[Dict[str, Dict[str, str]]] = None
+
+    # ------------------------------------------------------------------ loading
+
+    def load(self, force: bool = False):
+        """Populate both maps from the disk cache or a fresh scan"""
+        if self.patients is not None and not force:
+            return
+        if not force and self._load_cache():
+            return
+
+        self.patients = {}
+        if self.patients_db:
+            for page in iter_database_pages(self.notion, self.patients_db, properties=["Name"] + PATIENT_ID_FIELDS):
+                self.patients[_normalize_id(page["id"])] = patient_entry(page)
+
+        self.trainers = {}
+        if self.trainers_db:
+            for page in iter_database_pages(self.notion, self.trainers_db, properties=["Name"] + TRAINER_ID_FIELDS):
+                self.trainers[_normalize_id(page["id"])] = trainer_entry(page)
+
+        self._save_cache()
+
+    def _load_cache(self) -> bool:
+        if not self.cache_path or self.ttl_seconds <= 0 or not os.path.exists(self.cache_path):
+            return False
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if time.time() - cached.get("saved_at", 0) > self.ttl_seconds:
+            return False
+        self.patients = cached.get("patients", {})
+        self.trainers = cached.get("trainers", {})
+        return True
+
+    def _save_cache(self):
+        if not self.cache_path or self.ttl_seconds <= 0:
+            return
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.cache_path, "w", encoding="utf-8") as f:
+            json.dump({"saved_at": time.time(), "patients": self.patients, "trainers": self.trainers}, f)
+
+    def _lookup(self, table: Dict[str, Dict[str, str]], page_id: str, build_entry) -> Optional[Dict[str, str]]:
+        key = _normalize_id(page_id)
+        if key not in table:
+            try:
+                table[key] = build_entry(self.notion.pages.retrieve(page_id=page_id))
+            except Exception as e:
+                print(f"   Error resolving page {page_id[:8]}...: {e}")
+                return None
+            self._save_cache()
+        return table[key]
+
+    # ------------------------------------------------------------------ lookups
+
+    def patient_id(self, page_id: str) -> str:
+        """Patient display ID (e.g. 001) for a patient page ID"""
+        self.load()
+        entry = self._lookup(self.patients, page_id, patient_entry)
+        return entry["id"] if entry else "000"
+
+    def trainer_id(self, page_id: str) -> str:
+        """Trainer display ID (e.g. T003) for a trainer page ID"""
+        self.load()
+        entry = self._lookup(self.trainers, page_id, trainer_entry)
+        return entry["id"] if entry else "T000"
+
+    def patient_name(self, page_id: str) -> str:
+        """Patient name for a patient page ID"""
+        self.load()
+        entry = self._lookup(self.patients, page_id, patient_entry)
+        return (entry["name"] or "Unknown") if entry else "Unknown"
+
+
+def get_id_resolver(notion) -> IdResolver:
+    """
+    Build a resolver configured from the environment
+
+    ID_CACHE_TTL (seconds, default 0 = disabled) enables the on-disk cache
+    at ID_CACHE_PATH (default .notion_cache/display_ids.json).
+    """
+    return IdResolver(
+        notion,
+        cache_path=os.getenv("ID_CACHE_PATH", DEFAULT_CACHE_PATH),
+        ttl_seconds=float(os.getenv("ID_CACHE_TTL", "0"))
+    )
@@ -0,0 +1,371 @@
+"""
+Persistent background jobs for the API
+
+Long runs (like weekly reports for every patient) don't fit in one HTTP
+request. The API submits them here and returns a job ID straight away; an
+in-process pool of asyncio workers does the work, and clients poll the job
+for per-item progress and results.
+
+A job kind is registered with two coroutines, plus an optional third:
+
+- plan(params) returns the job's items (e.g. one per patient)
+- run(params, item) processes one item (a dict with job_id, key and label)
+  and returns its result dict; its "status" becomes the item's status
+- summarize(job_id) returns the job's final summary dict (or None); it runs
+  once, when the job completes
+
+A job's summary (e.g. LLM telemetry for the whole run) is stored next to its
+results, so it is still there after a restart.
+
+Jobs and item results are stored in SQLite as they progress. On startup,
+items that were running when the process stopped go back to pending and
+unfinished jobs resume where they left off; finished items are not redone.
+
+Configuration (environment):
+    JOB_WORKERS       items processed at once (default: 4)
+    JOB_STORE_PATH    SQLite file (default: .notion_cache/jobs.sqlite3)
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+DEFAULT_JOB_STORE_PATH = os.path.join(".notion_cache", "jobs.sqlite3")
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+PENDING = "pending"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    planned INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    summary TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    item_key TEXT NOT NULL,
+    label TEXT,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    finished_at TEXT,
+    PRIMARY KEY (job_id, item_key)
+);
+"""
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+
+
+class JobStore:
+    """SQLite record of jobs and their items"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        conn.row_factory = sqlite3.Row
+        if not self._initialized:
+            conn.executescript(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "summary" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN summary TEXT")
+                conn.commit()
+            self._initialized = True
+        return conn
+
+    def _write(self, sql: str, args: tuple = (), many: bool = False):
+        with self._lock:
+            conn = self._connect()
+            try:
+                (conn.executemany if many else conn.execute)(sql, args)
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _read(self, sql: str, args: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            conn = self._connect()
+            try:
+                return conn.execute(sql, args).fetchall()
+            finally:
+                conn.close()
+
+    def create(self, kind: str, params: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        self._write(
+            "INSERT INTO jobs (job_id, kind, params, status, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(params, sort_keys=True), QUEUED, _now())
+        )
+        return job_id
+
+    def find_active(self, kind: str, params: Dict[str, Any]) -> Optional[str]:
+        """ID of a queued or running job of this kind with the same params"""
+        rows = self._read(
+            "SELECT job_id FROM jobs WHERE kind = ? AND params = ? AND status IN (?, ?) ORDER BY created_at DESC",
+            (kind, json.dumps(params, sort_keys=True), QUEUED, RUNNING)
+        )
+        return rows[0]["job_id"] if rows else None
+
+    def set_items(self, job_id: str, items: List[Dict[str, Any]]):
+        self._write(
+            "INSERT OR IGNORE INTO job_items (job_id, position, item_key, label, status) VALUES (?, ?, ?, ?, ?)",
+            [(job_id, position, item["key"], item.get("label"), PENDING) for position, item in enumerate(items)],
+            many=True
+        )
+        self._write("UPDATE jobs SET planned = 1, status = ?, started_at = COALESCE(started_at, ?) WHERE job_id = ?",
+                    (RUNNING, _now(), job_id))
+
+    def set_item_status(self, job_id: str, item_key: str, status: str,
+                        result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        finished_at = _now() if status not in (PENDING, RUNNING) else None
+        self._write(
+            "UPDATE job_items SET status = ?, result = ?, error = ?, finished_at = ? WHERE job_id = ? AND item_key = ?",
+            (status, json.dumps(result, default=str) if result is not None else None, error, finished_at, job_id, item_key)
+        )
+
+    def finish(self, job_id: str, status: str, error: Optional[str] = None):
+        self._write("UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE job_id = ?",
+                    (status, error, _now(), job_id))
+
+    def save_summary(self, job_id: str, summary: Dict[str, Any]):
+        self._write("UPDATE jobs SET summary = ? WHERE job_id = ?", (json.dumps(summary, default=str), job_id))
+
+    def summary(self, job_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._read("SELECT summary FROM jobs WHERE job_id = ?", (job_id,))
+        return json.loads(rows[0]["summary"]) if rows and rows[0]["summary"] else None
+
+    def complete_if_done(self, job_id: str) -> bool:
+        """Mark the job completed once no items are left; True only for the call that did it"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = ?, finished_at = ? WHERE job_id = ? AND status NOT IN (?, ?) "
+                    "AND NOT EXISTS (SELECT 1 FROM job_items WHERE job_id = ? AND status IN (?, ?))",
+                    (COMPLETED, _now(), job_id, COMPLETED, FAILED, job_id, PENDING, RUNNING)
+                )
+                conn.commit()
+                return cursor.rowcount == 1
+            finally:
+                conn.close()
+
+    def resume(self) -> List[Dict[str, Any]]:
+        """Return unfinished jobs with their pending item keys (interrupted items become pending)"""
+        self._write("UPDATE job_items SET status = ? WHERE status = ?", (PENDING, RUNNING))
+        jobs = []
+        for row in self._read("SELECT job_id, kind, params, planned FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+                              (QUEUED, RUNNING)):
+            pending = [item["item_key"] for item in self._read(
+                "SELECT item_key FROM job_items WHERE job_id = ? AND status = ? ORDER BY position",
+                (row["job_id"], PENDING)
+            )]
+            jobs.append({"job_id": row["job_id"], "kind": row["kind"], "params": json.loads(row["params"]),
+                         "planned": bool(row["planned"]), "pending": pending})
+        return jobs
+
+    def job(self, job_id: str) -> Dict[str, Any]:
+        row = self._read("SELECT kind, params FROM jobs WHERE job_id = ?", (job_id,))[0]
+        return {"job_id": job_id, "kind": row["kind"], "params": json.loads(row["params"])}
+
+    def item(self, job_id: str, item_key: str) -> Dict[str, Any]:
+        row = self._read("SELECT item_key, label FROM job_items WHERE job_id = ? AND item_key = ?", (job_id, item_key))[0]
+        return {"job_id": job_id, "key": row["item_key"], "label": row["label"]}
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job with per-item status, counts by status and results"""
+        rows = self._read("SELECT * FROM jobs WHERE job_id = ?", (job_id,))
+        if not rows:
+            return None
+        job = rows[0]
+        items = [
+            {
+                "key": item["item_key"],
+                "label": item["label"],
+                "status": item["status"],
+                "result": json.loads(item["result"]) if item["result"] else None,
+                "error": item["error"],
+                "finished_at": item["finished_at"],
+            }
+            for item in self._read("SELECT * FROM job_items WHERE job_id = ? ORDER BY position", (job_id,))
+        ]
+        counts: Dict[str, int] = {}
+        for item in items:
+            counts[item["status"]] = counts.get(item["status"], 0) + 1
+        return {
+            "job_id": job["job_id"],
+            "kind": job["kind"],
+            "params": json.loads(job["params"]),
+            "status": job["status"],
+            "error": job["error"],
+            "created_at": job["created_at"],
+            "started_at": job["started_at"],
+            "finished_at": job["finished_at"],
+            "summary": json.loads(job["summary"]) if job["summary"] else None,
+            "total": len(items),
+            "done": len(items) - counts.get(PENDING, 0) - counts.get(RUNNING, 0),
+            "counts": counts,
+            "items": items,
+        }
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        rows = self._read(
+            "SELECT job_id, kind, status, created_at, finished_at FROM jobs ORDER BY created_at DESC LIMIT ?",
+            (limit,)
+        )
+        return [dict(row) for row in rows]
+
+
+PlanFn = Callable[[Dict[str, Any]], Awaitable[List[Dict[str, Any]]]]
+RunFn = Callable[[Dict[str, Any], Dict[str, Any]], Awaitable[Dict[str, Any]]]
+SummarizeFn = Callable[[str], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class JobQueue:
+    """In-process asyncio worker pool over a JobStore"""
+
+    def __init__(self, store: JobStore, workers: int):
+        self.store = store
+        self.workers = max(1, workers)
+        self._kinds: Dict[str, tuple] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def register(self, kind: str, plan: PlanFn, run: RunFn, summarize: Optional[SummarizeFn] = None):
+        self._kinds[kind] = (plan, run, summarize)
+
+    async def start(self):
+        """Start the workers and requeue unfinished jobs (call once the event loop is running)"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        for job in await asyncio.to_thread(self.store.resume):
+            if job["kind"] not in self._kinds:
+                continue
+            if not job["planned"]:
+                self._queue.put_nowait((job["job_id"], None))
+            elif job["pending"]:
+                for item_key in job["pending"]:
+                    self._queue.put_nowait((job["job_id"], item_key))
+            else:
+                await self._complete(job["job_id"], job["kind"])
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, kind: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Queue a job, or return the matching one already queued or running
+
+        Returns:
+            Dict with job_id and whether an existing job was reused
+        """
+        if kind not in self._kinds:
+            raise KeyError(f"Unknown job kind: {kind}")
+        await self.start()
+        existing = await asyncio.to_thread(self.store.find_active, kind, params)
+        if existing:
+            return {"job_id": existing, "existing": True}
+        job_id = await asyncio.to_thread(self.store.create, kind, params)
+        self._queue.put_nowait((job_id, None))
+        return {"job_id": job_id, "existing": False}
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.store.recent, limit)
+
+    async def save_summary(self, job_id: str, summary: Dict[str, Any]):
+        await asyncio.to_thread(self.store.save_summary, job_id, summary)
+
+    async def summary(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.store.summary, job_id)
+
+    async def _worker(self):
+        while True:
+            job_id, item_key = await self._queue.get()
+            try:
+                if item_key is None:
+                    await self._plan(job_id)
+                else:
+                    await self._run(job_id, item_key)
+            except Exception as e:
+                print(f"Job {job_id} worker error: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _plan(self, job_id: str):
+        job = await asyncio.to_thread(self.store.job, job_id)
+        plan = self._kinds[job["kind"]][0]
+        try:
+            items = await plan(job["params"])
+        except Exception as e:
+            await asyncio.to_thread(self.store.finish, job_id, FAILED, getattr(e, "detail", None) or str(e))
+            return
+        await asyncio.to_thread(self.store.set_items, job_id, items)
+        if not items:
+            await asyncio.to_thread(self.store.finish, job_id, COMPLETED)
+        for item in items:
+            self._queue.put_nowait((job_id, item["key"]))
+
+    async def _run(self, job_id: str, item_key: str):
+        job = await asyncio.to_thread(self.store.job, job_id)
+        run = self._kinds[job["kind"]][1]
+        item = await asyncio.to_thread(self.store.item, job_id, item_key)
+        await asyncio.to_thread(self.store.set_item_status, job_id, item_key, RUNNING)
+        try:
+            result = await run(job["params"], item)
+            await asyncio.to_thread(self.store.set_item_status, job_id, item_key,
+                                    result.get("status", COMPLETED), result)
+        except Exception as e:
+            await asyncio.to_thread(self.store.set_item_status, job_id, item_key,
+                                    "error", None, getattr(e, "detail", None) or str(e))
+
+        await self._complete(job_id, job["kind"])
+
+    async def _complete(self, job_id: str, kind: str):
+        # Items finishing together may both get here; only one marks the job completed
+        if not await asyncio.to_thread(self.store.complete_if_done, job_id):
+            return
+        summarize = self._kinds[kind][2]
+        summary = await summarize(job_id) if summarize else None
+        if summary is not None:
+            await asyncio.to_thread(self.store.save_summary, job_id, summary)
+
+
+def job_store_path() -> str:
+    """Job store location (JOB_STORE_PATH, read at call time after load_dotenv)"""
+    return os.getenv("JOB_STORE_PATH", DEFAULT_JOB_STORE_PATH)
+
+
+def job_workers() -> int:
+    return int(os.getenv("JOB_WORKERS", "4"))
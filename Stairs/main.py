@@ -1,13 +1,32 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
-from groq import Groq
-from notion_client import Client
+from typing import Optional, List, Dict, Any, AsyncIterator
+from groq import AsyncGroq
+from notion_client import AsyncClient
+import asyncio
 import os
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 import json
+import base64
+import hashlib
+import weakref
+
+from notion_query import aiter_database_pages, aquery_page
+from notion_mirror import normalize_id, use_async_mirror_if_enabled
+from notion_scheduler import rate_limited
+from groq_cache import with_response_cache
+from groq_scheduler import get_stats as get_groq_stats, rate_adaptive
+from groq_telemetry import Telemetry, get_stats as get_llm_stats, instrumented, record_fallback, track_run
+from job_queue import JobQueue, JobStore, job_store_path, job_workers
+from ttl_cache import AsyncTTLCache, patient_cache_stale, patient_cache_ttl
+from notion_records import WORKOUT_FIELDS, WORKOUT_PROPERTIES, Workout, decode_patient, decode_workout
+from prompt_budget import dedupe_notes, fit_blocks, section_budget
+from rule_summary import is_sparse, rule_based_weekly_summary
+from model_router import arouted_completion, get_stats as get_routing_stats, route
+from change_tracker import ChangeTracker, FallbackSummary, fingerprint, saved_fingerprint
 
 # Load environment variables
 load_dotenv()
@@ -15,9 +34,16 @@ load_dotenv()
 # Initialize FastAPI app
 app = FastAPI(title="Stairs Gym - Weekly Reports API")
 
-# Initialize Notion and Groq clients
-notion = Client(auth=os.getenv("NOTION_API_KEY"))
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+# Initialize Notion and Groq clients (async, so slow calls don't block the event loop)
+notion = use_async_mirror_if_enabled(rate_limited(AsyncClient(auth=os.getenv("NOTION_API_KEY"))))
+groq_client = with_response_cache(instrumented(rate_adaptive(AsyncGroq(api_key=os.getenv("GROQ_API_KEY")))))
+
+# The weekly summary prompt samples at 0.7, so its responses are only cached on request
+CACHE_WEEKLY_SUMMARIES = os.getenv("GROQ_CACHE_WEEKLY_SUMMARIES", "0") == "1"
+
+# Bounded concurrency for Notion calls shared by all requests
+# (Groq calls are bounded by the adaptive limit in groq_scheduler)
+notion_semaphore = asyncio.Semaphore(int(os.getenv("NOTION_MAX_CONCURRENCY", 3)))
 
 # CORS middleware
 app.add_middleware(
@@ -36,44 +62,29 @@ DB_WORKOUTS = os.getenv("NOTION_DATABASE_ID_WORKOUTS")
 DB_WEEKLY = os.getenv("NOTION_DATABASE_ID_WEEKLY")
 DB_MONTHLY = os.getenv("NOTION_DATABASE_ID_MONTHLY")
 
+# Existing weekly logs and the source fingerprints they were built from
+weekly_tracker = ChangeTracker(notion, DB_WEEKLY, "Week ID")
 
-# ============================================================================
-# HELPER FUNCTIONS
-# ============================================================================
-
-def get_text_from_rich_text(rich_text_array):
-    """Extract plain text from Notion rich text array"""
-    if not rich_text_array:
-        return ""
-    return "".join([item.get("plain_text", "") for item in rich_text_array])
+# One save per Week ID at a time (dropped once no save holds it)
+week_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
 
+# Active-patient list and patient pages, served from memory within the TTL
+patient_list_cache = AsyncTTLCache(patient_cache_ttl(), patient_cache_stale())
+patient_page_cache = AsyncTTLCache(patient_cache_ttl(), patient_cache_stale())
 
-def get_title_from_title_array(title_array):
-    """Extract plain text from Notion title array"""
-    if not title_array:
-        return ""
-    return "".join([item.get("plain_text", "") for item in title_array])
-
-
-def get_select_value(select_obj):
-    """Extract value from Notion select property"""
-    if not select_obj:
-        return None
-    return select_obj.get("name")
-
+# Background jobs (all-patient runs); persisted so a restart resumes them
+job_queue = JobQueue(JobStore(job_store_path()), job_workers())
+WEEKLY_REPORTS_JOB = "weekly_reports_all"
 
-def get_relation_ids(relation_array):
-    """Extract IDs from Notion relation array"""
-    if not relation_array:
-        return []
-    return [item.get("id") for item in relation_array]
+# Groq telemetry per running job; saved in the job row after each item and when it completes
+job_telemetry: Dict[str, Telemetry] = {}
 
 
 # ============================================================================
 # CORE FUNCTIONS FOR WEEKLY REPORTS
 # ============================================================================
 
-def fetch_patient_workout_logs(patient_id: str, days: int = 7) -> List[Dict[str, Any]]:
+async def fetch_patient_workout_logs(patient_id: str, days: int = 7) -> List[Workout]:
     """
     Fetch all workout logs for a patient for the past N days
 
@@ -87,9 +98,10 @@ def fetch_patient_workout_logs(patient_id: str, days: int = 7) -> List[Dict[str,
     end_date = datetime.now()
     start_date = end_date - timedelta(days=days)
 
-    # Query workout logs database
-    response = notion.databases.query(
-        database_id=DB_WORKOUTS,
+    # Query workout logs database (all pages, following cursors)
+    pages = aiter_database_pages(
+        notion,
+        DB_WORKOUTS,
         filter={
             "and": [
                 {
@@ -102,53 +114,206 @@ def fetch_patient_workout_logs(patient_id: str, days: int = 7) -> List[Dict[str,
                 }
             ]
         },
-        sorts=[{"property": "Date", "direction": "ascending"}]
+        sorts=[{"property": "Date", "direction": "ascending"}],
+        properties=WORKOUT_PROPERTIES
     )
 
     workouts = []
-    for page in response.get("results", []):
-        props = page.get("properties", {})
-
-        workout = {
-            "id": page.get("id"),
-            "date": props.get("Date", {}).get("date", {}).get("start", ""),
-            "duration": props.get("Duration (min)", {}).get("number", 0),
-            "exercises": get_text_from_rich_text(props.get("Exercises & Sets", {}).get("rich_text", [])),
-            "focus_areas": [item.get("name") for item in props.get("Focus Areas", {}).get("multi_select", [])],
-            "noticed": get_text_from_rich_text(props.get("What I Noticed", {}).get("rich_text", [])),
-            "improving": get_text_from_rich_text(props.get("What's Improving", {}).get("rich_text", [])),
-            "concerns": get_text_from_rich_text(props.get("Concerns/Issues", {}).get("rich_text", [])),
-            "rating": get_select_value(props.get("Overall Session Rating", {}).get("select")),
-            "patient_rating": get_select_value(props.get("Patient Self-Rating", {}).get("select")),
-            "patient_comments": get_text_from_rich_text(props.get("Patient Comments", {}).get("rich_text", []))
-        }
-        workouts.append(workout)
+    async with notion_semaphore:
+        async for page in pages:
+            workouts.append(decode_workout(page))
 
     return workouts
 
 
-def generate_weekly_summary_with_groq(patient_name: str, workouts: List[Dict[str, Any]]) -> Dict[str, str]:
+def parse_workout_fields(fields: Optional[str]) -> List[str]:
     """
-    Generate a comprehensive weekly summary using Groq AI (Llama models)
+    Resolve a fields= projection (comma-separated Workout fields) for the history endpoint
+
+    Returns:
+        Field names in record order, always including id; all fields if none given
+    """
+    if not fields:
+        return list(Workout.__slots__)
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = sorted(requested - set(Workout.__slots__))
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown workout fields: {', '.join(unknown)}. Valid fields: {', '.join(Workout.__slots__)}"
+        )
+    return [name for name in Workout.__slots__ if name in requested or name == "id"]
+
+
+def encode_cursor(state: Dict[str, Any]) -> str:
+    """Opaque API cursor wrapping Notion's cursor and the query it belongs to"""
+    raw = json.dumps(state, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(state, dict) or "n" not in state:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return state
+
+
+def parse_date_param(name: str, value: Optional[str]) -> Optional[str]:
+    """Validate a since/until query parameter (ISO 8601 date or datetime)"""
+    if value is None:
+        return None
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be an ISO 8601 date, e.g. 2025-01-31")
+    return value
+
+
+def weak_etag(pages: List[Any], *extra: Any) -> str:
+    """
+    Weak ETag for a response built from Notion pages
 
     Args:
-        patient_name: Name of the patient
-        workouts: List of workout log dictionaries
+        pages: Records (or dicts) with id and last_edited_time
+        extra: Anything else the response body depends on (e.g. query bounds)
 
     Returns:
-        Dictionary with summary, improvements, concerns, and recommendations
+        ETag header value, e.g. W/"3f2c9e0d1a7b4c55"
     """
-    if not workouts:
-        return {
-            "summary": f"No workout sessions recorded for {patient_name} this week.",
-            "improvements": "N/A",
-            "concerns": "No activity this week",
-            "recommendations": "Schedule sessions for next week"
-        }
+    entries = [f"{page['id']}@{page['last_edited_time']}" for page in pages]
+    entries.extend(json.dumps(value, sort_keys=True, default=str) for value in extra)
+    return f'W/"{hashlib.sha256(chr(10).join(entries).encode("utf-8")).hexdigest()[:16]}"'
+
+
+async def load_active_patients() -> Dict[str, Any]:
+    """
+    Query PATIENTS for active patients (uncached; use get_active_patients)
+
+    Returns:
+        Dict with the patients and a weak ETag over their last_edited_time
+    """
+    pages = aiter_database_pages(
+        notion,
+        DB_PATIENTS,
+        filter={
+            "property": "Status",
+            "select": {"equals": "Active"}
+        },
+        properties=["Name", "Patient ID", "Email", "Phone"]
+    )
+
+    patients = []
+    records = []
+    async with notion_semaphore:
+        async for page in pages:
+            patient = decode_patient(page)
+            records.append(patient)
+            patients.append({
+                "id": patient.id,
+                "name": patient.name,
+                "patient_id": patient.patient_id,
+                "email": patient.email,
+                "phone": patient.phone
+            })
+    return {"patients": patients, "etag": weak_etag(records)}
+
+
+async def get_active_patients() -> Dict[str, Any]:
+    """Active patients and their ETag, served from the TTL cache when fresh"""
+    return await patient_list_cache.get("active", load_active_patients)
+
+
+async def get_patient_page(patient_id: str) -> Dict[str, Any]:
+    """Retrieve a patient page, served from the TTL cache when fresh"""
+    async def load():
+        async with notion_semaphore:
+            return await notion.pages.retrieve(page_id=patient_id)
+    return await patient_page_cache.get(normalize_id(patient_id), load)
+
 
+async def fetch_trainer_patients(trainer_id: str) -> List[Dict[str, Any]]:
+    """
+    Active patients assigned to a trainer
+
+    Args:
+        trainer_id: Notion page ID of the trainer, or its Trainer ID (e.g. "T003" or "3")
+
+    Returns:
+        List of {"id", "name"} for each active patient whose Assigned Trainer is the trainer
+    """
+    number = trainer_id.strip().upper().lstrip("T")
+    if number.isdigit():
+        trainers = aiter_database_pages(
+            notion,
+            DB_TRAINERS,
+            filter={
+                "property": "Trainer ID",
+                "unique_id": {"equals": int(number)}
+            },
+            limit=1,
+            properties=["Name"]
+        )
+        async with notion_semaphore:
+            matches = [page async for page in trainers]
+        if not matches:
+            raise HTTPException(status_code=404, detail=f"Trainer {trainer_id} not found")
+        trainer_id = matches[0]["id"]
+
+    pages = aiter_database_pages(
+        notion,
+        DB_PATIENTS,
+        filter={
+            "and": [
+                {
+                    "property": "Assigned Trainer",
+                    "relation": {"contains": trainer_id}
+                },
+                {
+                    "property": "Status",
+                    "select": {"equals": "Active"}
+                }
+            ]
+        },
+        properties=["Name"]
+    )
+
+    patients = []
+    async with notion_semaphore:
+        async for page in pages:
+            patients.append({"id": page["id"], "name": decode_patient(page).name})
+
+    return patients
+
+
+def fallback_weekly_summary(patient_name: str, workouts: List[Workout]) -> Dict[str, str]:
+    """Metrics-only summary used when Groq fails or returns unparseable output"""
+    total_sessions = len(workouts)
+    total_minutes = sum([w['duration'] for w in workouts if w['duration']])
+    return FallbackSummary({
+        "summary": f"{patient_name} completed {total_sessions} sessions this week ({total_minutes} minutes total).",
+        "improvements": "See individual workout logs for details.",
+        "concerns": "Unable to generate AI summary",
+        "recommendations": "Continue with current program"
+    })
+
+
+def build_weekly_summary_request(patient_name: str, workouts: List[Workout]) -> Dict[str, Any]:
+    """
+    Build the Groq chat completion arguments for a weekly summary
+
+    Args:
+        patient_name: Name of the patient
+        workouts: List of workout log records
+
+    Returns:
+        Keyword arguments for chat.completions.create
+    """
     # Prepare workout data for Groq
     workout_details = []
-    for i, workout in enumerate(workouts, 1):
+    for i, workout in enumerate(dedupe_notes(workouts), 1):
         detail = f"""
 Session {i} - {workout['date']}:
 - Duration: {workout['duration']} minutes
@@ -199,59 +364,115 @@ WEEKLY METRICS:
 - Average Session Duration: {avg_duration:.1f} minutes
 
 WORKOUT SESSIONS:
-{''.join(workout_details)}
+{fit_blocks(workout_details, section_budget("sessions"), "sessions")}
 
 Please provide the summary in JSON format as specified."""
 
-    # Call Groq API
+    return {
+        "model": route(workouts).model,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message}
+        ],
+        "temperature": 0.7,
+        "max_tokens": 1500,
+        "response_format": {"type": "json_object"}  # Force JSON output
+    }
+
+
+def parse_weekly_summary(response_text: str) -> Dict[str, str]:
+    """Parse the model's JSON reply, tolerating a ```json fenced block"""
+    if "```json" in response_text:
+        start = response_text.find("```json") + 7
+        end = response_text.find("```", start)
+        return json.loads(response_text[start:end].strip())
+
+    # Try to parse as direct JSON, then as the outermost {...} in the text
     try:
-        response = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",  # or "mixtral-8x7b-32768" or "llama3-70b-8192"
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message}
-            ],
-            temperature=0.7,
-            max_tokens=1500,
-            response_format={"type": "json_object"}  # Force JSON output
-        )
+        return json.loads(response_text)
+    except ValueError:
+        start, end = response_text.find("{"), response_text.rfind("}")
+        if start == -1 or end < start:
+            raise
+        return json.loads(response_text[start:end + 1])
 
-        response_text = response.choices[0].message.content
 
-        # Try to extract JSON from response
-        if "```json" in response_text:
-            start = response_text.find("```json") + 7
-            end = response_text.find("```", start)
-            json_str = response_text[start:end].strip()
-            summary_data = json.loads(json_str)
-        else:
-            # Try to parse as direct JSON
-            summary_data = json.loads(response_text)
+async def generate_weekly_summary_with_groq(patient_name: str, workouts: List[Workout]) -> Dict[str, str]:
+    """
+    Generate a comprehensive weekly summary using Groq AI (Llama models)
 
-        return summary_data
+    Args:
+        patient_name: Name of the patient
+        workouts: List of workout log records
 
-    except Exception as e:
-        print(f"Error generating summary with Groq: {e}")
-        # Fallback summary
+    Returns:
+        Dictionary with summary, improvements, concerns, and recommendations
+    """
+    if not workouts:
         return {
-            "summary": f"{patient_name} completed {total_sessions} sessions this week ({total_minutes} minutes total).",
-            "improvements": "See individual workout logs for details.",
-            "concerns": "Unable to generate AI summary",
-            "recommendations": "Continue with current program"
+            "summary": f"No workout sessions recorded for {patient_name} this week.",
+            "improvements": "N/A",
+            "concerns": "No activity this week",
+            "recommendations": "Schedule sessions for next week"
         }
 
+    # Too little written to be worth a Groq call: build it from the structured fields
+    if is_sparse(workouts):
+        return rule_based_weekly_summary(patient_name, workouts)
+
+    # Call Groq API
+    try:
+        response = await arouted_completion(
+            groq_client,
+            workouts,
+            **build_weekly_summary_request(patient_name, workouts),
+            use_cache=CACHE_WEEKLY_SUMMARIES
+        )
+        return parse_weekly_summary(response.choices[0].message.content)
+
+    except Exception as e:
+        print(f"Error generating summary with Groq: {e}")
+        record_fallback()
+        return fallback_weekly_summary(patient_name, workouts)
+
+
+async def stream_weekly_summary_with_groq(patient_name: str, workouts: List[Workout]) -> AsyncIterator[str]:
+    """
+    Stream a weekly summary from Groq, yielding content deltas as they arrive
+
+    Groq's JSON mode can't be combined with streaming, so the request drops
+    response_format and the caller parses the joined text with parse_weekly_summary.
+    """
+    request = build_weekly_summary_request(patient_name, workouts)
+    request.pop("response_format")
+    stream = await groq_client.chat.completions.create(**request, stream=True)
+    async for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            yield delta
+
+
+def weekly_report_id(patient_name: str, week_start: datetime) -> str:
+    """Week ID for a patient's weekly log, e.g. WEEKLY-JohnDoe-W07-2026"""
+    week_number = week_start.isocalendar()[1]
+    return f"WEEKLY-{patient_name.replace(' ', '')}-W{week_number:02d}-{week_start.year}"
+
 
-def save_weekly_report_to_notion(
+async def save_weekly_report_to_notion(
     patient_id: str,
     patient_name: str,
     week_start: datetime,
     week_end: datetime,
-    workouts: List[Dict[str, Any]],
-    summary_data: Dict[str, str]
+    workouts: List[Workout],
+    summary_data: Dict[str, str],
+    source_fingerprint: str = ""
 ) -> str:
     """
     Save the weekly report to Notion Weekly Logs database
 
+    If a log with the same Week ID already exists it is overwritten, so
+    regenerating a changed week doesn't leave duplicates behind.
+
     Args:
         patient_id: Notion page ID of the patient
         patient_name: Name of the patient
@@ -259,9 +480,11 @@ def save_weekly_report_to_notion(
         week_end: End date of the week
         workouts: List of workout dictionaries
         summary_data: AI-generated summary data
+        source_fingerprint: Fingerprint of the workouts the report was built from
+            (not stored for a fallback summary, so the week is retried)
 
     Returns:
-        Notion page ID of the created weekly log
+        Notion page ID of the created or updated weekly log
     """
     # Calculate metrics
     total_sessions = len(workouts)
@@ -277,9 +500,9 @@ def save_weekly_report_to_notion(
     attendance_rate = min((total_sessions / target_sessions) * 100, 100)
 
     # Generate week ID
-    week_number = week_start.isocalendar()[1]
-    year = week_start.year
-    week_id = f"WEEKLY-{patient_name.replace(' ', '')}-W{week_number:02d}-{year}"
+    week_id = weekly_report_id(patient_name, week_start)
+    source_fingerprint = saved_fingerprint(summary_data, source_fingerprint)
+    await weekly_tracker.aensure_property()
 
     # Create properties for Notion
     properties = {
@@ -321,16 +544,129 @@ def save_weekly_report_to_notion(
         },
         "Recommendations": {
             "rich_text": [{"text": {"content": summary_data.get("recommendations", "")}}]
+        },
+        **weekly_tracker.fingerprint_properties(source_fingerprint)
+    }
+
+    await weekly_tracker.aensure_loaded()
+
+    # Concurrent saves of the same week (e.g. a batch stream and a single report)
+    # wait here, so the later one updates the page the first one created
+    lock = week_locks.get(week_id)
+    if lock is None:
+        lock = week_locks[week_id] = asyncio.Lock()
+    async with lock:
+        existing_id = weekly_tracker.existing(week_id)
+
+        # Create the page in Notion (or overwrite this week's existing log)
+        async with notion_semaphore:
+            if existing_id:
+                page = await notion.pages.update(page_id=existing_id, properties=properties)
+            else:
+                page = await notion.pages.create(
+                    parent={"database_id": DB_WEEKLY},
+                    properties=properties
+                )
+
+        weekly_tracker.record(week_id, page["id"], source_fingerprint)
+    return page["id"]
+
+
+async def prepare_weekly_report(patient_id: str, days: int = 7, skip_unchanged: bool = False) -> Dict[str, Any]:
+    """
+    Fetch a patient's week and generate its AI summary, without saving
+
+    Args:
+        patient_id: Notion page ID of the patient
+        days: Number of days to include in the report
+        skip_unchanged: Don't regenerate if this week's log was built from the same workouts
+
+    Returns:
+        Result dict; status "ready" means it still has to go through finish_weekly_report
+    """
+    # Get patient details
+    patient_page = await get_patient_page(patient_id)
+    patient_name = decode_patient(patient_page).name
+
+    if not patient_name:
+        raise HTTPException(status_code=404, detail="Patient not found")
+
+    # Fetch workout logs
+    workouts = await fetch_patient_workout_logs(patient_id, days)
+
+    if not workouts:
+        return {
+            "status": "no_workouts",
+            "message": f"No workout sessions found for {patient_name} in the past {days} days",
+            "patient_name": patient_name
         }
+
+    # Calculate week range
+    week_end = datetime.now()
+    week_start = week_end - timedelta(days=days)
+
+    # Skip the Groq call and the write if nothing changed since the last report
+    source_fingerprint = fingerprint(workouts)
+    if skip_unchanged:
+        week_id = weekly_report_id(patient_name, week_start)
+        await weekly_tracker.aensure_loaded()
+        if weekly_tracker.unchanged(week_id, source_fingerprint):
+            return {
+                "status": "unchanged",
+                "message": f"{week_id} is up to date",
+                "patient_name": patient_name,
+                "workout_count": len(workouts),
+                "weekly_log_id": weekly_tracker.existing(week_id)
+            }
+
+    # Generate AI summary
+    summary_data = await generate_weekly_summary_with_groq(patient_name, workouts)
+
+    return {
+        "status": "ready",
+        "patient_id": patient_id,
+        "patient_name": patient_name,
+        "week_start": week_start,
+        "week_end": week_end,
+        "workouts": workouts,
+        "source_fingerprint": source_fingerprint,
+        "summary": summary_data
     }
 
-    # Create the page in Notion
-    page = notion.pages.create(
-        parent={"database_id": DB_WEEKLY},
-        properties=properties
+
+async def finish_weekly_report(prepared: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Save a prepared weekly report to Notion
+
+    Args:
+        prepared: Result of prepare_weekly_report
+
+    Returns:
+        API result dict (prepared results that need no save are returned as-is)
+    """
+    if prepared["status"] != "ready":
+        return prepared
+
+    weekly_log_id = await save_weekly_report_to_notion(
+        prepared["patient_id"],
+        prepared["patient_name"],
+        prepared["week_start"],
+        prepared["week_end"],
+        prepared["workouts"],
+        prepared["summary"],
+        prepared["source_fingerprint"]
     )
 
-    return page["id"]
+    return {
+        "status": "success",
+        "message": f"Weekly report generated for {prepared['patient_name']}",
+        "patient_name": prepared["patient_name"],
+        "workout_count": len(prepared["workouts"]),
+        "week_start": prepared["week_start"].strftime("%Y-%m-%d"),
+        "week_end": prepared["week_end"].strftime("%Y-%m-%d"),
+        "weekly_log_id": weekly_log_id,
+        "summary": prepared["summary"]
+    }
 
 
 # ============================================================================
@@ -347,163 +683,493 @@ async def root():
     }
 
 
-@app.get("/api/patients")
-async def get_all_patients():
-    """Get all active patients"""
-    try:
-        response = notion.databases.query(
-            database_id=DB_PATIENTS,
-            filter={
-                "property": "Status",
-                "select": {"equals": "Active"}
-            }
-        )
+# Patient data is personal: browsers may keep it, shared caches may not.
+# no-cache makes clients revalidate every time, which the ETag makes cheap.
+READ_CACHE_CONTROL = "private, no-cache"
+
+
+def opaque_tag(tag: str) -> str:
+    """ETag without its weak prefix, for If-None-Match's weak comparison (W/"x" matches "x")"""
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
 
-        patients = []
-        for page in response.get("results", []):
-            props = page.get("properties", {})
-            patients.append({
-                "id": page.get("id"),
-                "name": get_title_from_title_array(props.get("Name", {}).get("title", [])),
-                "patient_id": props.get("Patient ID", {}).get("unique_id", {}).get("number"),
-                "email": props.get("Email", {}).get("email"),
-                "phone": props.get("Phone", {}).get("phone_number")
-            })
 
-        return {"patients": patients, "count": len(patients)}
+def conditional_json(request: Request, body: Dict[str, Any], etag: str) -> Response:
+    """JSON response, or an empty 304 if the client's If-None-Match already has this ETag"""
+    headers = {"ETag": etag, "Cache-Control": READ_CACHE_CONTROL}
+    client_tags = {opaque_tag(tag) for tag in request.headers.get("if-none-match", "").split(",")}
+    if "*" in client_tags or opaque_tag(etag) in client_tags:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(body, headers=headers)
+
+
+@app.get("/api/patients")
+async def get_all_patients(request: Request):
+    """
+    Get all active patients (cached for PATIENT_CACHE_TTL seconds)
 
+    Sends a weak ETag built from the patients' last_edited_time; a request
+    with a matching If-None-Match gets 304 Not Modified with no body.
+    """
+    try:
+        active = await get_active_patients()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching patients: {str(e)}")
 
+    patients = active["patients"]
+    return conditional_json(request, {"patients": patients, "count": len(patients)}, active["etag"])
+
 
 @app.get("/api/patients/{patient_id}/workouts")
-async def get_patient_workouts(patient_id: str, days: int = 7):
-    """Get workout logs for a specific patient"""
+async def get_patient_workouts(
+    request: Request,
+    patient_id: str,
+    days: int = 7,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None
+):
+    """
+    Get a patient's workout logs, oldest first, one page at a time
+
+    Args:
+        patient_id: Notion page ID of the patient
+        days: Look back this many days when since isn't given (default: 7)
+        since: Earliest workout date, inclusive (ISO 8601)
+        until: Latest workout date, inclusive (ISO 8601)
+        fields: Comma-separated Workout fields to return, e.g. date,duration,rating
+                (id is always included; default: all)
+        limit: Workouts per page (1-100, default: 100)
+        cursor: next_cursor from the previous page
+
+    Returns:
+        Workouts for this page plus next_cursor (None on the last page), with a
+        weak ETag over the page's workouts; 304 if If-None-Match matches
+    """
+    selected = parse_workout_fields(fields)
+    since = parse_date_param("since", since)
+    until = parse_date_param("until", until)
+
+    notion_cursor = None
+    if cursor:
+        # A cursor belongs to one query: its patient and date bounds win over days
+        state = decode_cursor(cursor)
+        if (state.get("p") != normalize_id(patient_id)
+                or (since and since != state.get("s")) or (until and until != state.get("u"))):
+            raise HTTPException(status_code=400, detail="Cursor does not match this query")
+        notion_cursor, since, until = state["n"], state.get("s"), state.get("u")
+    elif since is None:
+        since = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+
+    conditions = [
+        {"property": "Patient", "relation": {"contains": patient_id}},
+        {"property": "Date", "date": {"on_or_after": since}}
+    ]
+    if until:
+        conditions.append({"property": "Date", "date": {"on_or_before": until}})
+
     try:
-        workouts = fetch_patient_workout_logs(patient_id, days)
-        return {
-            "patient_id": patient_id,
-            "days": days,
-            "workouts": workouts,
-            "count": len(workouts)
-        }
+        async with notion_semaphore:
+            pages, next_notion_cursor = await aquery_page(
+                notion,
+                DB_WORKOUTS,
+                filter={"and": conditions},
+                sorts=[{"property": "Date", "direction": "ascending"}],
+                page_size=max(1, min(limit, 100)),
+                start_cursor=notion_cursor,
+                properties=[WORKOUT_FIELDS[name][0] for name in selected if WORKOUT_FIELDS[name][1] != "page"]
+            )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching workouts: {str(e)}")
 
+    workouts = [decode_workout(page) for page in pages]
+    next_cursor = None
+    if next_notion_cursor:
+        next_cursor = encode_cursor({"n": next_notion_cursor, "p": normalize_id(patient_id), "s": since, "u": until})
+
+    etag = weak_etag(workouts, since, until, selected, next_cursor)
+    return conditional_json(request, {
+        "patient_id": patient_id,
+        "since": since,
+        "until": until,
+        "fields": selected,
+        "workouts": [{name: workout[name] for name in selected} for workout in workouts],
+        "count": len(workouts),
+        "has_more": next_cursor is not None,
+        "next_cursor": next_cursor
+    }, etag)
+
+
+@app.get("/api/llm-telemetry")
+async def get_llm_telemetry():
+    """
+    Groq call histograms for this server process
+
+    Wall time, queue time (waiting for a Groq slot), prompt and completion
+    tokens per model, plus outcome counts (ok / json_error / api_error / fallback).
+    """
+    return get_llm_stats()
+
 
 @app.post("/api/weekly-report/{patient_id}")
-async def generate_weekly_report(patient_id: str, days: int = 7):
+async def generate_weekly_report(patient_id: str, days: int = 7, skip_unchanged: bool = False):
     """
     Generate and save weekly report for a specific patient
 
     Args:
         patient_id: Notion page ID of the patient
         days: Number of days to include in the report (default: 7)
+        skip_unchanged: Don't regenerate if this week's log was built from the same workouts
     """
     try:
-        # Get patient details
-        patient_page = notion.pages.retrieve(page_id=patient_id)
-        patient_props = patient_page.get("properties", {})
-        patient_name = get_title_from_title_array(patient_props.get("Name", {}).get("title", []))
+        prepared = await prepare_weekly_report(patient_id, days, skip_unchanged)
+        return await finish_weekly_report(prepared)
 
-        if not patient_name:
-            raise HTTPException(status_code=404, detail="Patient not found")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating weekly report: {str(e)}")
 
-        # Fetch workout logs
-        workouts = fetch_patient_workout_logs(patient_id, days)
 
-        if not workouts:
-            return {
-                "status": "no_workouts",
-                "message": f"No workout sessions found for {patient_name} in the past {days} days",
-                "patient_name": patient_name
-            }
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
 
-        # Generate AI summary
-        summary_data = generate_weekly_summary_with_groq(patient_name, workouts)
 
-        # Calculate week range
-        week_end = datetime.now()
-        week_start = week_end - timedelta(days=days)
+@app.post("/api/weekly-report/{patient_id}/stream")
+async def stream_weekly_report(patient_id: str, days: int = 7, skip_unchanged: bool = False):
+    """
+    Generate and save a weekly report, streaming progress as server-sent events
 
-        # Save to Notion
-        weekly_log_id = save_weekly_report_to_notion(
-            patient_id,
-            patient_name,
-            week_start,
-            week_end,
-            workouts,
-            summary_data
-        )
+    Events, in order: started, patient, workouts, token (one per Groq content
+    delta; none for sparse weeks summarized without Groq), summary, then done with the same body generate_weekly_report
+    returns (including weekly_log_id). A failure ends the stream with an
+    error event.
 
-        return {
-            "status": "success",
-            "message": f"Weekly report generated for {patient_name}",
-            "patient_name": patient_name,
-            "workout_count": len(workouts),
-            "week_start": week_start.strftime("%Y-%m-%d"),
-            "week_end": week_end.strftime("%Y-%m-%d"),
-            "weekly_log_id": weekly_log_id,
-            "summary": summary_data
-        }
+    Args:
+        patient_id: Notion page ID of the patient
+        days: Number of days to include in the report (default: 7)
+        skip_unchanged: Don't regenerate if this week's log was built from the same workouts
+    """
+    async def events():
+        yield sse_event("started", {"patient_id": patient_id, "days": days})
+        try:
+            patient_page = await get_patient_page(patient_id)
+            patient_name = decode_patient(patient_page).name
+            if not patient_name:
+                yield sse_event("error", {"status_code": 404, "detail": "Patient not found"})
+                return
+            yield sse_event("patient", {"patient_id": patient_id, "patient_name": patient_name})
+
+            workouts = await fetch_patient_workout_logs(patient_id, days)
+            week_end = datetime.now()
+            week_start = week_end - timedelta(days=days)
+            yield sse_event("workouts", {
+                "workout_count": len(workouts),
+                "week_start": week_start.strftime("%Y-%m-%d"),
+                "week_end": week_end.strftime("%Y-%m-%d")
+            })
 
-    except HTTPException:
-        raise
+            if not workouts:
+                yield sse_event("done", {
+                    "status": "no_workouts",
+                    "message": f"No workout sessions found for {patient_name} in the past {days} days",
+                    "patient_name": patient_name
+                })
+                return
+
+            source_fingerprint = fingerprint(workouts)
+            if skip_unchanged:
+                week_id = weekly_report_id(patient_name, week_start)
+                await weekly_tracker.aensure_loaded()
+                if weekly_tracker.unchanged(week_id, source_fingerprint):
+                    yield sse_event("done", {
+                        "status": "unchanged",
+                        "message": f"{week_id} is up to date",
+                        "patient_name": patient_name,
+                        "workout_count": len(workouts),
+                        "weekly_log_id": weekly_tracker.existing(week_id)
+                    })
+                    return
+
+            # Stream the summary; fall back to the metrics-only summary if it fails
+            if is_sparse(workouts):
+                summary_data = rule_based_weekly_summary(patient_name, workouts)
+            else:
+                response_text = ""
+                try:
+                    async for delta in stream_weekly_summary_with_groq(patient_name, workouts):
+                        response_text += delta
+                        yield sse_event("token", {"text": delta})
+                    summary_data = parse_weekly_summary(response_text)
+                except Exception as e:
+                    print(f"Error streaming summary with Groq: {e}")
+                    record_fallback()
+                    summary_data = fallback_weekly_summary(patient_name, workouts)
+            yield sse_event("summary", summary_data)
+
+            report = await finish_weekly_report({
+                "status": "ready",
+                "patient_id": patient_id,
+                "patient_name": patient_name,
+                "week_start": week_start,
+                "week_end": week_end,
+                "workouts": workouts,
+                "source_fingerprint": source_fingerprint,
+                "summary": summary_data
+            })
+            yield sse_event("done", report)
+
+        except Exception as e:
+            yield sse_event("error", {"status_code": 500, "detail": f"Error generating weekly report: {str(e)}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/api/cache")
+async def get_cache_stats():
+    """Hit/miss counts for the patient list and patient page caches"""
+    return {
+        "patient_list": patient_list_cache.stats(),
+        "patient_pages": patient_page_cache.stats()
+    }
+
+
+@app.delete("/api/cache/patients")
+async def invalidate_patient_cache():
+    """Drop the cached active-patient list and all cached patient pages"""
+    return {
+        "status": "invalidated",
+        "patient_list": patient_list_cache.invalidate(),
+        "patient_pages": patient_page_cache.invalidate()
+    }
+
+
+@app.delete("/api/cache/patients/{patient_id}")
+async def invalidate_patient(patient_id: str):
+    """Drop one cached patient page (and the list, which may include its name or status)"""
+    return {
+        "status": "invalidated",
+        "patient_list": patient_list_cache.invalidate(),
+        "patient_pages": patient_page_cache.invalidate(normalize_id(patient_id))
+    }
+
+
+@app.post("/api/weekly-reports/all", status_code=202)
+async def generate_all_weekly_reports(days: int = 7, force: bool = False):
+    """
+    Queue weekly report generation for all active patients
+
+    Returns a job ID straight away; the job runs on the background worker pool
+    and GET /api/jobs/{job_id} reports per-patient progress and results.
+    Patients whose workouts haven't changed since this week's report are skipped
+    unless force is set. If the same run is already queued or running, its job
+    is returned instead of starting another.
+    """
+    try:
+        submitted = await job_queue.submit(WEEKLY_REPORTS_JOB, {"days": days, "force": force})
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating weekly report: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error queueing reports: {str(e)}")
 
+    return {
+        "status": "queued",
+        "job_id": submitted["job_id"],
+        "existing": submitted["existing"],
+        "status_url": f"/api/jobs/{submitted['job_id']}"
+    }
 
-@app.post("/api/weekly-reports/all")
-async def generate_all_weekly_reports(days: int = 7):
+
+class WeeklyReportBatch(BaseModel):
+    """Body of POST /api/weekly-reports/batch: either patient page IDs or a trainer"""
+    patient_ids: Optional[List[str]] = None
+    trainer_id: Optional[str] = None
+
+
+@app.post("/api/weekly-reports/batch")
+async def generate_weekly_reports_batch(batch: WeeklyReportBatch, days: int = 7, force: bool = False):
     """
-    Generate weekly reports for all active patients
+    Generate weekly reports for a list of patients, streaming each result as it completes
+
+    Patients run concurrently, at most JOB_WORKERS at a time. Events: started
+    (patient count), one result per patient in completion order (status
+    success / no_workouts / unchanged / error, with weekly_log_id or the
+    error), then done with the counts per status and the batch's Groq
+    telemetry. Patients whose workouts haven't changed since this week's
+    report are skipped unless force is set.
 
-    This endpoint processes all active patients and generates their weekly reports
+    Args:
+        batch: patient_ids (Notion page IDs) or trainer_id (page ID or Trainer ID
+            like T003, for all of that trainer's active patients)
+        days: Number of days to include in each report (default: 7)
+        force: Regenerate reports even if their workouts haven't changed
     """
+    if bool(batch.patient_ids) == bool(batch.trainer_id):
+        raise HTTPException(status_code=400, detail="Give either patient_ids or trainer_id")
+
     try:
-        # Get all active patients
-        patients_response = await get_all_patients()
-        patients = patients_response.get("patients", [])
+        if batch.trainer_id:
+            patients = await fetch_trainer_patients(batch.trainer_id)
+        else:
+            patients = [{"id": patient_id, "name": None} for patient_id in dict.fromkeys(batch.patient_ids)]
 
-        if not patients:
-            return {
-                "status": "no_patients",
-                "message": "No active patients found"
-            }
+        # Fresh view of existing logs and their fingerprints for this batch
+        await weekly_tracker.aensure_property()
+        await weekly_tracker.aload()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error starting batch: {str(e)}")
+
+    workers = asyncio.Semaphore(job_workers())
 
-        results = []
-        for patient in patients:
+    async def run_patient(patient: Dict[str, Any]) -> Dict[str, Any]:
+        async with workers:
             try:
-                report = await generate_weekly_report(patient["id"], days)
-                results.append({
-                    "patient_id": patient["id"],
-                    "patient_name": patient["name"],
-                    "status": report.get("status"),
-                    "workout_count": report.get("workout_count", 0)
-                })
+                prepared = await prepare_weekly_report(patient["id"], days, skip_unchanged=not force)
+                report = await finish_weekly_report(prepared)
             except Exception as e:
-                results.append({
+                return {
                     "patient_id": patient["id"],
                     "patient_name": patient["name"],
                     "status": "error",
-                    "error": str(e)
-                })
-
-        successful = [r for r in results if r["status"] == "success"]
-        failed = [r for r in results if r["status"] == "error"]
-        no_workouts = [r for r in results if r["status"] == "no_workouts"]
+                    "error": getattr(e, "detail", None) or str(e)
+                }
 
         return {
-            "status": "completed",
-            "total_patients": len(patients),
-            "successful": len(successful),
-            "failed": len(failed),
-            "no_workouts": len(no_workouts),
-            "results": results
+            "patient_id": patient["id"],
+            "patient_name": report.get("patient_name"),
+            "status": report.get("status"),
+            "workout_count": report.get("workout_count", 0),
+            "weekly_log_id": report.get("weekly_log_id"),
+            "week_start": report.get("week_start")
         }
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating reports: {str(e)}")
+    async def events():
+        yield sse_event("started", {"total": len(patients), "workers": job_workers(), "days": days})
+        counts: Dict[str, int] = {}
+        # Tasks copy the context when created, so their Groq calls land in this run
+        with track_run() as telemetry:
+            tasks = [asyncio.create_task(run_patient(patient)) for patient in patients]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                counts[result["status"]] = counts.get(result["status"], 0) + 1
+                yield sse_event("result", result)
+        finally:
+            # Client went away: don't keep generating reports nobody will read
+            for task in tasks:
+                task.cancel()
+        yield sse_event("done", {"total": len(patients), "counts": counts, "llm_telemetry": telemetry.as_dict()})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/api/jobs")
+async def list_jobs(limit: int = 20):
+    """Most recent background jobs"""
+    return {"jobs": await job_queue.recent(limit)}
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Progress and results of a background job
+
+    Returns:
+        Job status (queued / running / completed / failed), counts per item
+        status (e.g. success, no_workouts, unchanged, error) and one result per
+        patient, in roster order
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    items = job.pop("items")
+    summary = job.pop("summary") or {}
+    job["results"] = [
+        {
+            "patient_id": item["key"],
+            "patient_name": item["label"],
+            "status": item["status"],
+            **({"error": item["error"]} if item["error"] else {}),
+            **{key: value for key, value in (item["result"] or {}).items() if key not in ("status", "patient_name")}
+        }
+        for item in items
+    ]
+    if job_id in job_telemetry:
+        job["llm_telemetry"] = job_telemetry[job_id].as_dict()
+    elif "llm_telemetry" in summary:
+        job["llm_telemetry"] = summary["llm_telemetry"]
+    job["groq_concurrency"] = get_groq_stats()
+    job["model_routing"] = get_routing_stats()
+    return job
+
+
+async def plan_weekly_reports_job(params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Job plan: one item per active patient"""
+    # Fresh view of existing logs and their fingerprints for this run
+    await weekly_tracker.aensure_property()
+    await weekly_tracker.aload()
+
+    active = await get_active_patients()
+    return [{"key": patient["id"], "label": patient["name"]} for patient in active["patients"]]
+
+
+async def job_run_telemetry(job_id: str) -> Telemetry:
+    """The job's telemetry, picking up what was saved before a restart"""
+    if job_id not in job_telemetry:
+        saved = (await job_queue.summary(job_id) or {}).get("llm_telemetry")
+        job_telemetry.setdefault(job_id, Telemetry.from_dict(saved) if saved else Telemetry())
+    return job_telemetry[job_id]
+
+
+async def run_weekly_report_job_item(params: Dict[str, Any], item: Dict[str, Any]) -> Dict[str, Any]:
+    """Job step: generate and save one patient's weekly report"""
+    telemetry = await job_run_telemetry(item["job_id"])
+    try:
+        with track_run(telemetry):
+            prepared = await prepare_weekly_report(item["key"], params["days"], skip_unchanged=not params["force"])
+            report = await finish_weekly_report(prepared)
+    finally:
+        await job_queue.save_summary(item["job_id"], {"llm_telemetry": telemetry.as_dict()})
+
+    return {
+        "status": report.get("status"),
+        "workout_count": report.get("workout_count", 0),
+        "weekly_log_id": report.get("weekly_log_id"),
+        "week_start": report.get("week_start")
+    }
+
+
+async def summarize_weekly_reports_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Job summary, once every item is done: the final telemetry (then dropped from memory)"""
+    telemetry = job_telemetry.pop(job_id, None)
+    return {"llm_telemetry": telemetry.as_dict()} if telemetry else None
+
+
+job_queue.register(WEEKLY_REPORTS_JOB, plan_weekly_reports_job, run_weekly_report_job_item,
+                   summarize_weekly_reports_job)
+
+
+@app.on_event("startup")
+async def start_job_queue():
+    """Start the job workers and resume jobs interrupted by a restart"""
+    await job_queue.start()
+
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    await job_queue.stop()
 
 
 # ============================================================================
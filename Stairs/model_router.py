@@ -0,0 +1,184 @@
+"""
+Model routing for weekly summaries
+
+Most weeks are a couple of sessions with short notes, which a small model
+summarizes as well as 70B in a fraction of the time. route() looks at the
+inputs of a weekly summary (session count, written notes, whether an
+assessment was done) and picks a tier:
+
+- small: few sessions, short notes, no assessment
+- large: anything else
+
+routed_completion()/arouted_completion() make the call with the routed
+model. If the small model's reply isn't valid JSON, or Groq rejects it in
+JSON mode (400 json_validate_failed), they retry once on the large model
+(escalation), so hard cases never lose quality. Calls and latencies are
+counted for completions that reached Groq, not for response cache hits.
+
+Configuration (environment):
+    GROQ_SMALL_MODEL             small tier (default: llama-3.1-8b-instant)
+    GROQ_LARGE_MODEL             large tier (default: llama-3.3-70b-versatile)
+    ROUTE_SMALL_MAX_SESSIONS     most sessions routed to the small tier (default: 2)
+    ROUTE_SMALL_MAX_NOTE_CHARS   most note characters routed to the small tier (default: 600)
+    ROUTE_ESCALATE               0 keeps invalid small-model replies (default: 1)
+"""
+
+import json
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, NamedTuple
+
+from groq import BadRequestError
+
+from groq_cache import last_cache_hit
+from rule_summary import note_chars
+
+SMALL = "small"
+LARGE = "large"
+
+
+class Route(NamedTuple):
+    tier: str
+    model: str
+    reason: str
+
+
+def thresholds() -> Dict[str, Any]:
+    """Current routing configuration, read from the environment"""
+    return {
+        "small_model": os.getenv("GROQ_SMALL_MODEL", "llama-3.1-8b-instant"),
+        "large_model": os.getenv("GROQ_LARGE_MODEL", "llama-3.3-70b-versatile"),
+        "small_max_sessions": int(os.getenv("ROUTE_SMALL_MAX_SESSIONS", "2")),
+        "small_max_note_chars": int(os.getenv("ROUTE_SMALL_MAX_NOTE_CHARS", "600")),
+        "escalate": os.getenv("ROUTE_ESCALATE", "1") != "0",
+    }
+
+
+def route(workouts: List, assessments: Iterable = ()) -> Route:
+    """Pick the model tier for a weekly summary from its inputs"""
+    config = thresholds()
+    assessments = list(assessments)
+    chars = note_chars(workouts, assessments)
+
+    if assessments:
+        return Route(LARGE, config["large_model"], "assessment")
+    if len(workouts) > config["small_max_sessions"]:
+        return Route(LARGE, config["large_model"], f"{len(workouts)} sessions")
+    if chars > config["small_max_note_chars"]:
+        return Route(LARGE, config["large_model"], f"{chars} note chars")
+    return Route(SMALL, config["small_model"], f"{len(workouts)} sessions, {chars} note chars")
+
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+_lock = threading.Lock()
+_calls = {SMALL: 0, LARGE: 0}
+_escalated = 0
+_latencies = {SMALL: deque(maxlen=1000), LARGE: deque(maxlen=1000)}
+
+
+def _record(tier: str, seconds: float):
+    # A completion served from the response cache isn't a call to the model
+    if last_cache_hit.get():
+        return
+    with _lock:
+        _calls[tier] += 1
+        _latencies[tier].append(seconds)
+
+
+def _record_escalation():
+    global _escalated
+    with _lock:
+        _escalated += 1
+
+
+def get_stats() -> Dict[str, Any]:
+    """Return calls, escalations and median latency per tier, plus the thresholds in use"""
+    with _lock:
+        tiers = {
+            tier: {
+                "calls": _calls[tier],
+                "median_seconds": round(statistics.median(_latencies[tier]), 3) if _latencies[tier] else None
+            }
+            for tier in (SMALL, LARGE)
+        }
+        return {**tiers, "escalated": _escalated, "thresholds": thresholds()}
+
+
+# ============================================================================
+# ROUTED CALLS
+# ============================================================================
+
+def _valid_json(completion) -> bool:
+    try:
+        return isinstance(json.loads(completion.choices[0].message.content or ""), dict)
+    except (ValueError, IndexError, AttributeError):
+        return False
+
+
+def _json_rejected(error: BadRequestError) -> bool:
+    """Groq's 400 for JSON-mode output that failed validation"""
+    body = error.body.get("error", error.body) if isinstance(error.body, dict) else None
+    if isinstance(body, dict):
+        return body.get("code") == "json_validate_failed"
+    return "json_validate_failed" in str(error)
+
+
+def routed_completion(client, workouts: List, assessments: Iterable = (), **kwargs):
+    """
+    Call chat.completions.create with the routed model
+
+    Args:
+        client: Groq client (possibly wrapped)
+        workouts: Workout records the prompt was built from
+        assessments: Assessment records the prompt was built from
+        kwargs: Remaining create() arguments; any model given is replaced
+
+    Returns:
+        The completion, from the large model if the small one was escalated
+    """
+    chosen = route(workouts, assessments)
+    escalate = chosen.tier == SMALL and thresholds()["escalate"]
+    started = time.monotonic()
+    try:
+        completion = client.chat.completions.create(**{**kwargs, "model": chosen.model})
+    except BadRequestError as e:
+        if not (escalate and _json_rejected(e)):
+            raise
+        completion = None
+    finally:
+        _record(chosen.tier, time.monotonic() - started)
+
+    if escalate and (completion is None or not _valid_json(completion)):
+        _record_escalation()
+        started = time.monotonic()
+        completion = client.chat.completions.create(**{**kwargs, "model": thresholds()["large_model"]})
+        _record(LARGE, time.monotonic() - started)
+    return completion
+
+
+async def arouted_completion(client, workouts: List, assessments: Iterable = (), **kwargs):
+    """Async counterpart of routed_completion"""
+    chosen = route(workouts, assessments)
+    escalate = chosen.tier == SMALL and thresholds()["escalate"]
+    started = time.monotonic()
+    try:
+        completion = await client.chat.completions.create(**{**kwargs, "model": chosen.model})
+    except BadRequestError as e:
+        if not (escalate and _json_rejected(e)):
+            raise
+        completion = None
+    finally:
+        _record(chosen.tier, time.monotonic() - started)
+
+    if escalate and (completion is None or not _valid_json(completion)):
+        _record_escalation()
+        started = time.monotonic()
+        completion = await client.chat.completions.create(**{**kwargs, "model": thresholds()["large_model"]})
+        _record(LARGE, time.monotonic() - started)
+    return completion
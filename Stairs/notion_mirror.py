@@ -0,0 +1,572 @@
+"""
+Local SQLite mirror of the six Notion databases
+
+Keeps a replica of PATIENTS, TRAINERS, ASSESSMENT LOGS, WORKOUT LOGS,
+WEEKLY LOGS and MONTHLY LOGS in a SQLite file. Each sync only pulls pages
+whose last_edited_time is newer than the last checkpoint for that database.
+
+MirrorClient answers databases.query and pages.retrieve from the replica
+(evaluating the Notion filters and sorts this project uses) and passes
+writes through to live Notion, so existing fetch code runs unchanged.
+
+Usage:
+    python notion_mirror.py          # incremental sync of all six databases
+    python notion_mirror.py --full   # full rebuild (also drops deleted pages)
+
+Set NOTION_USE_MIRROR=1 to make main.py and the generate_* scripts read
+from the replica.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from urllib.parse import unquote
+
+from notion_query import iter_database_pages
+
+DEFAULT_MIRROR_PATH = os.path.join(".notion_cache", "mirror.sqlite3")
+
+# Filtered, sorted results of queries still being paged through
+MAX_QUERY_SNAPSHOTS = 32
+
+# Environment variables holding the six database IDs, keyed by display name
+DATABASE_ENV_VARS = {
+    "PATIENTS": "NOTION_DATABASE_ID_PATIENTS",
+    "TRAINERS": "NOTION_DATABASE_ID_TRAINERS",
+    "ASSESSMENT LOGS": "NOTION_DATABASE_ID_ASSESSMENTS",
+    "WORKOUT LOGS": "NOTION_DATABASE_ID_WORKOUTS",
+    "WEEKLY LOGS": "NOTION_DATABASE_ID_WEEKLY",
+    "MONTHLY LOGS": "NOTION_DATABASE_ID_MONTHLY",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    page_id TEXT PRIMARY KEY,
+    database_id TEXT NOT NULL,
+    last_edited_time TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_by_database ON pages (database_id);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    database_id TEXT PRIMARY KEY,
+    last_edited_time TEXT,
+    synced_at TEXT NOT NULL
+);
+"""
+
+
+def normalize_id(notion_id: Optional[str]) -> str:
+    """Notion accepts IDs with or without dashes; compare them without"""
+    return (notion_id or "").replace("-", "").lower()
+
+
+def get_mirror_path() -> str:
+    """Mirror file location (NOTION_MIRROR_PATH, read at call time after load_dotenv)"""
+    return os.getenv("NOTION_MIRROR_PATH", DEFAULT_MIRROR_PATH)
+
+
+def connect(path: Optional[str] = None) -> sqlite3.Connection:
+    """Open the mirror database, creating the file and schema if needed"""
+    path = path or get_mirror_path()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def get_database_ids() -> Dict[str, str]:
+    """Return display name -> database ID for every configured database"""
+    return {
+        name: os.getenv(env_var)
+        for name, env_var in DATABASE_ENV_VARS.items()
+        if os.getenv(env_var)
+    }
+
+
+# ============================================================================
+# SYNC
+# ============================================================================
+
+def store_page(conn: sqlite3.Connection, page: Dict[str, Any], database_id: Optional[str] = None):
+    """Insert or replace one page in the mirror"""
+    if database_id is None:
+        database_id = page.get("parent", {}).get("database_id", "")
+    conn.execute(
+        "INSERT OR REPLACE INTO pages (page_id, database_id, last_edited_time, data) VALUES (?, ?, ?, ?)",
+        (
+            normalize_id(page["id"]),
+            normalize_id(database_id),
+            page.get("last_edited_time", ""),
+            json.dumps(page)
+        )
+    )
+
+
+def sync_database(notion, database_id: str, conn: sqlite3.Connection, full: bool = False) -> int:
+    """
+    Pull pages edited since the last checkpoint into the mirror
+
+    Args:
+        notion: Live Notion client
+        database_id: ID of the database to sync
+        conn: Open mirror connection
+        full: Re-read every page and drop pages no longer returned by Notion
+
+    Returns:
+        Number of pages written
+    """
+    key = normalize_id(database_id)
+    row = conn.execute(
+        "SELECT last_edited_time FROM checkpoints WHERE database_id = ?", (key,)
+    ).fetchone()
+    checkpoint = None if full or not row else row[0]
+
+    query_filter = None
+    if checkpoint:
+        # on_or_after rather than after: Notion timestamps are minute-granular,
+        # so pages edited in the checkpoint minute could otherwise be missed
+        query_filter = {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": checkpoint}}
+
+    seen = set()
+    newest = checkpoint
+    written = 0
+    for page in iter_database_pages(
+        notion,
+        database_id,
+        filter=query_filter,
+        sorts=[{"timestamp": "last_edited_time", "direction": "ascending"}]
+    ):
+        store_page(conn, page, database_id)
+        seen.add(normalize_id(page["id"]))
+        edited = page.get("last_edited_time")
+        if edited and (newest is None or edited > newest):
+            newest = edited
+        written += 1
+
+    if full:
+        stored = [r[0] for r in conn.execute("SELECT page_id FROM pages WHERE database_id = ?", (key,))]
+        for page_id in stored:
+            if page_id not in seen:
+                conn.execute("DELETE FROM pages WHERE page_id = ?", (page_id,))
+
+    conn.execute(
+        "INSERT OR REPLACE INTO checkpoints (database_id, last_edited_time, synced_at) VALUES (?, ?, ?)",
+        (key, newest, datetime.now(timezone.utc).isoformat())
+    )
+    conn.commit()
+    return written
+
+
+def sync_all(notion, full: bool = False, path: Optional[str] = None) -> Dict[str, int]:
+    """Sync every configured database, returning pages written per database"""
+    conn = connect(path)
+    try:
+        return {
+            name: sync_database(notion, database_id, conn, full=full)
+            for name, database_id in get_database_ids().items()
+        }
+    finally:
+        conn.close()
+
+
+# ============================================================================
+# LOCAL FILTER / SORT EVALUATION
+# ============================================================================
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    # Compare naive and aware values on a common footing
+    return parsed.replace(tzinfo=None) if parsed.tzinfo is None else parsed.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _compare_dates(value: Optional[str], target: str, op: str) -> bool:
+    if value is None:
+        return op == "is_empty"
+    left, right = _parse_datetime(value), _parse_datetime(target)
+    if left is None or right is None:
+        return False
+    # A date-only side is compared at day granularity, as Notion does
+    if len(value) <= 10 or len(target) <= 10:
+        left, right = left.date(), right.date()
+    return {
+        "equals": left == right,
+        "before": left < right,
+        "after": left > right,
+        "on_or_before": left <= right,
+        "on_or_after": left >= right,
+    }.get(op, False)
+
+
+def _plain_text(items: List[Dict[str, Any]]) -> str:
+    return "".join(item.get("plain_text", "") for item in items or [])
+
+
+def property_value(page: Dict[str, Any], prop: Dict[str, Any]) -> Any:
+    """Reduce a Notion property object to a comparable Python value"""
+    prop_type = prop.get("type")
+    value = prop.get(prop_type)
+    if prop_type in ("title", "rich_text"):
+        return _plain_text(value)
+    if prop_type == "date":
+        return value.get("start") if value else None
+    if prop_type == "select" or prop_type == "status":
+        return value.get("name") if value else None
+    if prop_type == "multi_select":
+        return [item.get("name") for item in value or []]
+    if prop_type == "relation":
+        return [normalize_id(item.get("id")) for item in value or []]
+    if prop_type == "unique_id":
+        return value.get("number") if value else None
+    return value
+
+
+def matches_filter(page: Dict[str, Any], query_filter: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a Notion database filter object against a stored page"""
+    if not query_filter:
+        return True
+    if "and" in query_filter:
+        return all(matches_filter(page, f) for f in query_filter["and"])
+    if "or" in query_filter:
+        return any(matches_filter(page, f) for f in query_filter["or"])
+
+    if "timestamp" in query_filter:
+        timestamp = query_filter["timestamp"]
+        value = page.get(timestamp)
+        condition = query_filter.get(timestamp, {})
+        return all(_compare_dates(value, target, op) for op, target in condition.items())
+
+    prop = page.get("properties", {}).get(query_filter.get("property"), {})
+    value = property_value(page, prop)
+
+    for prop_type in ("relation", "date", "select", "status", "multi_select", "title",
+                      "rich_text", "number", "checkbox", "email", "phone_number", "unique_id"):
+        if prop_type not in query_filter:
+            continue
+        for op, target in query_filter[prop_type].items():
+            if op == "is_empty":
+                if bool(value) == bool(target):
+                    return False
+            elif op == "is_not_empty":
+                if bool(value) != bool(target):
+                    return False
+            elif prop_type == "relation":
+                if op == "contains" and normalize_id(target) not in (value or []):
+                    return False
+                if op == "does_not_contain" and normalize_id(target) in (value or []):
+                    return False
+            elif prop_type == "date":
+                if not _compare_dates(value, target, op):
+                    return False
+            elif prop_type == "multi_select":
+                if op == "contains" and target not in (value or []):
+                    return False
+                if op == "does_not_contain" and target in (value or []):
+                    return False
+            elif op == "equals":
+                if value != target:
+                    return False
+            elif op == "does_not_equal":
+                if value == target:
+                    return False
+            elif op == "contains":
+                if target not in (value or ""):
+                    return False
+            elif op == "does_not_contain":
+                if target in (value or ""):
+                    return False
+            elif op == "starts_with":
+                if not (value or "").startswith(target):
+                    return False
+            elif op in ("greater_than", "less_than", "greater_than_or_equal_to", "less_than_or_equal_to"):
+                if value is None:
+                    return False
+                if op == "greater_than" and not value > target:
+                    return False
+                if op == "less_than" and not value < target:
+                    return False
+                if op == "greater_than_or_equal_to" and not value >= target:
+                    return False
+                if op == "less_than_or_equal_to" and not value <= target:
+                    return False
+        return True
+
+    return True
+
+
+def sort_pages(pages: List[Dict[str, Any]], sorts: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Apply Notion sort objects to stored pages (empty values sort last)"""
+    for sort in reversed(sorts or []):
+        descending = sort.get("direction") == "descending"
+
+        def key(page, sort=sort):
+            if "timestamp" in sort:
+                value = page.get(sort["timestamp"])
+            else:
+                value = property_value(page, page.get("properties", {}).get(sort.get("property"), {}))
+            if isinstance(value, list):
+                value = ",".join(str(v) for v in value)
+            return value
+
+        present = [p for p in pages if key(p) is not None]
+        missing = [p for p in pages if key(p) is None]
+        pages = sorted(present, key=key, reverse=descending) + missing
+    return pages
+
+
+# ============================================================================
+# CLIENT ADAPTER
+# ============================================================================
+
+def load_stored_page(path: str, page_id: str) -> Optional[Dict[str, Any]]:
+    """Return one page from the replica, or None if it is not mirrored"""
+    conn = connect(path)
+    try:
+        row = conn.execute(
+            "SELECT data FROM pages WHERE page_id = ?", (normalize_id(page_id),)
+        ).fetchone()
+    finally:
+        conn.close()
+    return json.loads(row[0]) if row else None
+
+
+def save_page(path: str, page: Dict[str, Any]) -> Dict[str, Any]:
+    """Record a page returned by live Notion in the replica"""
+    conn = connect(path)
+    try:
+        store_page(conn, page)
+        conn.commit()
+    finally:
+        conn.close()
+    return page
+
+
+def project_page(page: Dict[str, Any], property_ids: Optional[List[str]]) -> Dict[str, Any]:
+    """Keep only the given properties (by ID), like Notion's filter_properties"""
+    if not property_ids:
+        return page
+    wanted = set(property_ids)
+    properties = {
+        name: prop for name, prop in page.get("properties", {}).items()
+        if unquote(prop.get("id", "")) in wanted
+    }
+    return {**page, "properties": properties}
+
+
+class _MirrorDatabases:
+    def __init__(self, mirror):
+        self._mirror = mirror
+        self._snapshots: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load_pages(self, database_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        sql = "SELECT data FROM pages WHERE database_id = ?"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        conn = connect(self._mirror.path)
+        try:
+            rows = conn.execute(sql, (normalize_id(database_id),)).fetchall()
+        finally:
+            conn.close()
+        return [json.loads(row[0]) for row in rows]
+
+    def query(self, database_id: str, filter=None, sorts=None, start_cursor=None, page_size=100,
+              filter_properties=None, **kwargs):
+        """
+        Answer a databases.query call from the replica
+
+        The first page filters and sorts the database once and keeps the
+        result; its cursor ("<query key>:<offset>") points into it, so later
+        pages are slices rather than rescans. Cursors are the same for the
+        same query, so they stay stable for ETags. A cursor whose snapshot
+        has been evicted falls back to a rescan at the same offset.
+        """
+        key = hashlib.sha256(json.dumps(
+            [normalize_id(database_id), filter, sorts], sort_keys=True, default=str
+        ).encode("utf-8")).hexdigest()[:16]
+        offset = int((start_cursor or "").rpartition(":")[2] or 0)
+
+        pages = None
+        if start_cursor:
+            with self._lock:
+                pages = self._snapshots.get(key)
+                if pages is not None:
+                    self._snapshots.move_to_end(key)
+        scanned = pages is None
+        if scanned:
+            pages = [page for page in self._load_pages(database_id) if matches_filter(page, filter)]
+            pages = sort_pages(pages, sorts)
+
+        end = offset + page_size
+        has_more = end < len(pages)
+        if has_more and scanned:
+            with self._lock:
+                self._snapshots[key] = pages
+                self._snapshots.move_to_end(key)
+                while len(self._snapshots) > MAX_QUERY_SNAPSHOTS:
+                    self._snapshots.popitem(last=False)
+        return {
+            "object": "list",
+            "results": [project_page(page, filter_properties) for page in pages[offset:end]],
+            "has_more": has_more,
+            "next_cursor": f"{key}:{end}" if has_more else None
+        }
+
+    def schema(self, database_id: str) -> Optional[Dict[str, Any]]:
+        """Property name -> ID/type schema read off a stored page, if any"""
+        for page in self._load_pages(database_id, limit=1):
+            return {
+                "object": "database",
+                "id": database_id,
+                "properties": {
+                    name: {"id": prop.get("id"), "type": prop.get("type")}
+                    for name, prop in page.get("properties", {}).items()
+                }
+            }
+        return None
+
+    def retrieve(self, database_id: str, **kwargs):
+        """Return the database schema from the replica, falling back to live Notion"""
+        return self.schema(database_id) or self._mirror.live.databases.retrieve(database_id=database_id, **kwargs)
+
+    def update(self, **kwargs):
+        """Schema changes go straight to live Notion"""
+        return self._mirror.live.databases.update(**kwargs)
+
+
+class _MirrorPages:
+    def __init__(self, mirror):
+        self._mirror = mirror
+
+    def retrieve(self, page_id: str, **kwargs):
+        """Return a page from the replica, falling back to live Notion"""
+        page = load_stored_page(self._mirror.path, page_id)
+        if page is None:
+            page = save_page(self._mirror.path, self._mirror.live.pages.retrieve(page_id=page_id, **kwargs))
+        return page
+
+    def create(self, **kwargs):
+        """Create the page in live Notion and record it in the replica"""
+        return save_page(self._mirror.path, self._mirror.live.pages.create(**kwargs))
+
+    def update(self, **kwargs):
+        """Update the page in live Notion and record it in the replica"""
+        return save_page(self._mirror.path, self._mirror.live.pages.update(**kwargs))
+
+
+class MirrorClient:
+    """Notion client stand-in that reads from the SQLite replica"""
+
+    def __init__(self, live, path: Optional[str] = None):
+        self.live = live
+        self.path = path or get_mirror_path()
+        self.databases = _MirrorDatabases(self)
+        self.pages = _MirrorPages(self)
+
+
+class _AsyncMirrorDatabases:
+    def __init__(self, mirror):
+        self._mirror = mirror
+        self._sync = _MirrorDatabases(mirror)
+
+    async def query(self, **kwargs):
+        """Answer a databases.query call from the replica without blocking the loop"""
+        return await asyncio.to_thread(self._sync.query, **kwargs)
+
+    async def retrieve(self, database_id: str, **kwargs):
+        """Return the database schema from the replica, falling back to live Notion"""
+        database = await asyncio.to_thread(self._sync.schema, database_id)
+        if database is None:
+            database = await self._mirror.live.databases.retrieve(database_id=database_id, **kwargs)
+        return database
+
+    async def update(self, **kwargs):
+        """Schema changes go straight to live Notion"""
+        return await self._mirror.live.databases.update(**kwargs)
+
+
+class _AsyncMirrorPages:
+    def __init__(self, mirror):
+        self._mirror = mirror
+
+    async def retrieve(self, page_id: str, **kwargs):
+        """Return a page from the replica, falling back to live Notion"""
+        page = await asyncio.to_thread(load_stored_page, self._mirror.path, page_id)
+        if page is None:
+            page = await self._mirror.live.pages.retrieve(page_id=page_id, **kwargs)
+            await asyncio.to_thread(save_page, self._mirror.path, page)
+        return page
+
+    async def create(self, **kwargs):
+        """Create the page in live Notion and record it in the replica"""
+        page = await self._mirror.live.pages.create(**kwargs)
+        return await asyncio.to_thread(save_page, self._mirror.path, page)
+
+    async def update(self, **kwargs):
+        """Update the page in live Notion and record it in the replica"""
+        page = await self._mirror.live.pages.update(**kwargs)
+        return await asyncio.to_thread(save_page, self._mirror.path, page)
+
+
+class AsyncMirrorClient:
+    """notion_client.AsyncClient stand-in that reads from the SQLite replica"""
+
+    def __init__(self, live, path: Optional[str] = None):
+        self.live = live
+        self.path = path or get_mirror_path()
+        self.databases = _AsyncMirrorDatabases(self)
+        self.pages = _AsyncMirrorPages(self)
+
+
+def use_mirror_if_enabled(notion):
+    """Wrap a live client in MirrorClient when NOTION_USE_MIRROR=1"""
+    if os.getenv("NOTION_USE_MIRROR") == "1":
+        return MirrorClient(notion)
+    return notion
+
+
+def use_async_mirror_if_enabled(notion):
+    """Wrap a live AsyncClient in AsyncMirrorClient when NOTION_USE_MIRROR=1"""
+    if os.getenv("NOTION_USE_MIRROR") == "1":
+        return AsyncMirrorClient(notion)
+    return notion
+
+
+# Main execution
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from notion_client import Client
+    from notion_scheduler import rate_limited
+
+    # Fix encoding for Windows
+    if sys.platform == "win32":
+        sys.stdout.reconfigure(encoding='utf-8')
+
+    load_dotenv()
+    full = "--full" in sys.argv
+
+    print("="*70)
+    print(" " * 15 + "SYNC NOTION MIRROR" + (" (FULL)" if full else ""))
+    print("="*70)
+
+    notion = rate_limited(Client(auth=os.getenv("NOTION_API_KEY")))
+    results = sync_all(notion, full=full)
+
+    print(f"\n📊 Pages written to {get_mirror_path()}:")
+    for name, written in results.items():
+        print(f"   {name}: {written}")
+
+    print("\n" + "="*70)
@@ -0,0 +1,263 @@
+"""
+Shared paginated query helpers for Notion databases
+
+Notion returns at most 100 pages per databases.query call. These helpers
+follow next_cursor until the result set is exhausted, yielding pages lazily
+so large databases can be scanned in constant memory.
+
+Callers can pass properties=[...] to project each page down to the
+properties they actually read (Notion's filter_properties), which keeps
+long rich_text fields and relations out of the response.
+
+aquery_page() fetches a single page of results instead, for APIs that hand
+the cursor on to their own callers.
+"""
+
+from collections import defaultdict
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import unquote
+
+# Notion's maximum page size for databases.query
+PAGE_SIZE = 100
+
+# Every database's title property has this ID, whatever it is called
+TITLE_PROPERTY_ID = "title"
+
+# database ID -> {property name: property ID}, filled from databases.retrieve
+_property_ids: Dict[str, Dict[str, str]] = {}
+
+
+def _cache_key(database_id: str) -> str:
+    return (database_id or "").replace("-", "").lower()
+
+
+def _schema_ids(database: Dict[str, Any]) -> Dict[str, str]:
+    # Schema IDs come URL-encoded; the HTTP client encodes them again
+    return {
+        name: unquote(prop.get("id", name))
+        for name, prop in database.get("properties", {}).items()
+    }
+
+
+def _select_ids(ids: Dict[str, str], properties: Iterable[str]) -> List[str]:
+    """Map property names (or IDs) to IDs, dropping ones the database lacks"""
+    known_ids = set(ids.values())
+    selected = []
+    for prop in properties:
+        prop_id = ids.get(prop) or (prop if prop in known_ids else None)
+        if prop_id and prop_id not in selected:
+            selected.append(prop_id)
+    return selected
+
+
+def property_ids(notion, database_id: str, properties: Iterable[str]) -> List[str]:
+    """
+    Resolve property names to the IDs filter_properties expects
+
+    The database schema is retrieved once per process and cached.
+    Names the database does not have are skipped, so the decoders just
+    see them as empty.
+    """
+    key = _cache_key(database_id)
+    if key not in _property_ids:
+        _property_ids[key] = _schema_ids(notion.databases.retrieve(database_id=database_id))
+    return _select_ids(_property_ids[key], properties)
+
+
+def forget_property_ids(database_id: str):
+    """Drop a cached schema, e.g. after adding a property to the database"""
+    _property_ids.pop(_cache_key(database_id), None)
+
+
+async def aproperty_ids(notion, database_id: str, properties: Iterable[str]) -> List[str]:
+    """Async counterpart of property_ids"""
+    key = _cache_key(database_id)
+    if key not in _property_ids:
+        _property_ids[key] = _schema_ids(await notion.databases.retrieve(database_id=database_id))
+    return _select_ids(_property_ids[key], properties)
+
+
+def iter_database_pages(
+    notion,
+    database_id: str,
+    filter: Optional[Dict[str, Any]] = None,
+    sorts: Optional[List[Dict[str, Any]]] = None,
+    page_size: int = PAGE_SIZE,
+    limit: Optional[int] = None,
+    properties: Optional[Iterable[str]] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield every page matching a database query, following next_cursor
+
+    Args:
+        notion: Notion client
+        database_id: ID of the database to query
+        filter: Optional Notion filter object
+        sorts: Optional list of Notion sort objects
+        page_size: Pages requested per round trip (max 100)
+        limit: Stop after yielding this many pages (default: no limit)
+        properties: Only return these properties, by name or ID (default: all)
+
+    Yields:
+        Notion page objects in query order
+    """
+    if limit is not None:
+        page_size = min(page_size, limit)
+    if page_size <= 0:
+        return
+
+    query = {"database_id": database_id, "page_size": min(page_size, PAGE_SIZE)}
+    if filter:
+        query["filter"] = filter
+    if sorts:
+        query["sorts"] = sorts
+    if properties is not None:
+        query["filter_properties"] = property_ids(notion, database_id, properties)
+
+    yielded = 0
+    while True:
+        response = notion.databases.query(**query)
+
+        for page in response.get("results", []):
+            yield page
+            yielded += 1
+            if limit is not None and yielded >= limit:
+                return
+
+        next_cursor = response.get("next_cursor")
+        if not response.get("has_more") or not next_cursor:
+            return
+        query["start_cursor"] = next_cursor
+
+
+def query_all(notion, database_id: str, **kwargs) -> List[Dict[str, Any]]:
+    """Return every page matching a database query as a list"""
+    return list(iter_database_pages(notion, database_id, **kwargs))
+
+
+def first_page(notion, database_id: str, **kwargs) -> Optional[Dict[str, Any]]:
+    """Return the first page matching a database query, or None"""
+    for page in iter_database_pages(notion, database_id, limit=1, **kwargs):
+        return page
+    return None
+
+
+def count_pages(notion, database_id: str, **kwargs) -> int:
+    """Count every page matching a database query without keeping them"""
+    kwargs.setdefault("properties", [TITLE_PROPERTY_ID])
+    return sum(1 for _ in iter_database_pages(notion, database_id, **kwargs))
+
+
+def group_by_relation(pages: Iterable[Dict[str, Any]], relation_property: str) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Bucket pages by the page IDs in one of their relation properties
+
+    A page related to several pages appears in each of their buckets.
+    Query order is preserved within each bucket.
+
+    Args:
+        pages: Notion page objects (e.g. from iter_database_pages)
+        relation_property: Name of the relation property to group on
+
+    Returns:
+        Dictionary of related page ID -> list of pages
+    """
+    buckets = defaultdict(list)
+    for page in pages:
+        relations = page.get("properties", {}).get(relation_property, {}).get("relation", [])
+        for relation in relations:
+            buckets[relation.get("id")].append(page)
+    return dict(buckets)
+
+
+def prefetch_by_relation(notion, database_id: str, relation_property: str, **kwargs) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Run one paginated scan and bucket the results by a relation property
+
+    Replaces one filtered query per related page (e.g. per patient) with a
+    single scan over the whole window.
+    """
+    return group_by_relation(iter_database_pages(notion, database_id, **kwargs), relation_property)
+
+
+async def aiter_database_pages(
+    notion,
+    database_id: str,
+    filter: Optional[Dict[str, Any]] = None,
+    sorts: Optional[List[Dict[str, Any]]] = None,
+    page_size: int = PAGE_SIZE,
+    limit: Optional[int] = None,
+    properties: Optional[Iterable[str]] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """Async counterpart of iter_database_pages for notion_client.AsyncClient"""
+    if limit is not None:
+        page_size = min(page_size, limit)
+    if page_size <= 0:
+        return
+
+    query = {"database_id": database_id, "page_size": min(page_size, PAGE_SIZE)}
+    if filter:
+        query["filter"] = filter
+    if sorts:
+        query["sorts"] = sorts
+    if properties is not None:
+        query["filter_properties"] = await aproperty_ids(notion, database_id, properties)
+
+    yielded = 0
+    while True:
+        response = await notion.databases.query(**query)
+
+        for page in response.get("results", []):
+            yield page
+            yielded += 1
+            if limit is not None and yielded >= limit:
+                return
+
+        next_cursor = response.get("next_cursor")
+        if not response.get("has_more") or not next_cursor:
+            return
+        query["start_cursor"] = next_cursor
+
+
+async def aquery_all(notion, database_id: str, **kwargs) -> List[Dict[str, Any]]:
+    """Return every page matching a database query as a list (async)"""
+    return [page async for page in aiter_database_pages(notion, database_id, **kwargs)]
+
+
+async def aquery_page(
+    notion,
+    database_id: str,
+    filter: Optional[Dict[str, Any]] = None,
+    sorts: Optional[List[Dict[str, Any]]] = None,
+    page_size: int = PAGE_SIZE,
+    start_cursor: Optional[str] = None,
+    properties: Optional[Iterable[str]] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Fetch one page of a database query (async)
+
+    Args:
+        notion: Notion AsyncClient
+        database_id: ID of the database to query
+        filter: Optional Notion filter object
+        sorts: Optional list of Notion sort objects
+        page_size: Pages to return (max 100)
+        start_cursor: next_cursor from the previous page (default: first page)
+        properties: Only return these properties, by name or ID (default: all)
+
+    Returns:
+        (pages, next_cursor) - next_cursor is None on the last page
+    """
+    query = {"database_id": database_id, "page_size": max(1, min(page_size, PAGE_SIZE))}
+    if filter:
+        query["filter"] = filter
+    if sorts:
+        query["sorts"] = sorts
+    if start_cursor:
+        query["start_cursor"] = start_cursor
+    if properties is not None:
+        query["filter_properties"] = await aproperty_ids(notion, database_id, properties)
+
+    response = await notion.databases.query(**query)
+    next_cursor = response.get("next_cursor") if response.get("has_more") else None
+    return response.get("results", []), next_cursor
@@ -0,0 +1,282 @@
+"""
+Schema-driven decoders for Notion pages
+
+Each database gets a declarative field map (record field -> Notion property
+and type). compile_decoder() turns a field map into a single function that
+decodes a page into a compact __slots__ record, resolving every property
+extractor once up front instead of walking nested dicts per field per page.
+
+Records support item access (record["date"], record.get("rating")) so code
+written against the old dicts keeps working, and to_dict() for JSON output.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+# ============================================================================
+# RECORD TYPES
+# ============================================================================
+
+class Record:
+    """Base for compact page records with dict-style read access"""
+
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.__slots__
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class Workout(Record):
+    __slots__ = ("id", "date", "duration", "exercises", "focus_areas", "noticed", "improving",
+                 "concerns", "rating", "patient_rating", "patient_comments", "patient_ids",
+                 "trainer_ids", "last_edited_time")
+
+
+class Assessment(Record):
+    __slots__ = ("id", "assessment_id", "date", "strength_score", "mobility_score", "balance_score",
+                 "flexibility_score", "goals", "program", "trainer_notes", "patient_ids",
+                 "last_edited_time")
+
+
+class WeeklyLog(Record):
+    __slots__ = ("id", "week_id", "week_start", "week_end", "sessions", "summary", "improvements",
+                 "concerns", "recommendations", "patient_ids", "last_edited_time")
+
+
+class MonthlyLog(Record):
+    __slots__ = ("id", "month_id", "month_start", "month_end", "sessions", "summary", "achievements",
+                 "challenges", "next_month_focus", "trainer_comments", "patient_ids",
+                 "last_edited_time")
+
+
+class Patient(Record):
+    __slots__ = ("id", "name", "patient_id", "status", "email", "phone", "weight", "height",
+                 "chest", "waist", "hips", "thigh", "arm", "last_edited_time")
+
+
+# ============================================================================
+# FIELD MAPS  (record field -> (Notion property, type[, default]))
+# ============================================================================
+
+WORKOUT_FIELDS = {
+    "id": ("id", "page"),
+    "date": ("Date", "date", ""),
+    "duration": ("Duration (min)", "number", 0),
+    "exercises": ("Exercises & Sets", "rich_text"),
+    "focus_areas": ("Focus Areas", "multi_select"),
+    "noticed": ("What I Noticed", "rich_text"),
+    "improving": ("What's Improving", "rich_text"),
+    "concerns": ("Concerns/Issues", "rich_text"),
+    "rating": ("Overall Session Rating", "select"),
+    "patient_rating": ("Patient Self-Rating", "select"),
+    "patient_comments": ("Patient Comments", "rich_text"),
+    "patient_ids": ("Patient", "relation"),
+    "trainer_ids": ("Trainer", "relation"),
+    "last_edited_time": ("last_edited_time", "page"),
+}
+
+ASSESSMENT_FIELDS = {
+    "id": ("id", "page"),
+    "assessment_id": ("Assessment ID", "title"),
+    "date": ("Assessment Date", "date", ""),
+    "strength_score": ("Strength Score", "number"),
+    "mobility_score": ("Mobility Score", "number"),
+    "balance_score": ("Balance Score", "number"),
+    "flexibility_score": ("Flexibility Score", "number"),
+    "goals": ("Goals Set", "rich_text"),
+    "program": ("Program Suggested", "rich_text"),
+    "trainer_notes": ("Trainer Notes", "rich_text"),
+    "patient_ids": ("Patient", "relation"),
+    "last_edited_time": ("last_edited_time", "page"),
+}
+
+WEEKLY_LOG_FIELDS = {
+    "id": ("id", "page"),
+    "week_id": ("Week ID", "title"),
+    "week_start": ("Week Start", "date", ""),
+    "week_end": ("Week End", "date", ""),
+    "sessions": ("Total Sessions", "number", 0),
+    "summary": ("Weekly Summary", "rich_text"),
+    "improvements": ("Key Improvements", "rich_text"),
+    "concerns": ("Concerns Noted", "rich_text"),
+    "recommendations": ("Recommendations", "rich_text"),
+    "patient_ids": ("patient", "relation"),
+    "last_edited_time": ("last_edited_time", "page"),
+}
+
+MONTHLY_LOG_FIELDS = {
+    "id": ("id", "page"),
+    "month_id": ("Month ID", "title"),
+    "month_start": ("Month Start", "date", ""),
+    "month_end": ("Month End", "date", ""),
+    "sessions": ("Total Sessions", "number", 0),
+    "summary": ("Monthly Summary", "rich_text"),
+    "achievements": ("Major Achievements", "rich_text"),
+    "challenges": ("Challenges", "rich_text"),
+    "next_month_focus": ("Next Month Focus", "rich_text"),
+    "trainer_comments": ("Trainer Comments", "rich_text"),
+    "patient_ids": ("Patient", "relation"),
+    "last_edited_time": ("last_edited_time", "page"),
+}
+
+PATIENT_FIELDS = {
+    "id": ("id", "page"),
+    "name": ("Name", "title"),
+    "patient_id": ("Patient ID", "unique_id"),
+    "status": ("Status", "select"),
+    "email": ("Email", "email"),
+    "phone": ("Phone", "phone_number"),
+    "weight": ("Weight (kg)", "number"),
+    "height": ("Height (cm)", "number"),
+    "chest": ("Chest (cm)", "number"),
+    "waist": ("Waist (cm)", "number"),
+    "hips": ("Hips (cm)", "number"),
+    "thigh": ("Thigh (cm)", "number"),
+    "arm": ("Arm (cm)", "number"),
+    "last_edited_time": ("last_edited_time", "page"),
+}
+
+MEASUREMENT_FIELDS = ("weight", "height", "chest", "waist", "hips", "thigh", "arm")
+
+
+# ============================================================================
+# EXTRACTORS
+# ============================================================================
+
+def _plain_text(items) -> str:
+    if not items:
+        return ""
+    return "".join([item.get("plain_text", "") for item in items])
+
+
+def _date(value):
+    return value.get("start") if value else None
+
+
+def _select(value):
+    return value.get("name") if value else None
+
+
+def _multi_select(value):
+    return [item.get("name") for item in value or []]
+
+
+def _relation(value):
+    return [item.get("id") for item in value or []]
+
+
+def _unique_id(value):
+    return value.get("number") if value else None
+
+
+def _identity(value):
+    return value
+
+
+EXTRACTORS: Dict[str, Callable[[Any], Any]] = {
+    "title": _plain_text,
+    "rich_text": _plain_text,
+    "date": _date,
+    "select": _select,
+    "status": _select,
+    "multi_select": _multi_select,
+    "relation": _relation,
+    "unique_id": _unique_id,
+    "number": _identity,
+    "email": _identity,
+    "phone_number": _identity,
+    "checkbox": _identity,
+    "url": _identity,
+}
+
+# Value used when a property is missing or empty, by type
+TYPE_DEFAULTS = {
+    "title": "",
+    "rich_text": "",
+    "multi_select": [],
+    "relation": [],
+}
+
+
+def property_names(field_map: Dict[str, Tuple]) -> List[str]:
+    """Notion property names a field map reads (page-level fields excluded)"""
+    return [spec[0] for spec in field_map.values() if spec[1] != "page"]
+
+
+def compile_decoder(record_cls, field_map: Dict[str, Tuple]) -> Callable[[Dict[str, Any]], Record]:
+    """
+    Compile a field map into a page -> record decoder
+
+    Args:
+        record_cls: Record subclass whose __slots__ match the field map keys
+        field_map: record field -> (property name, type[, default])
+
+    Returns:
+        Function decoding one Notion page into a record_cls instance
+    """
+    plan = []
+    for field in record_cls.__slots__:
+        spec = field_map[field]
+        prop_name, prop_type = spec[0], spec[1]
+        default = spec[2] if len(spec) > 2 else TYPE_DEFAULTS.get(prop_type)
+        if prop_type == "page":
+            plan.append((prop_name, None, None, default))
+        else:
+            plan.append((prop_name, prop_type, EXTRACTORS[prop_type], default))
+    plan = tuple(plan)
+
+    def decode(page: Dict[str, Any]) -> Record:
+        props = page.get("properties", {})
+        values = []
+        for prop_name, prop_type, extract, default in plan:
+            if prop_type is None:
+                values.append(page.get(prop_name, default))
+                continue
+            prop = props.get(prop_name)
+            value = extract(prop.get(prop_type)) if prop else None
+            if value is None or (default is not None and value == ""):
+                value = default if not isinstance(default, list) else []
+            values.append(value)
+        return record_cls(*values)
+
+    decode.__doc__ = f"Decode a Notion page into a {record_cls.__name__} record"
+    return decode
+
+
+decode_workout = compile_decoder(Workout, WORKOUT_FIELDS)
+decode_assessment = compile_decoder(Assessment, ASSESSMENT_FIELDS)
+decode_weekly_log = compile_decoder(WeeklyLog, WEEKLY_LOG_FIELDS)
+decode_monthly_log = compile_decoder(MonthlyLog, MONTHLY_LOG_FIELDS)
+decode_patient = compile_decoder(Patient, PATIENT_FIELDS)
+
+# Property projections for queries (notion_query properties=...)
+WORKOUT_PROPERTIES = property_names(WORKOUT_FIELDS)
+ASSESSMENT_PROPERTIES = property_names(ASSESSMENT_FIELDS)
+WEEKLY_LOG_PROPERTIES = property_names(WEEKLY_LOG_FIELDS)
+MONTHLY_LOG_PROPERTIES = property_names(MONTHLY_LOG_FIELDS)
+PATIENT_PROPERTIES = property_names(PATIENT_FIELDS)
+
+
+def patient_measurements(patient: Patient) -> Dict[str, Optional[float]]:
+    """Body measurements from a decoded patient, as used in monthly reports"""
+    return {field: getattr(patient, field) for field in MEASUREMENT_FIELDS}
@@ -0,0 +1,244 @@
+"""
+Rate-limit-aware request scheduler for Notion calls
+
+Notion allows roughly 3 requests/second per integration. Every Notion
+client in this project is wrapped with rate_limited(), which:
+
+- paces requests through one token bucket shared by the whole process
+- retries 429 and 5xx responses, honouring Retry-After when present
+- backs off exponentially with full jitter on other transient failures
+- retries endpoints that create something (pages.create, ...) on 429 only:
+  after a 5xx or a lost response the create may already have happened
+- keeps per-process accounting (see get_stats())
+
+Configuration (environment):
+    NOTION_RATE_LIMIT     requests per second (default: 3)
+    NOTION_RATE_BURST     bucket size (default: same as the rate)
+    NOTION_MAX_RETRIES    retries per request (default: 5)
+    NOTION_BASE_URL       send requests to another host, e.g. the local
+                          fake from fake_servers.py (default: Notion's API)
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from notion_client import AsyncClient
+from notion_client.errors import APIResponseError, HTTPResponseError, RequestTimeoutError
+
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+
+# Not safe to resend unless Notion rejected the request (429) before doing it
+NON_IDEMPOTENT_ENDPOINTS = {"pages.create", "databases.create", "blocks.children.append", "comments.create"}
+
+
+class TokenBucket:
+    """Thread-safe token bucket that hands out the delay before each request"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token, returning how long the caller must wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def pause(self, seconds: float):
+        """Drain the bucket so every caller waits (used after a 429)"""
+        with self._lock:
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class SchedulerStats:
+    """Per-process request accounting"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.retries = 0
+            self.rate_limited = 0
+            self.failures = 0
+            self.wait_seconds = 0.0
+            self.by_endpoint: Dict[str, int] = {}
+
+    def record(self, endpoint: str = None, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                setattr(self, name, getattr(self, name) + value)
+            if endpoint:
+                self.by_endpoint[endpoint] = self.by_endpoint.get(endpoint, 0) + 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "failures": self.failures,
+                "wait_seconds": round(self.wait_seconds, 3),
+                "by_endpoint": dict(self.by_endpoint),
+            }
+
+
+_bucket: Optional[TokenBucket] = None
+_bucket_lock = threading.Lock()
+_stats = SchedulerStats()
+
+
+def _get_bucket() -> TokenBucket:
+    """Process-wide bucket, created on first use so .env settings are loaded"""
+    global _bucket
+    with _bucket_lock:
+        if _bucket is None:
+            _bucket = TokenBucket(
+                float(os.getenv("NOTION_RATE_LIMIT", "3")),
+                float(os.getenv("NOTION_RATE_BURST", "0")) or None
+            )
+        return _bucket
+
+
+def get_stats() -> Dict[str, Any]:
+    """Return request accounting for this process"""
+    return _stats.as_dict()
+
+
+def _max_retries() -> int:
+    return int(os.getenv("NOTION_MAX_RETRIES", "5"))
+
+
+def _retry_delay(error: Exception, attempt: int, endpoint: str = "") -> Optional[float]:
+    """Seconds to wait before retrying, or None if the error is not retryable"""
+    is_response = isinstance(error, (APIResponseError, HTTPResponseError))
+    status = getattr(error, "status", None) if is_response else None
+    if endpoint in NON_IDEMPOTENT_ENDPOINTS and status != 429:
+        return None
+    if is_response:
+        if status == 429:
+            retry_after = getattr(error, "headers", {}).get("retry-after")
+            if retry_after:
+                try:
+                    return float(retry_after)
+                except ValueError:
+                    pass
+        elif status is None or status < 500:
+            return None
+    elif not isinstance(error, (RequestTimeoutError, httpx.TransportError)):
+        return None
+
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def _handle_failure(error: Exception, attempt: int, endpoint: str) -> float:
+    """Account for a failed attempt and return the retry delay, or re-raise"""
+    delay = _retry_delay(error, attempt, endpoint)
+    if delay is None or attempt >= _max_retries():
+        _stats.record(failures=1)
+        raise error
+    _stats.record(retries=1)
+    print(f"   ⏳ Notion {endpoint} retry {attempt + 1} in {delay:.1f}s ({error})")
+    if getattr(error, "status", None) == 429:
+        # Hold back every caller in the process, not just this one; the
+        # wait then happens in the next bucket reservation
+        _stats.record(rate_limited=1)
+        _get_bucket().pause(delay)
+        return 0.0
+    return delay
+
+
+class _Endpoint:
+    """Proxy for a client endpoint (databases, pages, ...) that schedules each call"""
+
+    def __init__(self, endpoint, name: str, is_async: bool):
+        self._endpoint = endpoint
+        self._name = name
+        self._is_async = is_async
+
+    def __getattr__(self, attr):
+        target = getattr(self._endpoint, attr)
+        endpoint = f"{self._name}.{attr}"
+        if hasattr(target, "parent"):  # nested endpoint, e.g. blocks.children
+            return _Endpoint(target, endpoint, self._is_async)
+        if not callable(target):
+            return target
+        if self._is_async:
+            return self._async_call(target, endpoint)
+        return self._sync_call(target, endpoint)
+
+    @staticmethod
+    def _sync_call(target, endpoint):
+        def call(*args, **kwargs):
+            attempt = 0
+            while True:
+                delay = _get_bucket().reserve()
+                if delay:
+                    _stats.record(wait_seconds=delay)
+                    time.sleep(delay)
+                _stats.record(endpoint, requests=1)
+                try:
+                    return target(*args, **kwargs)
+                except Exception as e:
+                    time.sleep(_handle_failure(e, attempt, endpoint))
+                    attempt += 1
+        return call
+
+    @staticmethod
+    def _async_call(target, endpoint):
+        async def call(*args, **kwargs):
+            attempt = 0
+            while True:
+                delay = _get_bucket().reserve()
+                if delay:
+                    _stats.record(wait_seconds=delay)
+                    await asyncio.sleep(delay)
+                _stats.record(endpoint, requests=1)
+                try:
+                    return await target(*args, **kwargs)
+                except Exception as e:
+                    await asyncio.sleep(_handle_failure(e, attempt, endpoint))
+                    attempt += 1
+        return call
+
+
+class RateLimitedClient:
+    """Notion client wrapper that routes every endpoint call through the scheduler"""
+
+    def __init__(self, client):
+        self.client = client
+        self._is_async = isinstance(client, AsyncClient)
+
+    def __getattr__(self, name):
+        endpoint = getattr(self.client, name)
+        if hasattr(endpoint, "parent"):  # notion_client Endpoint objects
+            return _Endpoint(endpoint, name, self._is_async)
+        return endpoint
+
+
+def rate_limited(client):
+    """Wrap a notion_client Client or AsyncClient with the shared scheduler"""
+    if isinstance(client, RateLimitedClient):
+        return client
+    base_url = os.getenv("NOTION_BASE_URL")
+    if base_url:
+        client.options.base_url = base_url.rstrip("/")
+        client.client.base_url = httpx.URL(f"{client.options.base_url}/v1/")
+    return RateLimitedClient(client)
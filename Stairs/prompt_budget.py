@@ -0,0 +1,147 @@
+"""
+Token budgets for Groq prompts
+
+Weekly prompts list every session's notes and monthly prompts list every
+weekly summary, so a busy patient's prompt grows without bound. The helpers
+here keep each prompt section inside a fixed token budget:
+
+- estimate_tokens() approximates token count from text length
+- dedupe_notes() replaces trainer notes repeated across sessions with a
+  back-reference ("Same as Session 2")
+- fit_blocks() joins per-session/per-week blocks, trimming the longest ones
+  first and, if even that isn't enough, dropping the oldest blocks (but
+  never a session that a kept block refers back to)
+- truncate_to_tokens() clips one block on a word boundary
+
+All trimming is deterministic: the same inputs always produce the same
+prompt, so cached completions keep hitting.
+
+Configuration (environment):
+    PROMPT_BUDGET_SESSIONS          tokens for a week's workout sessions (default: 2000)
+    PROMPT_BUDGET_WEEKLY_SUMMARIES  tokens for a month's weekly summaries (default: 1000)
+    PROMPT_BUDGET_ASSESSMENT        tokens for an assessment block (default: 400)
+"""
+
+import math
+import os
+import re
+from typing import Dict, Iterable, List
+
+CHARS_PER_TOKEN = 4
+
+DEFAULT_BUDGETS = {
+    "sessions": 2000,
+    "weekly_summaries": 1000,
+    "assessment": 400,
+}
+
+# Free-text workout fields trainers tend to copy from session to session
+NOTE_FIELDS = ("noticed", "improving", "concerns", "patient_comments")
+
+# Smallest useful slice of a block; below this, older blocks are dropped instead
+MIN_BLOCK_TOKENS = 40
+
+TRUNCATION_MARKER = " …[truncated]"
+
+# Back-reference written by dedupe_notes(); fit_blocks() keeps the session it points to
+SAME_AS = "Same as Session {}"
+SAME_AS_PATTERN = re.compile(r"Same as Session (\d+)")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)"""
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+def section_budget(section: str) -> int:
+    """Token budget for a prompt section, overridable with PROMPT_BUDGET_<SECTION>"""
+    value = os.getenv(f"PROMPT_BUDGET_{section.upper()}")
+    return int(value) if value else DEFAULT_BUDGETS[section]
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Clip text to roughly max_tokens, cutting on a word boundary"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    limit = max(0, max_tokens * CHARS_PER_TOKEN - len(TRUNCATION_MARKER))
+    clipped = text[:limit]
+    space = clipped.rfind(" ")
+    if space > limit * 0.8:
+        clipped = clipped[:space]
+    return clipped.rstrip() + TRUNCATION_MARKER
+
+
+def dedupe_notes(workouts: Iterable, fields: Iterable[str] = NOTE_FIELDS) -> List[Dict]:
+    """
+    Copy workouts, replacing notes that repeat an earlier session's
+
+    Args:
+        workouts: Workout records (or dicts) in session order
+        fields: Note fields to compare (whitespace and case are ignored)
+
+    Returns:
+        List of workout dicts safe to format into a prompt
+    """
+    first_seen = {}
+    deduped = []
+    for i, workout in enumerate(workouts, 1):
+        workout = workout.to_dict() if hasattr(workout, "to_dict") else dict(workout)
+        for field in fields:
+            value = workout.get(field)
+            if not value:
+                continue
+            key = (field, " ".join(value.lower().split()))
+            if key in first_seen:
+                workout[field] = SAME_AS.format(first_seen[key])
+            else:
+                first_seen[key] = i
+        deduped.append(workout)
+    return deduped
+
+
+def _fair_caps(sizes: List[int], budget: int) -> List[int]:
+    """Split budget so small blocks stay whole and large ones share the rest equally"""
+    caps = [0] * len(sizes)
+    remaining, left = budget, len(sizes)
+    for index in sorted(range(len(sizes)), key=lambda i: (sizes[i], i)):
+        caps[index] = min(sizes[index], remaining // left)
+        remaining -= caps[index]
+        left -= 1
+    return caps
+
+
+def fit_blocks(blocks: List[str], budget: int, label: str = "entries") -> str:
+    """
+    Join prompt blocks within a token budget
+
+    Blocks referred to by a kept block's "Same as Session N" (dedupe_notes
+    numbering, so block N-1 is Session N) are kept as well.
+
+    Args:
+        blocks: Per-item text blocks, oldest first
+        budget: Token budget for the joined section
+        label: What a block is, for the omission note (e.g. "sessions")
+
+    Returns:
+        The joined section; unchanged if it already fits
+    """
+    if sum(estimate_tokens(block) for block in blocks) <= budget:
+        return "".join(blocks)
+
+    # Keep the most recent blocks if the budget can't hold a useful slice of each
+    keep = max(1, min(len(blocks), budget // MIN_BLOCK_TOKENS))
+    kept_indexes = set(range(len(blocks) - keep, len(blocks)))
+    pending = list(kept_indexes)
+    while pending:
+        for number in SAME_AS_PATTERN.findall(blocks[pending.pop()]):
+            index = int(number) - 1
+            if 0 <= index < len(blocks) and index not in kept_indexes:
+                kept_indexes.add(index)
+                pending.append(index)
+    omitted = len(blocks) - len(kept_indexes)
+    kept = [blocks[index] for index in sorted(kept_indexes)]
+
+    note = f"\n({omitted} earlier {label} omitted)\n" if omitted else ""
+
+    caps = _fair_caps([estimate_tokens(block) for block in kept], budget - estimate_tokens(note))
+    return note + "".join(truncate_to_tokens(block, cap) for block, cap in zip(kept, caps))
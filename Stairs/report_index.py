@@ -0,0 +1,62 @@
+"""
+Index of existing report titles (WEEKLY-/MONTHLY- IDs)
+
+Built once per run from a paginated scan of the WEEKLY or MONTHLY LOGS
+database, so save paths can check for an existing report without one
+title query per patient. Reserving a title is atomic, which keeps
+duplicate detection consistent when reports are generated concurrently.
+"""
+
+import threading
+from typing import Optional, Set
+
+from notion_query import iter_database_pages
+
+
+class ReportIndex:
+    """Set of report titles in one database, loaded on first use"""
+
+    def __init__(self, notion, database_id: str, title_property: str):
+        self.notion = notion
+        self.database_id = database_id
+        self.title_property = title_property
+        self._titles: Optional[Set[str]] = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        titles = set()
+        for page in iter_database_pages(self.notion, self.database_id, properties=[self.title_property]):
+            title = page.get("properties", {}).get(self.title_property, {}).get("title", [])
+            text = "".join(item.get("plain_text", "") for item in title)
+            if text:
+                titles.add(text)
+        self._titles = titles
+
+    def _ensure_loaded(self):
+        if self._titles is None:
+            self._load()
+
+    def __contains__(self, title: str) -> bool:
+        with self._lock:
+            self._ensure_loaded()
+            return title in self._titles
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._titles)
+
+    def reserve(self, title: str) -> bool:
+        """Claim a title for creation; False if it already exists or is claimed"""
+        with self._lock:
+            self._ensure_loaded()
+            if title in self._titles:
+                return False
+            self._titles.add(title)
+            return True
+
+    def release(self, title: str):
+        """Give back a reserved title after a failed create"""
+        with self._lock:
+            if self._titles is not None:
+                self._titles.discard(title)
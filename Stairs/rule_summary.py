@@ -0,0 +1,119 @@
+"""
+Rule-based weekly summaries for sparse weeks
+
+A week with a session or two and no trainer notes gives the model nothing
+to summarize beyond the numbers, yet still costs a full 70B call. When a
+week's written observations fall below a threshold, the weekly summary
+functions build the summary/improvements/concerns/recommendations JSON
+directly from the structured fields instead of calling Groq.
+
+Configuration (environment):
+    RULE_SUMMARY                 0 always calls Groq (default: 1)
+    RULE_SUMMARY_MIN_NOTE_CHARS  written notes below this use the rule-based
+                                 summary (default: 40)
+"""
+
+import os
+import threading
+from typing import Dict, Iterable, List
+
+from prompt_budget import NOTE_FIELDS
+
+# Free-text assessment fields that count as observations
+ASSESSMENT_NOTE_FIELDS = ("goals", "program", "trainer_notes")
+
+# Sessions per week the gym plans for (matches the weekly attendance target)
+TARGET_SESSIONS = 3
+
+_stats = {"rule_based": 0}
+_stats_lock = threading.Lock()
+
+
+def note_chars(workouts: Iterable, assessments: Iterable = ()) -> int:
+    """Characters of written observations across a week's workouts and assessments"""
+    total = sum(len((workout[field] or "").strip()) for workout in workouts for field in NOTE_FIELDS)
+    total += sum(len((assessment[field] or "").strip()) for assessment in assessments for field in ASSESSMENT_NOTE_FIELDS)
+    return total
+
+
+def is_sparse(workouts: List, assessments: List = ()) -> bool:
+    """True if the week has too little written to be worth an LLM call"""
+    if os.getenv("RULE_SUMMARY", "1") == "0":
+        return False
+    return note_chars(workouts, assessments) < int(os.getenv("RULE_SUMMARY_MIN_NOTE_CHARS", "40"))
+
+
+def _join_notes(workouts: List, field: str) -> str:
+    """Distinct notes for a field, in session order"""
+    notes = []
+    for workout in workouts:
+        note = (workout[field] or "").strip()
+        if note and note not in notes:
+            notes.append(note)
+    return "\n".join(notes)
+
+
+def rule_based_weekly_summary(patient_name: str, workouts: List, assessments: List = ()) -> Dict[str, str]:
+    """
+    Build a weekly summary from structured workout (and assessment) fields
+
+    Args:
+        patient_name: Name of the patient
+        workouts: Workout records for the week, in session order
+        assessments: Assessment records for the week, most recent first
+
+    Returns:
+        Dictionary with summary, improvements, concerns, and recommendations
+    """
+    with _stats_lock:
+        _stats["rule_based"] += 1
+
+    total_sessions = len(workouts)
+    total_minutes = sum([w['duration'] for w in workouts if w['duration']])
+
+    summary = [
+        f"{patient_name} completed {total_sessions} session{'s' if total_sessions != 1 else ''} "
+        f"this week ({total_minutes} minutes total)."
+    ]
+    focus_areas = sorted({area for w in workouts for area in (w['focus_areas'] or [])})
+    if focus_areas:
+        summary.append(f"Focus areas: {', '.join(focus_areas)}.")
+    exercises = _join_notes(workouts, "exercises").replace("\n", "; ")
+    if exercises:
+        summary.append(f"Exercises: {exercises}.")
+    ratings = [w['rating'] for w in workouts if w['rating']]
+    if ratings:
+        summary.append(f"Session ratings: {', '.join(ratings)}.")
+
+    recommendations = []
+    if total_sessions < TARGET_SESSIONS:
+        recommendations.append(f"Aim for {TARGET_SESSIONS} sessions next week ({total_sessions} completed this week).")
+    else:
+        recommendations.append(f"Keep the current schedule of {total_sessions} sessions per week.")
+
+    concerns = _join_notes(workouts, "concerns")
+    if concerns:
+        recommendations.append("Follow up on the concerns noted by the trainer.")
+
+    if assessments:
+        assessment = assessments[0]
+        summary.append(
+            f"Assessment on {assessment['date']}: strength {assessment['strength_score']}/100, "
+            f"mobility {assessment['mobility_score']}/100, balance {assessment['balance_score']}/100, "
+            f"flexibility {assessment['flexibility_score']}/100."
+        )
+        if assessment['program']:
+            recommendations.append(f"Follow the suggested program: {assessment['program']}")
+
+    return {
+        "summary": " ".join(summary),
+        "improvements": _join_notes(workouts, "improving") or "Not recorded",
+        "concerns": concerns or "None noted",
+        "recommendations": "\n".join(recommendations)
+    }
+
+
+def get_stats() -> Dict[str, int]:
+    """Return how many summaries skipped Groq in this process"""
+    with _stats_lock:
+        return dict(_stats)
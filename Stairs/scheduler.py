@@ -18,6 +18,8 @@ load_dotenv()
 API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
 SCHEDULE_DAY = os.getenv("SCHEDULE_DAY", "sunday")  # monday, tuesday, etc.
 SCHEDULE_TIME = os.getenv("SCHEDULE_TIME", "20:00")  # 24-hour format
+JOB_POLL_SECONDS = int(os.getenv("JOB_POLL_SECONDS", "10"))  # how often to check on the job
+JOB_MAX_WAIT = int(os.getenv("JOB_MAX_WAIT", "7200"))  # stop watching after this many seconds
 
 
 def generate_weekly_reports():
@@ -29,27 +31,37 @@ def generate_weekly_reports():
     print(f"{'='*60}\n")
 
     try:
-        # Call the API endpoint to generate all weekly reports
+        # Queue the run; the API processes it in the background
         response = requests.post(
             f"{API_BASE_URL}/api/weekly-reports/all",
             params={"days": 7},
-            timeout=300  # 5 minute timeout for all reports
+            timeout=30
         )
 
-        if response.status_code == 200:
-            data = response.json()
-            print(f"✅ Report Generation Complete!")
-            print(f"   - Total Patients: {data.get('total_patients', 0)}")
-            print(f"   - Successful: {data.get('successful', 0)}")
-            print(f"   - No Workouts: {data.get('no_workouts', 0)}")
-            print(f"   - Failed: {data.get('failed', 0)}")
-
-            # Show details
-            if data.get('results'):
-                print(f"\nDetailed Results:")
-                for result in data['results']:
-                    status_icon = "✅" if result['status'] == 'success' else "⚠️" if result['status'] == 'no_workouts' else "❌"
-                    print(f"   {status_icon} {result['patient_name']}: {result['status']} ({result.get('workout_count', 0)} workouts)")
+        if response.status_code in (200, 202):
+            job_id = response.json()["job_id"]
+            print(f"📋 Job queued: {job_id}")
+            data = wait_for_job(job_id)
+
+            if data is None:
+                print(f"⚠️  Job still running after {JOB_MAX_WAIT}s - check {API_BASE_URL}/api/jobs/{job_id}")
+            elif data.get('status') == 'failed':
+                print(f"❌ Job failed: {data.get('error')}")
+            else:
+                counts = data.get('counts', {})
+                print(f"✅ Report Generation Complete!")
+                print(f"   - Total Patients: {data.get('total', 0)}")
+                print(f"   - Successful: {counts.get('success', 0)}")
+                print(f"   - Unchanged: {counts.get('unchanged', 0)}")
+                print(f"   - No Workouts: {counts.get('no_workouts', 0)}")
+                print(f"   - Failed: {counts.get('error', 0)}")
+
+                # Show details
+                if data.get('results'):
+                    print(f"\nDetailed Results:")
+                    for result in data['results']:
+                        status_icon = "✅" if result['status'] in ('success', 'unchanged') else "⚠️" if result['status'] == 'no_workouts' else "❌"
+                        print(f"   {status_icon} {result['patient_name']}: {result['status']} ({result.get('workout_count', 0)} workouts)")
 
         else:
             print(f"❌ Error: API returned status code {response.status_code}")
@@ -68,6 +80,28 @@ def generate_weekly_reports():
     print(f"{'='*60}\n")
 
 
+def wait_for_job(job_id):
+    """
+    Poll a background job until it finishes
+
+    Returns:
+        The finished job, or None if it is still running after JOB_MAX_WAIT seconds
+    """
+    deadline = time.time() + JOB_MAX_WAIT
+    last_done = None
+    while time.time() < deadline:
+        response = requests.get(f"{API_BASE_URL}/api/jobs/{job_id}", timeout=30)
+        response.raise_for_status()
+        job = response.json()
+        if job['status'] in ('completed', 'failed'):
+            return job
+        if job.get('done') != last_done and job.get('total'):
+            print(f"   ⏳ {job['done']}/{job['total']} patients done")
+            last_done = job.get('done')
+        time.sleep(JOB_POLL_SECONDS)
+    return None
+
+
 def manual_trigger():
     """
     Manually trigger report generation (for testing)
@@ -0,0 +1,87 @@
+"""
+Test the async Groq client stack end to end against the fake Groq server
+
+Runs non-streamed, streamed and routed completions through the same
+wrappers main.py uses (response cache, telemetry, adaptive limit around
+AsyncGroq), so a wrapper that hands back a coroutine or a broken completion
+shows up here. Needs no credentials.
+
+Usage:
+    python test_groq_async.py
+    (or: python -m pytest test_groq_async.py)
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+os.environ.setdefault("FAKE_GROQ_LATENCY_MS", "0")
+os.environ.setdefault("FAKE_PATIENTS", "1")
+os.environ["GROQ_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "groq_cache.sqlite3")
+
+from groq import AsyncGroq
+
+from fake_servers import start_servers
+from groq_cache import with_response_cache
+from groq_scheduler import rate_adaptive
+from groq_telemetry import instrumented, track_run
+from model_router import arouted_completion, get_stats as get_routing_stats
+
+MESSAGES = [
+    {"role": "system", "content": "You are a physiotherapy assistant."},
+    {"role": "user", "content": "Summarize the week. Return JSON with keys: summary, progress"},
+]
+
+
+async def _run_stack(base_url: str):
+    client = with_response_cache(instrumented(rate_adaptive(AsyncGroq(api_key="fake", base_url=base_url))))
+
+    with track_run() as telemetry:
+        completion = await client.chat.completions.create(
+            model="llama-3.3-70b-versatile", messages=MESSAGES,
+            response_format={"type": "json_object"}, temperature=0.7
+        )
+        assert not asyncio.iscoroutine(completion), "create() returned an un-awaited coroutine"
+        reply = json.loads(completion.choices[0].message.content)
+        assert set(reply) == {"summary", "progress"}, reply
+        assert completion.usage.prompt_tokens > 0
+
+        stream = await client.chat.completions.create(
+            model="llama-3.3-70b-versatile", messages=MESSAGES, stream=True
+        )
+        streamed = "".join([chunk.choices[0].delta.content or "" async for chunk in stream if chunk.choices])
+        assert json.loads(streamed) == reply
+
+        before = get_routing_stats()
+        routed = await arouted_completion(
+            client, [], messages=MESSAGES, response_format={"type": "json_object"}, temperature=0.7
+        )
+        assert json.loads(routed.choices[0].message.content) == reply
+        after = get_routing_stats()
+        assert after["small"]["calls"] == before["small"]["calls"] + 1
+        assert after["escalated"] == before["escalated"], "valid small-model reply was escalated"
+
+    outcomes = telemetry.as_dict()["outcomes"]
+    assert outcomes["ok"] == 3 and outcomes["json_error"] == 0, outcomes
+
+
+def test_async_groq_stack():
+    notion_server, groq_server, _ = start_servers(notion_port=0, groq_port=0)
+    try:
+        host, port = groq_server.server_address[:2]
+        asyncio.run(_run_stack(f"http://{host}:{port}"))
+    finally:
+        notion_server.shutdown()
+        groq_server.shutdown()
+
+
+# Main execution
+if __name__ == "__main__":
+    # Fix encoding for Windows
+    if sys.platform == "win32":
+        sys.stdout.reconfigure(encoding='utf-8')
+
+    test_async_groq_stack()
+    print("✅ Async Groq stack returns parsed completions")
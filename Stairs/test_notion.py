@@ -17,13 +17,16 @@ from groq import Groq
 from datetime import datetime, timedelta
 import json
 
+from notion_query import count_pages, first_page, iter_database_pages
+from notion_scheduler import rate_limited
+
 # Load environment
 load_dotenv()
 
 # Initialize clients
 print("Initializing clients...")
 try:
-    notion = Client(auth=os.getenv("NOTION_API_KEY"))
+    notion = rate_limited(Client(auth=os.getenv("NOTION_API_KEY")))
     groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
     print("✅ Clients initialized successfully\n")
 except Exception as e:
@@ -42,8 +45,9 @@ print("="*60)
 # Test 1: Fetch Patients
 print("\n[TEST 1] Fetching active patients from Notion...")
 try:
-    response = notion.databases.query(
-        database_id=DB_PATIENTS,
+    pages = iter_database_pages(
+        notion,
+        DB_PATIENTS,
         filter={
             "property": "Status",
             "select": {"equals": "Active"}
@@ -51,7 +55,7 @@ try:
     )
 
     patients = []
-    for page in response.get("results", []):
+    for page in pages:
         props = page.get("properties", {})
         name_prop = props.get("Name", {}).get("title", [])
         name = name_prop[0].get("plain_text", "") if name_prop else "Unknown"
@@ -83,23 +87,19 @@ try:
     end_date = datetime.now()
     start_date = end_date - timedelta(days=7)
 
-    response = notion.databases.query(
-        database_id=DB_WORKOUTS,
-        filter={
-            "and": [
-                {
-                    "property": "Patient",
-                    "relation": {"contains": patient_id}
-                },
-                {
-                    "property": "Date",
-                    "date": {"on_or_after": start_date.isoformat()}
-                }
-            ]
-        }
-    )
-
-    workout_count = len(response.get("results", []))
+    workout_filter = {
+        "and": [
+            {
+                "property": "Patient",
+                "relation": {"contains": patient_id}
+            },
+            {
+                "property": "Date",
+                "date": {"on_or_after": start_date.isoformat()}
+            }
+        ]
+    }
+    workout_count = count_pages(notion, DB_WORKOUTS, filter=workout_filter)
     print(f"✅ Found {workout_count} workout sessions in the past 7 days")
 
     if workout_count == 0:
@@ -114,11 +114,8 @@ try:
             print("\n[CREATING SAMPLE] Adding a test workout log...")
             try:
                 # Get first trainer
-                trainers_response = notion.databases.query(
-                    database_id=os.getenv("NOTION_DATABASE_ID_TRAINERS"),
-                    page_size=1
-                )
-                trainer_id = trainers_response["results"][0]["id"] if trainers_response["results"] else None
+                trainer = first_page(notion, os.getenv("NOTION_DATABASE_ID_TRAINERS"))
+                trainer_id = trainer["id"] if trainer else None
 
                 # Create sample workout
                 workout_props = {
@@ -161,7 +158,7 @@ try:
     # Show workout details
     if workout_count > 0:
         print("\n   Workout sessions:")
-        for i, workout in enumerate(response.get("results", [])[:3], 1):
+        for i, workout in enumerate(iter_database_pages(notion, DB_WORKOUTS, filter=workout_filter, limit=3), 1):
             props = workout.get("properties", {})
             date = props.get("Date", {}).get("date", {}).get("start", "N/A")
             duration = props.get("Duration (min)", {}).get("number", 0)
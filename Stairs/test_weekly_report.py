@@ -15,11 +15,16 @@ from groq import Groq
 from datetime import datetime, timedelta
 import json
 
+from notion_query import first_page, iter_database_pages
+from notion_scheduler import rate_limited
+from notion_records import WORKOUT_PROPERTIES, decode_patient, decode_workout
+from prompt_budget import dedupe_notes, fit_blocks, section_budget
+
 # Load environment
 load_dotenv()
 
 # Initialize clients
-notion = Client(auth=os.getenv("NOTION_API_KEY"))
+notion = rate_limited(Client(auth=os.getenv("NOTION_API_KEY")))
 groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
 
 # Database IDs
@@ -33,15 +38,14 @@ print("="*60)
 
 # Get first patient with workout logs
 print("\n[1/5] Fetching patient...")
-patients_response = notion.databases.query(
-    database_id=DB_PATIENTS,
-    filter={"property": "Status", "select": {"equals": "Active"}},
-    page_size=1
+patient = first_page(
+    notion,
+    DB_PATIENTS,
+    filter={"property": "Status", "select": {"equals": "Active"}}
 )
 
-patient_id = patients_response["results"][0]["id"]
-patient_props = patients_response["results"][0]["properties"]
-patient_name = patient_props.get("Name", {}).get("title", [])[0].get("plain_text", "")
+patient_id = patient["id"]
+patient_name = decode_patient(patient).name
 print(f"✅ Testing with: {patient_name}")
 
 # Fetch workout logs
@@ -49,28 +53,19 @@ print("\n[2/5] Fetching workout logs...")
 end_date = datetime.now()
 start_date = end_date - timedelta(days=7)
 
-workouts_response = notion.databases.query(
-    database_id=DB_WORKOUTS,
+workout_pages = iter_database_pages(
+    notion,
+    DB_WORKOUTS,
     filter={
         "and": [
             {"property": "Patient", "relation": {"contains": patient_id}},
             {"property": "Date", "date": {"on_or_after": start_date.isoformat()}}
         ]
-    }
+    },
+    properties=WORKOUT_PROPERTIES
 )
 
-workouts = []
-for page in workouts_response.get("results", []):
-    props = page.get("properties", {})
-    workouts.append({
-        "date": props.get("Date", {}).get("date", {}).get("start", ""),
-        "duration": props.get("Duration (min)", {}).get("number", 0),
-        "exercises": props.get("Exercises & Sets", {}).get("rich_text", [])[0].get("plain_text", "") if props.get("Exercises & Sets", {}).get("rich_text") else "",
-        "noticed": props.get("What I Noticed", {}).get("rich_text", [])[0].get("plain_text", "") if props.get("What I Noticed", {}).get("rich_text") else "",
-        "improving": props.get("What's Improving", {}).get("rich_text", [])[0].get("plain_text", "") if props.get("What's Improving", {}).get("rich_text") else "",
-        "concerns": props.get("Concerns/Issues", {}).get("rich_text", [])[0].get("plain_text", "") if props.get("Concerns/Issues", {}).get("rich_text") else "",
-        "rating": props.get("Overall Session Rating", {}).get("select", {}).get("name") if props.get("Overall Session Rating", {}).get("select") else "N/A"
-    })
+workouts = [decode_workout(page) for page in workout_pages]
 
 print(f"✅ Found {len(workouts)} workout sessions")
 
@@ -78,7 +73,7 @@ print(f"✅ Found {len(workouts)} workout sessions")
 print("\n[3/5] Generating AI summary with Groq...")
 
 workout_details = []
-for i, workout in enumerate(workouts, 1):
+for i, workout in enumerate(dedupe_notes(workouts), 1):
     detail = f"""
 Session {i} - {workout['date']}:
 - Duration: {workout['duration']} minutes
@@ -86,7 +81,7 @@ Session {i} - {workout['date']}:
 - Trainer's Observations: {workout['noticed'] or 'None'}
 - Progress Noted: {workout['improving'] or 'None'}
 - Concerns: {workout['concerns'] or 'None'}
-- Session Rating: {workout['rating']}
+- Session Rating: {workout['rating'] or 'N/A'}
 """
     workout_details.append(detail)
 
@@ -100,7 +95,7 @@ WEEKLY METRICS:
 - Total Training Time: {total_minutes} minutes
 
 WORKOUT SESSIONS:
-{''.join(workout_details)}
+{fit_blocks(workout_details, section_budget("sessions"), "sessions")}
 
 Return JSON with keys: summary, improvements, concerns, recommendations"""
 
@@ -171,12 +166,13 @@ print(f"\n   🔗 View in Notion: {page['url']}")
 
 # Verify
 print("\n[5/5] Verifying in Notion...")
-verify_response = notion.databases.query(
-    database_id=DB_WEEKLY,
+verify_page = first_page(
+    notion,
+    DB_WEEKLY,
     filter={"property": "Week ID", "title": {"equals": week_id}}
 )
 
-if verify_response.get("results"):
+if verify_page:
     print(f"✅ Verification successful - Report found in Notion!")
 else:
     print(f"⚠️  Could not verify report")
@@ -0,0 +1,156 @@
+"""
+In-process TTL cache with stale-while-revalidate for the API
+
+Dashboards poll the active-patient list and every report retrieves the
+patient page, but both change rarely. AsyncTTLCache keeps loaded values in
+memory:
+
+- fresh (younger than the TTL): returned straight from memory
+- stale (past the TTL but within the stale window): returned straight away
+  while one background task reloads it
+- expired or missing: loaded before returning; concurrent callers for the
+  same key share one load
+
+invalidate() drops one key or everything; a reload that was already in
+flight when its key was invalidated is discarded rather than stored.
+
+Configuration (environment):
+    PATIENT_CACHE_TTL     seconds patient data is served without reloading;
+                          0 disables the cache (default: 60)
+    PATIENT_CACHE_STALE   further seconds stale data is served while it
+                          reloads in the background (default: 300)
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set
+
+
+class _Entry:
+    __slots__ = ("value", "loaded_at")
+
+    def __init__(self, value: Any, loaded_at: float):
+        self.value = value
+        self.loaded_at = loaded_at
+
+
+class AsyncTTLCache:
+    """Async get-or-load cache with a TTL, a stale window and single-flight loads"""
+
+    def __init__(self, ttl: float, stale: float = 0, max_entries: int = 1024):
+        self.ttl = ttl
+        self.stale = stale
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._loads: Dict[Hashable, asyncio.Future] = {}
+        self._refreshes: Set[asyncio.Task] = set()
+        self._generation = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached value for key, loading it with loader() when needed
+
+        Args:
+            key: Cache key
+            loader: Coroutine function producing the current value
+
+        Returns:
+            The cached or freshly loaded value
+        """
+        if self.ttl <= 0:
+            return await loader()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.loaded_at
+            if age < self.ttl:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry.value
+            if age < self.ttl + self.stale:
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                if key not in self._loads:
+                    task = asyncio.create_task(self._refresh(key, loader))
+                    self._refreshes.add(task)
+                    task.add_done_callback(self._refreshes.discard)
+                return entry.value
+
+        self.misses += 1
+        return await self._load(key, loader)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Load key once for all concurrent callers and store the result"""
+        if key in self._loads:
+            return await asyncio.shield(self._loads[key])
+
+        generation = self._generation
+        future = asyncio.get_running_loop().create_future()
+        self._loads[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved: waiters re-raise it, nobody else needs it
+            raise
+        finally:
+            self._loads.pop(key, None)
+
+        if generation == self._generation:
+            self._store(key, value)
+        future.set_result(value)
+        return value
+
+    async def _refresh(self, key: Hashable, loader: Callable[[], Awaitable[Any]]):
+        try:
+            await self._load(key, loader)
+        except Exception as e:
+            # Keep serving the stale value; the next read past the window loads again
+            print(f"Background refresh of {key!r} failed: {e}")
+
+    def _store(self, key: Hashable, value: Any):
+        self._entries[key] = _Entry(value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> int:
+        """
+        Drop one key, or every key if none is given
+
+        Returns:
+            Number of entries dropped
+        """
+        # Loads already in flight were started before the invalidation: don't keep their result
+        self._generation += 1
+        if key is None:
+            dropped = len(self._entries)
+            self._entries.clear()
+            return dropped
+        return 1 if self._entries.pop(key, None) is not None else 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "ttl_seconds": self.ttl,
+            "stale_seconds": self.stale,
+        }
+
+
+def patient_cache_ttl() -> float:
+    return float(os.getenv("PATIENT_CACHE_TTL", "60"))
+
+
+def patient_cache_stale() -> float:
+    return float(os.getenv("PATIENT_CACHE_STALE", "300"))
@@ -12,11 +12,14 @@ if sys.platform == "win32":
 from dotenv import load_dotenv
 from notion_client import Client
 
+from notion_query import query_all
+from notion_scheduler import rate_limited
+
 # Load environment
 load_dotenv()
 
 # Initialize Notion client
-notion = Client(auth=os.getenv("NOTION_API_KEY"))
+notion = rate_limited(Client(auth=os.getenv("NOTION_API_KEY")))
 
 # Database IDs
 DB_WORKOUTS = os.getenv("NOTION_DATABASE_ID_WORKOUTS")
@@ -47,12 +50,7 @@ print("\n" + "="*85)
 print("[1/4] ASSESSMENT LOGS")
 print("="*85)
 
-assessments_response = notion.databases.query(
-    database_id=DB_ASSESSMENTS,
-    page_size=10
-)
-
-assessments = assessments_response.get("results", [])
+assessments = query_all(notion, DB_ASSESSMENTS, limit=10)
 print(f"\nTotal Assessment Logs: {len(assessments)}")
 print(f"\n{'Assessment ID':<40} | {'Format Check'}")
 print("-" * 85)
@@ -85,12 +83,7 @@ print("\n" + "="*85)
 print("[2/4] WORKOUT LOGS")
 print("="*85)
 
-workouts_response = notion.databases.query(
-    database_id=DB_WORKOUTS,
-    page_size=10
-)
-
-workouts = workouts_response.get("results", [])
+workouts = query_all(notion, DB_WORKOUTS, limit=10)
 print(f"\nTotal Workout Logs: {len(workouts)}")
 print(f"\n{'Workout Log ID':<40} | {'Format Check'}")
 print("-" * 85)
@@ -124,12 +117,7 @@ print("\n" + "="*85)
 print("[3/4] WEEKLY LOGS")
 print("="*85)
 
-weekly_response = notion.databases.query(
-    database_id=DB_WEEKLY,
-    page_size=10
-)
-
-weekly_logs = weekly_response.get("results", [])
+weekly_logs = query_all(notion, DB_WEEKLY, limit=10)
 print(f"\nTotal Weekly Logs: {len(weekly_logs)}")
 print(f"\n{'Week ID':<30} | {'Format Check'}")
 print("-" * 85)
@@ -162,12 +150,7 @@ print("\n" + "="*85)
 print("[4/4] MONTHLY LOGS")
 print("="*85)
 
-monthly_response = notion.databases.query(
-    database_id=DB_MONTHLY,
-    page_size=10
-)
-
-monthly_logs = monthly_response.get("results", [])
+monthly_logs = query_all(notion, DB_MONTHLY, limit=10)
 print(f"\nTotal Monthly Logs: {len(monthly_logs)}")
 print(f"\n{'Month ID':<30} | {'Format Check'}")
 print("-" * 85)
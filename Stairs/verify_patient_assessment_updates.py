@@ -12,11 +12,14 @@ if sys.platform == "win32":
 from dotenv import load_dotenv
 from notion_client import Client
 
+from notion_query import iter_database_pages
+from notion_scheduler import rate_limited
+
 # Load environment
 load_dotenv()
 
 # Initialize Notion client
-notion = Client(auth=os.getenv("NOTION_API_KEY"))
+notion = rate_limited(Client(auth=os.getenv("NOTION_API_KEY")))
 
 # Database IDs
 DB_PATIENTS = os.getenv("NOTION_DATABASE_ID_PATIENTS")
@@ -27,17 +30,20 @@ print("="*75)
 
 # Get all active patients
 print("\n[1/1] Fetching patients with assessment scores...\n")
-patients_response = notion.databases.query(
-    database_id=DB_PATIENTS,
+patients = iter_database_pages(
+    notion,
+    DB_PATIENTS,
     filter={"property": "Status", "select": {"equals": "Active"}}
 )
 
 print(f"{'Patient Name':<20} | {'Str':<4} | {'Mob':<4} | {'Bal':<4} | {'Flex':<4} | {'Overall':<7} | {'Last Assessment'}")
 print("-" * 90)
 
+total_patients = 0
 patients_with_scores = 0
 
-for patient in patients_response.get("results", []):
+for patient in patients:
+    total_patients += 1
     props = patient.get("properties", {})
 
     # Get name
@@ -76,9 +82,9 @@ print(" " * 30 + "SUMMARY")
 print("="*75)
 
 print(f"\n📊 Results:")
-print(f"   Total Patients: {len(patients_response.get('results', []))}")
+print(f"   Total Patients: {total_patients}")
 print(f"   Patients with Assessment Scores: {patients_with_scores}")
-print(f"   Patients without Scores: {len(patients_response.get('results', [])) - patients_with_scores}")
+print(f"   Patients without Scores: {total_patients - patients_with_scores}")
 
 print(f"\n✅ Patient records have been updated with assessment data!")
 print(f"\n📋 Score Fields Updated:")
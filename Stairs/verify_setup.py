@@ -12,11 +12,14 @@ if sys.platform == "win32":
 from dotenv import load_dotenv
 from notion_client import Client
 
+from notion_query import query_all
+from notion_scheduler import rate_limited
+
 # Load environment
 load_dotenv()
 
 # Initialize Notion client
-notion = Client(auth=os.getenv("NOTION_API_KEY"))
+notion = rate_limited(Client(auth=os.getenv("NOTION_API_KEY")))
 
 # Database IDs
 DB_PATIENTS = os.getenv("NOTION_DATABASE_ID_PATIENTS")
@@ -30,22 +33,23 @@ print("="*70)
 
 # Check 1: Patients
 print("\n[1/5] Checking PATIENTS database...")
-patients = notion.databases.query(
-    database_id=DB_PATIENTS,
+patients = query_all(
+    notion,
+    DB_PATIENTS,
     filter={"property": "Status", "select": {"equals": "Active"}}
 )
-patient_count = len(patients.get("results", []))
+patient_count = len(patients)
 print(f"   ✅ {patient_count} active patients found")
 
 # Check 2: Workout Logs
 print("\n[2/5] Checking WORKOUT LOGS database...")
-workouts = notion.databases.query(database_id=DB_WORKOUTS)
-workout_count = len(workouts.get("results", []))
+workouts = query_all(notion, DB_WORKOUTS, properties=["Patient"])
+workout_count = len(workouts)
 print(f"   ✅ {workout_count} workout logs found")
 
 # Check workout relations
 workout_with_patient = 0
-for workout in workouts.get("results", []):
+for workout in workouts:
     patient_rel = workout.get("properties", {}).get("Patient", {}).get("relation", [])
     if patient_rel:
         workout_with_patient += 1
@@ -53,12 +57,12 @@ print(f"   ✅ {workout_with_patient}/{workout_count} workouts have patient rela
 
 # Check 3: Weekly Reports
 print("\n[3/5] Checking WEEKLY LOGS database...")
-weekly = notion.databases.query(database_id=DB_WEEKLY)
-weekly_count = len(weekly.get("results", []))
+weekly = query_all(notion, DB_WEEKLY, properties=["patient"])
+weekly_count = len(weekly)
 print(f"   ✅ {weekly_count} weekly reports found")
 
 weekly_with_patient = 0
-for report in weekly.get("results", []):
+for report in weekly:
     patient_rel = report.get("properties", {}).get("patient", {}).get("relation", [])
     if patient_rel:
         weekly_with_patient += 1
@@ -66,12 +70,12 @@ print(f"   ✅ {weekly_with_patient}/{weekly_count} reports have patient relatio
 
 # Check 4: Monthly Reports
 print("\n[4/5] Checking MONTHLY LOGS database...")
-monthly = notion.databases.query(database_id=DB_MONTHLY)
-monthly_count = len(monthly.get("results", []))
+monthly = query_all(notion, DB_MONTHLY, properties=["Patient"])
+monthly_count = len(monthly)
 print(f"   ✅ {monthly_count} monthly reports found")
 
 monthly_with_patient = 0
-for report in monthly.get("results", []):
+for report in monthly:
     patient_rel = report.get("properties", {}).get("Patient", {}).get("relation", [])
     if patient_rel:
         monthly_with_patient += 1
@@ -81,8 +85,8 @@ print(f"   ✅ {monthly_with_patient}/{monthly_count} reports have patient relat
 print("\n[5/5] Checking two-way relations...")
 
 # Get first patient with data
-if patients.get("results"):
-    patient = patients["results"][0]
+if patients:
+    patient = patients[0]
     patient_props = patient.get("properties", {})
     patient_name = patient_props.get("Name", {}).get("title", [])[0].get("plain_text", "")
 
@@ -12,16 +12,23 @@ if sys.platform == "win32":
 from dotenv import load_dotenv
 from notion_client import Client
 
+from notion_query import query_all
+from id_resolver import get_id_resolver
+from notion_scheduler import rate_limited
+
 # Load environment
 load_dotenv()
 
 # Initialize Notion client
-notion = Client(auth=os.getenv("NOTION_API_KEY"))
+notion = rate_limited(Client(auth=os.getenv("NOTION_API_KEY")))
 
 # Database IDs
 DB_PATIENTS = os.getenv("NOTION_DATABASE_ID_PATIENTS")
 DB_WORKOUTS = os.getenv("NOTION_DATABASE_ID_WORKOUTS")
 
+# Patient names, loaded once instead of retrieved per workout
+id_resolver = get_id_resolver(notion)
+
 
 def get_text_from_rich_text(rich_text_array):
     """Extract plain text from Notion rich text array"""
@@ -36,12 +43,11 @@ print("="*80)
 
 # Fetch all workout logs
 print("\n[1/2] Fetching all workout logs...")
-workouts_response = notion.databases.query(
-    database_id=DB_WORKOUTS,
+workouts = query_all(
+    notion,
+    DB_WORKOUTS,
     sorts=[{"property": "Date", "direction": "ascending"}]
 )
-
-workouts = workouts_response.get("results", [])
 print(f"✅ Found {len(workouts)} workout logs\n")
 
 # Display all workout logs
@@ -60,12 +66,7 @@ for i, workout in enumerate(workouts, 1):
     # Get Patient name
     patient_relations = props.get("Patient", {}).get("relation", [])
     if patient_relations:
-        try:
-            patient = notion.pages.retrieve(page_id=patient_relations[0]["id"])
-            patient_name_rich = patient.get("properties", {}).get("Name", {}).get("title", [])
-            patient_name = patient_name_rich[0].get("plain_text", "Unknown") if patient_name_rich else "Unknown"
-        except:
-            patient_name = "Unknown"
+        patient_name = id_resolver.patient_name(patient_relations[0]["id"])
     else:
         patient_name = "No Patient"
 